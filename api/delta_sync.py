@@ -0,0 +1,114 @@
+import base64
+import binascii
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from core.models import Register, RegisterTombstone
+
+# Botlar keshi uchun o'zgarishlar lentasi: Register.updated bo'yicha
+# (updated, id) tartibida faqat oxirgi watermark dan keyingi qatorlar beriladi.
+# Tranzaksiya commit bo'lguncha qator ko'rinmaydi, lekin updated vaqti
+# oldinroq yoziladi - shuning uchun oxirgi SYNC_LAG soniya ichidagi
+# o'zgarishlar keyingi so'rovga qoldiriladi (aks holda watermark ulardan
+# o'tib ketishi mumkin). Shu sababli Registerni yozuvchi to'plamli SQL
+# updated ni now() emas, clock_timestamp() bilan yozadi va importlar har
+# bir bo'lakni alohida commit qiladi: updated va commit orasidagi vaqt
+# SYNC_LAG dan oshmasligi kerak.
+SYNC_LAG = timedelta(seconds=getattr(settings, 'DELTA_SYNC_LAG_SECONDS', 10))
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 5000
+
+CHANGE_FIELDS = ('id', 'telegram_id', 'username', 'fio', 'pnfl', 'hemis_id', 'is_active', 'is_teacher', 'updated')
+
+
+class InvalidWatermark(ValueError):
+    pass
+
+
+def encode_watermark(position):
+    """{'r': (vaqt, id) | None, 't': (vaqt, id) | None} -> qisqa matn"""
+    data = {
+        key: [value[0].isoformat(), value[1]] if value else None
+        for key, value in position.items()
+    }
+    raw = json.dumps(data, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_watermark(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        data = json.loads(raw)
+        position = {}
+        for key in ('r', 't'):
+            value = data.get(key)
+            if value is None:
+                position[key] = None
+                continue
+            time = parse_datetime(value[0])
+            if time is None:
+                raise ValueError(value[0])
+            position[key] = (time, int(value[1]))
+        return position
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, AttributeError, IndexError):
+        raise InvalidWatermark("Noto'g'ri watermark")
+
+
+def after_position(queryset, field, position):
+    """(field, id) > position: field >= t indeks oralig'i, OR teng vaqtlarni ajratadi"""
+    if position is None:
+        return queryset
+    time, pk = position
+    return queryset.filter(Q(**{f'{field}__gt': time}) | Q(pk__gt=pk), **{f'{field}__gte': time})
+
+
+def collect_changes(watermark=None, limit=DEFAULT_LIMIT):
+    """
+    watermark dan keyingi o'zgarishlar. Watermark bo'lmasa - barcha
+    Registerlar (boshlang'ich yuklash), o'chirilganlar tarixi o'tkazib yuboriladi.
+    Mijoz avval 'deleted', keyin 'changes' ni qo'llashi kerak (o'chirilib
+    qayta yaratilgan foydalanuvchi 'changes' da keladi); has_more bo'lsa,
+    yangi watermark bilan darhol yana so'raydi.
+
+    Qaytaradi: {'changes', 'deleted', 'watermark', 'has_more'}
+    """
+    position = watermark or {'r': None, 't': None}
+    horizon = timezone.now() - SYNC_LAG
+
+    registers = after_position(
+        Register.objects.filter(updated__lt=horizon).order_by('updated', 'id'),
+        'updated', position['r']
+    )
+    changes = list(registers.values(*CHANGE_FIELDS)[:limit + 1])
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if changes:
+        position['r'] = (changes[-1]['updated'], changes[-1]['id'])
+
+    tombstones = RegisterTombstone.objects.filter(deleted__lt=horizon).order_by('deleted', 'id')
+    deleted = []
+    if watermark is None:
+        # Boshlang'ich yuklashda o'chirilganlar kerak emas - faqat ularning oxiri eslab qolinadi
+        last = tombstones.values_list('deleted', 'id').last()
+        position['t'] = tuple(last) if last else None
+    else:
+        rows = list(after_position(tombstones, 'deleted', position['t']).values_list(
+            'deleted', 'id', 'telegram_id'
+        )[:limit + 1])
+        has_more = has_more or len(rows) > limit
+        rows = rows[:limit]
+        if rows:
+            position['t'] = (rows[-1][0], rows[-1][1])
+        deleted = [telegram_id for _, _, telegram_id in rows]
+
+    for row in changes:
+        del row['id']
+    return {
+        'changes': changes,
+        'deleted': deleted,
+        'watermark': encode_watermark(position),
+        'has_more': has_more,
+    }
@@ -0,0 +1,92 @@
+import base64
+import binascii
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    (vaqt, id) bo'yicha kursorli sahifalash: keyingi sahifa OFFSET va
+    COUNT(*) siz, oldingi sahifaning oxirgi qatoridan davom etadi, shuning
+    uchun 10 000-sahifa ham 1-sahifa kabi tez. Tartib: eng yangisi birinchi.
+    Kursor - oxirgi qatorning (vaqt, id) juftligi (base64).
+    """
+    time_field = 'activity_time'
+    page_size = api_settings.PAGE_SIZE or 100
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = "Noto'g'ri cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(f'-{self.time_field}', '-id')
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            time, pk = position
+            # time <= t indeks oralig'ini beradi, OR qismi teng vaqtlarni id bo'yicha ajratadi
+            queryset = queryset.filter(
+                Q(**{f'{self.time_field}__lt': time}) | Q(pk__lt=pk),
+                **{f'{self.time_field}__lte': time}
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def encode_cursor(self, row):
+        time = getattr(row, self.time_field)
+        raw = f"{time.isoformat()}|{row.pk}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        """Kursordan (vaqt, id), kursor bo'lmasa None"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)).decode()
+            time, pk = raw.rsplit('|', 1)
+            time = parse_datetime(time)
+            pk = int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if time is None:
+            raise NotFound(self.invalid_cursor_message)
+        return time, pk
+
+    def get_next_cursor(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_next_link(self):
+        cursor = self.get_next_cursor()
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'page')
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'next_cursor': self.get_next_cursor(),
+            'page_size': self.page_size,
+            'results': data,
+        })
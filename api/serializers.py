@@ -5,18 +5,21 @@ from core.models import TelegramGroup, Register, HemisTable, MemberActivity
 logger = logging.getLogger(__name__)
 
 class TelegramGroupSerializer(serializers.ModelSerializer):
-    members_count = serializers.SerializerMethodField()
-    
+    # Faol a'zolar soni (hisoblagich maydonidan, so'rovsiz)
+    members_count = serializers.IntegerField(source='active_members', read_only=True)
+
     class Meta:
         model = TelegramGroup
-        fields = ['id', 'group_name', 'group_id', 'is_active', 'members_count', 'created']
+        fields = [
+            'id', 'group_name', 'group_id', 'is_active', 'members_count',
+            'total_members', 'linked_members', 'created'
+        ]
         extra_kwargs = {
             'group_id': {'validators': []},  # unique validatorni olib tashlash
+            'total_members': {'read_only': True},
+            'linked_members': {'read_only': True},
         }
-        
-    def get_members_count(self, obj):
-        return obj.members.filter(is_active=True).count()
-    
+
     def create(self, validated_data):
         group, created = TelegramGroup.objects.get_or_create(
             group_id=validated_data['group_id'],
@@ -292,6 +295,69 @@ class MemberActivityCreateSerializer(serializers.ModelSerializer):
         )
 
 
+# Bitta bulk so'rovdagi faoliyatlar soni chegarasi
+BULK_ACTIVITY_LIMIT = 1000
+
+
+class MemberActivityBulkSerializer(serializers.Serializer):
+    """
+    Ko'p faoliyatni bitta so'rovda yozish: har bir event alohida tekshiriladi,
+    telegram_id va group_id lar 2 ta so'rovda topiladi, to'g'ri eventlar
+    bitta bulk_create bilan yoziladi.
+    """
+    events = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=BULK_ACTIVITY_LIMIT
+    )
+
+    def create(self, validated_data):
+        events = validated_data['events']
+        results = [None] * len(events)
+
+        valid = []
+        for index, event in enumerate(events):
+            item = MemberActivityCreateSerializer(data=event)
+            if item.is_valid():
+                valid.append((index, dict(item.validated_data)))
+            else:
+                results[index] = {'index': index, 'success': False, 'errors': item.errors}
+
+        registers = dict(Register.objects.filter(
+            telegram_id__in={data['telegram_id'] for _, data in valid}
+        ).values_list('telegram_id', 'id'))
+        groups = dict(TelegramGroup.objects.filter(
+            group_id__in={data['group_id'] for _, data in valid}
+        ).values_list('group_id', 'id'))
+
+        pending = []
+        for index, data in valid:
+            telegram_id = data.pop('telegram_id')
+            group_id = data.pop('group_id')
+            if telegram_id not in registers:
+                error = f"Register with telegram_id {telegram_id} not found"
+            elif group_id not in groups:
+                error = f"TelegramGroup with group_id {group_id} not found"
+            else:
+                pending.append((index, MemberActivity(
+                    register_id=registers[telegram_id],
+                    telegram_group_id=groups[group_id],
+                    **data
+                )))
+                continue
+            results[index] = {'index': index, 'success': False, 'errors': [error]}
+
+        created = MemberActivity.objects.bulk_create([activity for _, activity in pending])
+        for (index, _), activity in zip(pending, created):
+            results[index] = {
+                'index': index,
+                'success': True,
+                'id': activity.id,
+                'activity_type': activity.activity_type,
+            }
+        return results
+
+
 class MemberActivityListSerializer(serializers.ModelSerializer):
     """A'zo faoliyatini ko'rsatish uchun serializer"""
     
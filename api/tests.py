@@ -1,3 +1,364 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api import delta_sync, views
+from api.delta_sync import collect_changes
+from core import hemis_import
+from core.hemis_benchmark import HEMIS_ID_START, PNFL_START, generate_hemis_xlsx
+from core.hemis_import import LOADER_ORM, process_excel_stream
+from core.models import MemberActivity, Register, RegisterTombstone, TelegramGroup
+
+
+class ApiTestCase(TestCase):
+
+    def post_json(self, url, data):
+        body = data if isinstance(data, (bytes, str)) else json.dumps(data)
+        return self.client.post(url, body, content_type='application/json', HTTP_HOST='localhost')
+
+    def get(self, url, data=None):
+        return self.client.get(url, data, HTTP_HOST='localhost')
+
+
+class BasicInfoStreamTests(ApiTestCase):
+    url = '/api/users/basic-info/'
+
+    def setUp(self):
+        Register.objects.create(telegram_id=1, pnfl='30000000000001')
+        Register.objects.create(telegram_id=2)
+        Register.objects.create(telegram_id=3, pnfl='ПИНФЛ"1')
+
+    def content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        response = self.get(self.url, {'stream': 'ndjson'})
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = self.content(response).splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [
+            {'telegram_id': 1, 'pnfl': '30000000000001'},
+            {'telegram_id': 2, 'pnfl': None},
+            {'telegram_id': 3, 'pnfl': 'ПИНФЛ"1'},
+        ])
+        self.assertEqual(lines[2], json.dumps({'telegram_id': 3, 'pnfl': 'ПИНФЛ"1'}, ensure_ascii=False))
+
+    def test_csv(self):
+        response = self.get(self.url, {'stream': 'csv'})
+
+        self.assertEqual(self.content(response).splitlines(), [
+            'telegram_id,pnfl', '1,30000000000001', '2,', '3,"ПИНФЛ""1"',
+        ])
+
+    def test_failure_breaks_stream(self):
+        """Oqim o'rtasidagi xato javobni to'liq va to'g'ri yakunlangan qilib qoldirmaydi"""
+        def failing_writer(rows):
+            yield '{"telegram_id": 1, "pnfl": null}\n'
+            raise RuntimeError('cursor lost')
+
+        stream = (failing_writer, *views.BASIC_INFO_STREAMS['ndjson'][1:])
+        with mock.patch.dict(views.BASIC_INFO_STREAMS, {'ndjson': stream}):
+            response = self.get(self.url, {'stream': 'ndjson'})
+            chunks = iter(response.streaming_content)
+            self.assertEqual(next(chunks), b'{"telegram_id": 1, "pnfl": null}\n')
+            with self.assertLogs('api.views', 'ERROR') as logs:
+                with self.assertRaisesMessage(RuntimeError, 'cursor lost'):
+                    next(chunks)
+
+        self.assertIn('basic-info streaming xatosi', logs.output[0])
+
+    def test_unknown_stream_format(self):
+        self.assertEqual(self.get(self.url, {'stream': 'xml'}).status_code, 400)
+
+    def test_plain_json(self):
+        data = self.get(self.url).json()
+        self.assertEqual(data['count'], 3)
+
+
+class MemberActivityBulkTests(ApiTestCase):
+    url = '/api/member-activity/bulk/'
+
+    def setUp(self):
+        self.register = Register.objects.create(telegram_id=101, fio='Ali Valiyev')
+        self.group = TelegramGroup.objects.create(group_id=-1001, group_name='Guruh')
+
+    def event(self, **values):
+        event = {
+            'telegram_id': self.register.telegram_id,
+            'group_id': self.group.group_id,
+            'activity_type': 'join',
+            'action_by': 'self',
+            'activity_time': '2025-09-01T10:00:00Z',
+        }
+        event.update(values)
+        return event
+
+    def test_malformed_bodies(self):
+        bodies = [
+            '5', '"events"', 'null', 'true', '{}', '{"events": "x"}', '{"events": {"a": 1}}',
+            '[]', '[1, 2]', '{"events": [[1]]}', '{not json',
+        ]
+        for body in bodies:
+            with self.subTest(body=body):
+                response = self.post_json(self.url, body)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json().get('success', False))
+
+        self.assertFalse(MemberActivity.objects.exists())
+
+    def test_form_body_is_rejected(self):
+        response = self.client.post(self.url, {'events': 'x'}, HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 400)
+
+    def test_too_many_events(self):
+        response = self.post_json(self.url, [self.event()] * 1001)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(MemberActivity.objects.exists())
+
+    def test_partly_invalid_batch(self):
+        events = [
+            self.event(),
+            self.event(activity_type='danced'),
+            self.event(telegram_id=999),
+            self.event(group_id=-999),
+            self.event(activity_type='leave', action_by='admin', admin_name='Admin'),
+        ]
+        for body in (events, {'events': events}):
+            with self.subTest(wrapped=isinstance(body, dict)):
+                MemberActivity.objects.all().delete()
+                response = self.post_json(self.url, body)
+
+                self.assertEqual(response.status_code, 201)
+                data = response.json()
+                self.assertEqual((data['created_count'], data['error_count']), (2, 3))
+                results = data['results']
+                self.assertEqual([result['index'] for result in results], [0, 1, 2, 3, 4])
+                self.assertEqual([result['success'] for result in results], [True, False, False, False, True])
+                self.assertIn('activity_type', results[1]['errors'])
+                self.assertEqual(results[2]['errors'], ['Register with telegram_id 999 not found'])
+                self.assertEqual(results[3]['errors'], ['TelegramGroup with group_id -999 not found'])
+                self.assertEqual(
+                    list(MemberActivity.objects.order_by('id').values_list('id', 'activity_type')),
+                    [(results[0]['id'], 'join'), (results[4]['id'], 'leave')],
+                )
+
+    def test_all_events_invalid(self):
+        response = self.post_json(self.url, [self.event(telegram_id=999)])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created_count'], 0)
+
+    def test_large_json_body_is_accepted(self):
+        """Fayl bo'lmagan katta so'rov tanasi (2.5MB dan ortiq) ham qabul qilinadi"""
+        events = [self.event(telegram_id=900 + index, notes='x' * 3000) for index in range(1000)]
+        body = json.dumps(events)
+        self.assertGreater(len(body), 2621440)
+        request = RequestFactory().post(self.url, body, content_type='application/json')
+        self.assertEqual(len(request.body), len(body))
+
+        response = self.post_json(self.url, body)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['error_count'], 1000)
+
+
+class MemberActivityListTests(ApiTestCase):
+    url = '/api/member-activity/list/'
+
+    def setUp(self):
+        register = Register.objects.create(telegram_id=101)
+        self.groups = [TelegramGroup.objects.create(group_id=-1000 - index) for index in range(2)]
+        start = timezone.now() - timedelta(days=1)
+        # Har 3 ta faoliyat bir xil vaqtda - teng vaqtlar id bo'yicha ajratiladi
+        MemberActivity.objects.bulk_create([
+            MemberActivity(
+                register=register, telegram_group=self.groups[index % 2], activity_type='join',
+                action_by='self', activity_time=start + timedelta(minutes=index // 3),
+            )
+            for index in range(25)
+        ])
+
+    def walk(self, **params):
+        """Barcha kursor sahifalari: (id lar, so'rovlar)"""
+        ids, sql = [], []
+        params = {'paginate': 'cursor', **params}
+        while True:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.get(self.url, params)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertLessEqual(len(data['results']), data['page_size'])
+            ids += [row['id'] for row in data['results']]
+            sql += [query['sql'] for query in queries]
+            if not data['next_cursor']:
+                self.assertIsNone(data['next'])
+                return ids, sql
+            self.assertIn(f"cursor={data['next_cursor']}", data['next'])
+            params = {**params, 'cursor': data['next_cursor']}
+
+    def test_cursor_pages_follow_order(self):
+        ids, sql = self.walk(page_size=4)
+
+        expected = list(MemberActivity.objects.order_by('-activity_time', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertFalse(any('OFFSET' in query or 'COUNT(' in query for query in sql))
+
+    def test_cursor_keeps_filters(self):
+        group = self.groups[1]
+        ids, _ = self.walk(page_size=5, group_id=group.group_id)
+
+        expected = list(
+            MemberActivity.objects.filter(telegram_group=group)
+            .order_by('-activity_time', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+    def test_page_size_is_clamped(self):
+        response = self.get(self.url, {'paginate': 'cursor', 'page_size': 0})
+        self.assertEqual(response.json()['page_size'], 1)
+        response = self.get(self.url, {'paginate': 'cursor', 'page_size': 10000})
+        self.assertEqual(response.json()['page_size'], 500)
+        self.assertIsNone(response.json()['next_cursor'])
+
+    def test_invalid_cursor(self):
+        for cursor in ('%%%', 'bm90LWEtY3Vyc29y', 'eHx5'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.get(self.url, {'cursor': cursor}).status_code, 404)
+
+    def test_page_number_mode_is_default(self):
+        data = self.get(self.url).json()
+        self.assertEqual(data['count'], 25)
+        self.assertEqual(len(data['results']), 25)
+
+
+class DeltaSyncTests(ApiTestCase):
+    url = '/api/users/changes/'
+
+    def setUp(self):
+        self.past = timezone.now() - timedelta(minutes=10)
+        self.registers = [Register.objects.create(telegram_id=index) for index in range(1, 6)]
+        # Bir xil vaqtli qatorlar id bo'yicha ajratiladi
+        Register.objects.update(updated=self.past)
+
+    def changes(self, since=None, **params):
+        if since:
+            params['since'] = since
+        response = self.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_initial_load_pages_by_watermark(self):
+        seen, since = [], None
+        while True:
+            page = self.changes(since, limit=2)
+            seen.extend(row['telegram_id'] for row in page['changes'])
+            since = page['watermark']
+            if not page['has_more']:
+                break
+
+        self.assertEqual(seen, [1, 2, 3, 4, 5])
+        self.assertEqual(self.changes(since)['changes'], [])
+
+    def test_changes_after_watermark(self):
+        since = self.changes()['watermark']
+        Register.objects.filter(telegram_id=3).update(fio='Yangi', updated=self.past + timedelta(minutes=5))
+        # SYNC_LAG ichidagi o'zgarish keyingi so'rovga qoladi
+        Register.objects.filter(telegram_id=4).update(fio='Hozir', updated=timezone.now())
+
+        page = self.changes(since)
+        self.assertEqual([(row['telegram_id'], row['fio']) for row in page['changes']], [(3, 'Yangi')])
+
+        Register.objects.filter(telegram_id=4).update(updated=self.past + timedelta(minutes=6))
+        page = self.changes(page['watermark'])
+        self.assertEqual([row['telegram_id'] for row in page['changes']], [4])
+
+    def test_deletions_are_tombstoned(self):
+        since = self.changes()['watermark']
+        self.registers[1].delete()
+        self.registers[3].delete()
+        self.assertEqual(RegisterTombstone.objects.count(), 2)
+
+        self.assertEqual(self.changes(since)['deleted'], [])
+        RegisterTombstone.objects.update(deleted=self.past + timedelta(minutes=1))
+        page = self.changes(since)
+        self.assertEqual(page['deleted'], [2, 4])
+        self.assertEqual(self.changes(page['watermark'])['deleted'], [])
+        # Boshlang'ich yuklashda o'chirilganlar berilmaydi
+        self.assertEqual(self.changes()['deleted'], [])
+
+    def test_invalid_watermark(self):
+        response = self.get(self.url, {'since': 'not-a-watermark'})
+        self.assertEqual(response.status_code, 400)
+
+
+class DeltaSyncImportTests(TransactionTestCase):
+    """Lenta SYNC_LAG dan uzoq davom etgan import o'zgarishlarini ham beradi"""
+
+    def test_long_import_is_delivered(self):
+        handle, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        generate_hemis_xlsx(path, 4, dup_ratio=0, invalid_ratio=0)
+
+        past = timezone.now() - timedelta(minutes=10)
+        for index in range(4):
+            Register.objects.create(
+                telegram_id=index + 1, hemis_id=HEMIS_ID_START + index, pnfl=str(PNFL_START + index)
+            )
+        other = Register.objects.create(telegram_id=100)
+        Register.objects.update(updated=past)
+
+        lag = timedelta(seconds=0.5)
+        state = {}
+
+        def poll():
+            try:
+                state['feed'] = collect_changes(state.get('watermark'))
+            finally:
+                connection.close()
+
+        def in_thread(target):
+            thread = threading.Thread(target=target)
+            thread.start()
+            thread.join()
+
+        link_registers = hemis_import.link_registers
+
+        def slow_link_registers(*args, **kwargs):
+            # Bo'lak tranzaksiyasi ochiq: boshqa ulanish yozadi va lentani o'qiydi
+            def touch_other():
+                try:
+                    Register.objects.filter(pk=other.pk).update(fio='Boshqa', updated=timezone.now())
+                finally:
+                    connection.close()
+
+            in_thread(touch_other)
+            time.sleep(lag.total_seconds() + 0.2)
+            in_thread(poll)
+            state['watermark'] = delta_sync.decode_watermark(state['feed']['watermark'])
+            return link_registers(*args, **kwargs)
+
+        with mock.patch.object(delta_sync, 'SYNC_LAG', lag):
+            in_thread(poll)
+            state['watermark'] = delta_sync.decode_watermark(state['feed']['watermark'])
+
+            with mock.patch.object(hemis_import, 'link_registers', slow_link_registers):
+                result = process_excel_stream(path, loader=LOADER_ORM)
+            self.assertEqual(result['activated_count'], 4)
+            self.assertEqual([row['telegram_id'] for row in state['feed']['changes']], [100])
+
+            time.sleep(lag.total_seconds() + 0.2)
+            in_thread(poll)
+
+        self.assertEqual(
+            sorted(row['telegram_id'] for row in state['feed']['changes']), [1, 2, 3, 4]
+        )
+        self.assertTrue(all(row['is_active'] for row in state['feed']['changes']))
@@ -1,3 +1,7 @@
+import csv
+import io
+import json
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from datetime import datetime
 from django.shortcuts import render, get_object_or_404
@@ -8,8 +12,10 @@ from django.core.exceptions import ObjectDoesNotExist
 from core.models import TelegramGroup, Register, MemberActivity
 from .serializers import (
     TelegramGroupSerializer, RegisterSerializer, RegisterStatusSerializer,
-    MemberActivityCreateSerializer, MemberActivityListSerializer
+    MemberActivityCreateSerializer, MemberActivityListSerializer, MemberActivityBulkSerializer
     )
+from .delta_sync import DEFAULT_LIMIT, MAX_LIMIT, InvalidWatermark, collect_changes, decode_watermark
+from .pagination import KeysetPagination
 
 import logging
 
@@ -44,11 +50,87 @@ class RegisterDetailView(generics.RetrieveUpdateDestroyAPIView):
         return Register.objects.select_related('hemis_data').prefetch_related('register_groups')
 
 
+# Streaming eksportda server-side cursor dan bir marta olinadigan qatorlar soni
+STREAM_CHUNK_SIZE = 2000
+BASIC_INFO_FIELDS = ('telegram_id', 'pnfl')
+
+
+def iter_basic_info_ndjson(rows):
+    """Har bir foydalanuvchi - alohida JSON qator (bo'laklab yuboriladi)"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row, ensure_ascii=False))
+        if len(lines) >= STREAM_CHUNK_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def iter_basic_info_csv(rows):
+    """Sarlavha va qatorlar CSV ko'rinishida (bo'laklab yuboriladi)"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=BASIC_INFO_FIELDS)
+    writer.writeheader()
+    for number, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if number % STREAM_CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.getvalue():
+        yield buffer.getvalue()
+
+
+BASIC_INFO_STREAMS = {
+    'ndjson': (iter_basic_info_ndjson, 'application/x-ndjson; charset=utf-8', 'users.ndjson'),
+    'csv': (iter_basic_info_csv, 'text/csv; charset=utf-8', 'users.csv'),
+}
+
+
+def stream_basic_info(stream_format):
+    """
+    Foydalanuvchilarni server-side cursor (.iterator) bilan o'qib, javobni
+    bo'laklab yozish: xotira foydalanuvchilar soniga bog'liq emas.
+    Oqim o'rtasida xato bo'lsa, u qayta ko'tariladi: server chunked javobni
+    yakunlamasdan uzadi va mijoz to'liq bo'lmagan ro'yxatni to'liq deb
+    keshlamaydi (200 status allaqachon yuborilgan bo'ladi).
+    """
+    writer, content_type, file_name = BASIC_INFO_STREAMS[stream_format]
+    rows = (
+        Register.objects.order_by('id')
+        .values(*BASIC_INFO_FIELDS)
+        .iterator(chunk_size=STREAM_CHUNK_SIZE)
+    )
+
+    def content():
+        try:
+            yield from writer(rows)
+        except Exception as e:
+            # Sarlavhalar allaqachon yuborilgan - oqim uziladi, jimgina yakunlanmaydi
+            logger.exception(f"basic-info streaming xatosi: {e}")
+            raise
+
+    response = StreamingHttpResponse(content(), content_type=content_type)
+    response['Content-Disposition'] = f'inline; filename="{file_name}"'
+    return response
+
+
 @api_view(['GET'])
 def get_all_users_basic_info(request):
     """
-    Barcha foydalanuvchilarning telegram_id va pnfl ma'lumotlarini qaytaradi
+    Barcha foydalanuvchilarning telegram_id va pnfl ma'lumotlarini qaytaradi.
+    ?stream=ndjson yoki ?stream=csv - bitta JSON o'rniga oqim (katta ro'yxatlar uchun)
     """
+    stream_format = request.query_params.get('stream')
+    if stream_format:
+        if stream_format not in BASIC_INFO_STREAMS:
+            return Response({
+                'success': False,
+                'error': f"stream qiymati: {', '.join(BASIC_INFO_STREAMS)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return stream_basic_info(stream_format)
+
     try:
         users = Register.objects.all().values('telegram_id', 'pnfl')
         users_list = list(users)
@@ -66,6 +148,42 @@ def get_all_users_basic_info(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+def get_user_changes(request):
+    """
+    Bot keshini yangilash uchun o'zgarishlar lentasi: ?since=<watermark>
+    dan keyin o'zgargan (updated, id tartibida) va o'chirilgan foydalanuvchilar.
+    since bo'lmasa - boshlang'ich to'liq yuklash (limit bo'yicha sahifalab).
+    Javobdagi watermark keyingi so'rovda since sifatida yuboriladi.
+    """
+    try:
+        limit = min(max(int(request.query_params.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        limit = DEFAULT_LIMIT
+
+    since = request.query_params.get('since')
+    try:
+        watermark = decode_watermark(since) if since else None
+    except InvalidWatermark as e:
+        return Response({'success': False, 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        result = collect_changes(watermark, limit)
+        return Response({
+            'success': True,
+            **result,
+            'count': len(result['changes']),
+            'deleted_count': len(result['deleted']),
+        }, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        logger.exception(f"O'zgarishlar lentasi xatosi: {e}")
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(['GET'])
 def check_user_status(request, telegram_id):
     """
@@ -216,10 +334,69 @@ class MemberActivityCreateView(generics.CreateAPIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+def member_activity_bulk_create(request):
+    """
+    Ko'p a'zo faoliyatini bitta so'rovda yaratish API.
+    Body: [event, ...] yoki {"events": [event, ...]}, event - add/ dagi kabi.
+    Har bir event uchun natija (index bo'yicha) qaytariladi.
+    """
+    events = request.data
+    if isinstance(events, dict):
+        events = events.get('events')
+    if not isinstance(events, list):
+        return Response({
+            "success": False,
+            "message": "Body eventlar ro'yxati yoki {\"events\": [...]} bo'lishi kerak"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = MemberActivityBulkSerializer(data={'events': events})
+    if not serializer.is_valid():
+        return Response({
+            "success": False,
+            "message": "Validation xatolik",
+            "errors": serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        results = serializer.save()
+        created_count = sum(1 for result in results if result['success'])
+        logger.info(f"Member activities bulk: {created_count}/{len(results)} ta yaratildi")
+        return Response({
+            "success": True,
+            "message": f"{created_count} ta faoliyat yaratildi",
+            "created_count": created_count,
+            "error_count": len(results) - created_count,
+            "results": results
+        }, status=status.HTTP_201_CREATED if created_count else status.HTTP_200_OK)
+
+    except Exception as e:
+        logger.exception(f"Member activity bulk creation error: {e}")
+        return Response({
+            "success": False,
+            "message": f"Server xatolik: {str(e)}"
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class MemberActivityListView(generics.ListAPIView):
-    """A'zo faoliyatlari ro'yxati API"""
+    """
+    A'zo faoliyatlari ro'yxati API.
+    Odatiy holatda sahifa raqami bilan (?page=), ?paginate=cursor yoki
+    ?cursor=... berilsa - (activity_time, id) kursori bilan sahifalanadi
+    (OFFSET va COUNT(*) siz, chuqur sahifalar ham tez).
+    """
     serializer_class = MemberActivityListSerializer
-    
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if params.get('paginate') == 'cursor' or params.get(KeysetPagination.cursor_query_param):
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def get_queryset(self):
         queryset = MemberActivity.objects.select_related('register', 'telegram_group').all()
         
@@ -153,6 +153,10 @@ STATICFILES_DIRS = [
 
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Yuklangan fayllar (fonda import qilinadigan Excel fayllar)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -170,5 +174,22 @@ SESSION_COOKIE_AGE = 1209600
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
 
 # File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50MB
-DATA_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50MB
\ No newline at end of file
+# 2.5MB dan katta fayllar xotirada emas, vaqtinchalik faylda saqlanadi
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB
+# Fayllardan tashqari so'rov tanasi uchun chegara (katta JSON so'rovlar, masalan bulk API)
+DATA_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50MB
+# Vaqtinchalik yuklamalar papkasi (None - tizimning /tmp papkasi)
+FILE_UPLOAD_TEMP_DIR = env.str('FILE_UPLOAD_TEMP_DIR', None)
+
+# Hemis import settings
+HEMIS_IMPORT_CHUNK_SIZE = 2000  # streaming rejimda bitta bo'lakdagi qatorlar soni
+HEMIS_IMPORT_LOADER = 'copy'  # katta importlar uchun: 'copy' (PostgreSQL COPY) yoki 'orm'
+HEMIS_IMPORT_WORKERS = None  # parallel rejimdagi jarayonlar soni (None - protsessor yadrolari soni)
+HEMIS_IMPORT_JOB_PARALLEL = False  # fondagi importlarni parallel rejimda bajarish (faqat ko'p varaqli fayllarda tezroq)
+
+# Nofaol qilingan guruhlar (process_group_deactivations worker)
+GROUP_DEACTIVATION_CHUNK_SIZE = 2000  # nofaol guruh a'zoliklari bitta tranzaksiyada shuncha qatordan o'chiriladi
+GROUP_DEACTIVATION_DETACH_MEMBERS = False  # True - Register a'zoliklari (register_groups) ham o'chiriladi
+
+# api/users/changes/ - oxirgi shuncha soniyadagi o'zgarishlar keyingi so'rovda beriladi (commit kechikishi uchun)
+DELTA_SYNC_LAG_SECONDS = 10
@@ -1,30 +1,25 @@
 from django.urls import reverse
 from django.utils import timezone
-from django.db.models import Count, Q
 from django.contrib import admin
 from django.utils.html import format_html
-from django.db.models import Count
-from .models import TelegramGroup, Register, HemisTable, MemberActivity
+from .models import (
+    TelegramGroup, Register, HemisTable, MemberActivity, HemisImportJob, ImportRun, GroupDeactivationJob
+)
+from .group_counters import clear_hemis_registers, update_registers
+from .linking import link_hemis_batch
 
 
 
 @admin.register(TelegramGroup)
 class TelegramGroupAdmin(admin.ModelAdmin):
-    list_display = ['group_name', 'group_id', 'created', 'is_active', 'members_count']
+    list_display = [
+        'group_name', 'group_id', 'created', 'is_active',
+        'total_members', 'active_members', 'linked_members'
+    ]
     list_filter = ['is_active', 'created', 'updated']
     search_fields = ['group_name', 'group_id']
-    readonly_fields = ['created', 'updated']
+    readonly_fields = ['created', 'updated', 'total_members', 'active_members', 'linked_members']
     ordering = ['-created']
-    
-    def get_queryset(self, request):
-        return super().get_queryset(request).annotate(
-            members_count=Count('members', distinct=True)
-        )
-    
-    def members_count(self, obj):
-        return obj.members_count
-    members_count.admin_order_field = 'members_count'
-    members_count.short_description = "A'zolar soni"
 
 
 @admin.register(Register)
@@ -99,17 +94,17 @@ class RegisterAdmin(admin.ModelAdmin):
     actions = ['activate_users', 'deactivate_users', 'mark_as_teachers']
 
     def activate_users(self, request, queryset):
-        updated = queryset.update(is_active=True)
+        updated = update_registers(queryset, is_active=True)
         self.message_user(request, f'{updated} ta foydalanuvchi faollashtirildi.')
     activate_users.short_description = "Tanlangan foydalanuvchilarni faollashtirish"
 
     def deactivate_users(self, request, queryset):
-        updated = queryset.update(is_active=False)
+        updated = update_registers(queryset, is_active=False)
         self.message_user(request, f'{updated} ta foydalanuvchi nofaollashtirildi.')
     deactivate_users.short_description = "Tanlangan foydalanuvchilarni nofaollashtirish"
 
     def mark_as_teachers(self, request, queryset):
-        updated = queryset.update(is_teacher=True)
+        updated = update_registers(queryset, is_teacher=True)
         self.message_user(request, f'{updated} ta foydalanuvchi o\'qituvchi qilib belgilandi.')
     mark_as_teachers.short_description = "Tanlangan foydalanuvchilarni o'qituvchi qilish"
 
@@ -199,19 +194,69 @@ class HemisTableAdmin(admin.ModelAdmin):
     actions = ['sync_with_register', 'clear_register_link']
 
     def sync_with_register(self, request, queryset):
-        synced = 0
-        for obj in queryset:
-            obj._link_with_register()
-            synced += 1
-        self.message_user(request, f'{synced} ta yozuv Register bilan sinxronlashtirildi.')
+        # Tanlangan yozuvlar bitta to'plam bilan bog'lanadi
+        hemis_ids = list(queryset.filter(pnfl__isnull=False).values_list('hemis_id', flat=True))
+        result = link_hemis_batch(hemis_ids, sync_groups=True)
+        self.message_user(
+            request,
+            f"{len(hemis_ids)} ta yozuv Register bilan sinxronlashtirildi "
+            f"({result['linked']} ta bog'landi, {result['groups_added']} ta guruh a'zoligi qo'shildi)."
+        )
     sync_with_register.short_description = "Register bilan sinxronlashtirish"
 
     def clear_register_link(self, request, queryset):
-        updated = queryset.update(register=None)
+        updated = clear_hemis_registers(queryset)
         self.message_user(request, f'{updated} ta yozuvning Register bog\'lanishi tozalandi.')
     clear_register_link.short_description = "Register bog'lanishini tozalash"
 
 
+@admin.register(HemisImportJob)
+class HemisImportJobAdmin(admin.ModelAdmin):
+    list_display = [
+        'id', 'file', 'status', 'upsert', 'processed_rows', 'total_rows',
+        'created_count', 'updated_count', 'error_count', 'created', 'finished_at'
+    ]
+    list_filter = ['status', 'upsert', 'created']
+    readonly_fields = [
+        'status', 'total_rows', 'processed_rows', 'created_count', 'updated_count',
+        'unchanged_count', 'activated_count', 'linked_count', 'error_count', 'query_count',
+        'errors', 'error_message', 'started_at', 'finished_at', 'created', 'updated'
+    ]
+    ordering = ['-created']
+
+
+@admin.register(ImportRun)
+class ImportRunAdmin(admin.ModelAdmin):
+    list_display = [
+        'id', 'file_name', 'mode', 'loader', 'status', 'total_rows', 'created_count',
+        'error_count', 'duration', 'slowest_stage', 'query_count', 'peak_memory_mb', 'created'
+    ]
+    list_filter = ['mode', 'status', 'upsert', 'created']
+    search_fields = ['file_name']
+    readonly_fields = [
+        'job', 'file_name', 'mode', 'loader', 'upsert', 'status', 'total_rows',
+        'created_count', 'updated_count', 'unchanged_count', 'activated_count', 'linked_count',
+        'error_count', 'errors', 'error_message', 'duration', 'timings', 'stage_queries',
+        'query_count', 'peak_memory_mb', 'started_at', 'finished_at', 'created', 'updated'
+    ]
+    ordering = ['-created']
+
+
+@admin.register(GroupDeactivationJob)
+class GroupDeactivationJobAdmin(admin.ModelAdmin):
+    list_display = [
+        'id', 'group', 'status', 'detach_members', 'hemis_detached', 'members_detached',
+        'chunks', 'duration', 'created', 'finished_at'
+    ]
+    list_filter = ['status', 'detach_members', 'created']
+    search_fields = ['group__group_name', 'group__group_id']
+    readonly_fields = [
+        'group', 'status', 'hemis_detached', 'members_detached', 'chunks', 'error_message',
+        'duration', 'started_at', 'finished_at', 'created', 'updated'
+    ]
+    ordering = ['-created']
+
+
 @admin.register(MemberActivity)
 class MemberActivityAdmin(admin.ModelAdmin):
     list_display = [
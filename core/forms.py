@@ -1,4 +1,15 @@
 from django import forms
 
 class ExcelUploadForm(forms.Form):
+    MODE_STANDARD = 'standard'
+    MODE_STREAM = 'stream'
+    MODE_BACKGROUND = 'background'
+    MODE_CHOICES = [
+        (MODE_STANDARD, "Oddiy"),
+        (MODE_STREAM, "Streaming (katta fayllar uchun)"),
+        (MODE_BACKGROUND, "Fonda (juda katta fayllar uchun)"),
+    ]
+
     file = forms.FileField()
+    mode = forms.ChoiceField(choices=MODE_CHOICES, required=False, initial=MODE_STANDARD)
+    upsert = forms.BooleanField(required=False)
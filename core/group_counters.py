@@ -0,0 +1,214 @@
+import logging
+from django.db import connection, transaction
+from django.utils import timezone
+from core.models import HemisTable, Register, TelegramGroup
+
+logger = logging.getLogger(__name__)
+
+# TelegramGroup hisoblagichlari:
+# total_members  - barcha a'zolar (Register.register_groups)
+# active_members - faol (is_active) a'zolar
+# linked_members - HemisTable bilan bog'langan a'zolar
+# A'zolik qo'shilganda/o'chirilganda yoki a'zo holati o'zgarganda faqat
+# tegishli guruhlar farq (delta) bilan yangilanadi, to'liq qayta hisoblash
+# faqat recount_group_counters (tuzatish buyrug'i) da bajariladi.
+TOTAL = 'total_members'
+ACTIVE = 'active_members'
+LINKED = 'linked_members'
+
+
+def membership_counts_sql(condition, hemis_join='h.register_id = r.id', active='r.is_active'):
+    """
+    condition ga mos a'zoliklar guruhlar bo'yicha: (group_id, total, active, linked).
+    hemis_join va active - a'zo bog'langan va faol hisoblanadigan shartlar
+    (reconcile dry-run tuzatishdan keyingi holatni shu orqali hisoblaydi).
+    """
+    register_groups = Register.register_groups.through._meta.db_table
+    register_table = Register._meta.db_table
+    hemis_table = HemisTable._meta.db_table
+    return f"""
+        SELECT rg.telegramgroup_id AS group_id,
+               count(*) AS total,
+               count(*) FILTER (WHERE {active}) AS active,
+               count(h.id) AS linked
+        FROM {register_groups} rg
+        JOIN {register_table} r ON r.id = rg.register_id
+        LEFT JOIN {hemis_table} h ON {hemis_join}
+        WHERE {condition}
+        GROUP BY rg.telegramgroup_id
+    """
+
+
+def change_member_counters(sign, register_ids=None, group_ids=None):
+    """
+    Mavjud a'zoliklarni (register_ids va/yoki group_ids bo'yicha) hisoblagichlarga
+    qo'shish (sign=1, a'zolik qo'shilgandan keyin) yoki ayirish (sign=-1,
+    a'zolik o'chirilishidan oldin). Bitta UPDATE ... FROM so'rovi.
+    Qaytaradi: yangilangan guruhlar soni
+    """
+    conditions, params = [], []
+    if register_ids is not None:
+        conditions.append('rg.register_id = ANY(%s)')
+        params.append(list(register_ids))
+    if group_ids is not None:
+        conditions.append('rg.telegramgroup_id = ANY(%s)')
+        params.append(list(group_ids))
+    if not conditions or any(not values for values in params):
+        return 0
+
+    group_table = TelegramGroup._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {group_table} g
+            SET total_members = GREATEST(g.total_members + %s * d.total, 0),
+                active_members = GREATEST(g.active_members + %s * d.active, 0),
+                linked_members = GREATEST(g.linked_members + %s * d.linked, 0)
+            FROM ({membership_counts_sql(' AND '.join(conditions))}) d
+            WHERE g.id = d.group_id
+            """,
+            [sign, sign, sign, *params]
+        )
+        return cursor.rowcount
+
+
+def shift_member_counter(register_ids, counter, delta):
+    """
+    Registerlar holati o'zgarganda (faollashdi, HemisTable ga bog'landi va h.k.)
+    ularning barcha guruhlarida bitta hisoblagichni delta ga surish.
+    Qaytaradi: yangilangan guruhlar soni
+    """
+    if counter not in TelegramGroup.COUNTER_FIELDS:
+        raise ValueError(f"Noma'lum hisoblagich: {counter}")
+    register_ids = list(register_ids)
+    if not register_ids or not delta:
+        return 0
+
+    group_table = TelegramGroup._meta.db_table
+    register_groups = Register.register_groups.through._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {group_table} g
+            SET {counter} = GREATEST(g.{counter} + %s * d.members, 0)
+            FROM (
+                SELECT telegramgroup_id AS group_id, count(*) AS members
+                FROM {register_groups}
+                WHERE register_id = ANY(%s)
+                GROUP BY telegramgroup_id
+            ) d
+            WHERE g.id = d.group_id
+            """,
+            [delta, register_ids]
+        )
+        return cursor.rowcount
+
+
+def stale_counters_sql(group_ids=None, **counts_options):
+    """
+    Hisoblagichi a'zoliklardan farq qiladigan guruhlar:
+    (id, group_id, eski total/active/linked, yangi total/active/linked) va parametrlar
+    """
+    group_table = TelegramGroup._meta.db_table
+    group_filter, member_filter, params = '', 'true', []
+    if group_ids is not None:
+        # Filtr ichki so'rovda ham: faqat shu guruhlar a'zoliklari sanaladi
+        group_filter, member_filter = 'AND g2.id = ANY(%s)', 'rg.telegramgroup_id = ANY(%s)'
+        params = [list(group_ids), list(group_ids)]
+
+    sql = f"""
+        SELECT g2.id, g2.group_id,
+               g2.total_members AS old_total, g2.active_members AS old_active,
+               g2.linked_members AS old_linked,
+               COALESCE(d.total, 0) AS total, COALESCE(d.active, 0) AS active,
+               COALESCE(d.linked, 0) AS linked
+        FROM {group_table} g2
+        LEFT JOIN ({membership_counts_sql(member_filter, **counts_options)}) d ON d.group_id = g2.id
+        WHERE (g2.total_members, g2.active_members, g2.linked_members)
+              IS DISTINCT FROM (COALESCE(d.total, 0), COALESCE(d.active, 0), COALESCE(d.linked, 0))
+          {group_filter}
+    """
+    return sql, params
+
+
+def counter_changes(rows):
+    """(group_id, eski x3, yangi x3) qatorlari -> [(group_id, eski, yangi)]"""
+    return [(row[0], tuple(row[1:4]), tuple(row[4:7])) for row in rows]
+
+
+def stale_group_counters(group_ids=None, **counts_options):
+    """
+    Faqat SELECT: qayta hisoblashda o'zgaradigan guruhlar (dry-run uchun).
+    Qaytaradi: [(group_id, eski (total, active, linked), yangi (...))]
+    """
+    sql, params = stale_counters_sql(group_ids, **counts_options)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT c.group_id, c.old_total, c.old_active, c.old_linked, c.total, c.active, c.linked
+            FROM ({sql}) c
+            ORDER BY c.group_id
+            """,
+            params
+        )
+        return counter_changes(cursor.fetchall())
+
+
+def recount_group_counters(group_ids=None):
+    """
+    Hisoblagichlarni a'zoliklardan to'liq qayta hisoblash (tuzatish uchun).
+    Faqat qiymati farq qilgan guruhlar yoziladi.
+    Qaytaradi: [(group_id, eski (total, active, linked), yangi (...))]
+    """
+    group_table = TelegramGroup._meta.db_table
+    sql, params = stale_counters_sql(group_ids)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {group_table} g
+            SET total_members = c.total, active_members = c.active, linked_members = c.linked
+            FROM ({sql}) c
+            WHERE c.id = g.id
+            RETURNING g.group_id, c.old_total, c.old_active, c.old_linked, c.total, c.active, c.linked
+            """,
+            params
+        )
+        fixed = counter_changes(cursor.fetchall())
+
+    if fixed:
+        logger.info(f"🔢 {len(fixed)} ta guruh hisoblagichi tuzatildi")
+    return fixed
+
+
+def update_registers(queryset, **values):
+    """
+    Register queryset.update(**values) - signal yubormaydi va auto_now ni
+    qo'llamaydi, shuning uchun bu yerda updated ham yoziladi (o'zgarishlar
+    lentasi uchun), is_active o'zgargan Registerlar guruhlarida esa
+    active_members suriladi.
+    Qaytaradi: yangilangan qatorlar soni
+    """
+    values.setdefault('updated', timezone.now())
+    if 'is_active' not in values:
+        return queryset.update(**values)
+
+    with transaction.atomic():
+        changed = list(queryset.exclude(is_active=values['is_active']).values_list('id', flat=True))
+        updated = queryset.update(**values)
+        shift_member_counter(changed, ACTIVE, 1 if values['is_active'] else -1)
+    return updated
+
+
+def clear_hemis_registers(queryset):
+    """
+    HemisTable queryset.update(register=None) - signal yubormaydi, shuning
+    uchun bog'lanishi uzilgan Registerlar guruhlarida linked_members
+    bu yerda suriladi.
+    Qaytaradi: uzilgan bog'lanishlar soni
+    """
+    with transaction.atomic():
+        linked = queryset.filter(register__isnull=False)
+        register_ids = list(linked.values_list('register_id', flat=True))
+        updated = linked.update(register=None, updated=timezone.now())
+        shift_member_counter(register_ids, LINKED, -1)
+    return updated
@@ -0,0 +1,124 @@
+import logging
+import time
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from core.group_counters import recount_group_counters
+from core.models import GroupDeactivationJob, HemisTable, Register, TelegramGroup
+
+logger = logging.getLogger(__name__)
+
+# Bitta tranzaksiyada o'chiriladigan a'zoliklar soni
+GROUP_JOB_CHUNK_SIZE = getattr(settings, 'GROUP_DEACTIVATION_CHUNK_SIZE', 2000)
+
+# Nofaol guruhda Register a'zoliklari (register_groups) ham o'chirilsinmi.
+# Odatiy holatda faqat HemisTable a'zoliklari ajratiladi: Register a'zoligi
+# bot xabar bergan holat, guruh qayta faollashsa saqlanib qoladi.
+DETACH_MEMBERS = getattr(settings, 'GROUP_DEACTIVATION_DETACH_MEMBERS', False)
+
+
+def enqueue_deactivation(group, detach_members=None):
+    """
+    Nofaol qilingan guruh uchun vazifa qo'shish (navbatda turgan vazifa
+    bo'lsa, yangisi yaratilmaydi). Qaytaradi: (vazifa, yaratildimi)
+    """
+    if detach_members is None:
+        detach_members = DETACH_MEMBERS
+    return GroupDeactivationJob.objects.get_or_create(
+        group=group,
+        status=GroupDeactivationJob.Status.PENDING,
+        defaults={'detach_members': detach_members},
+    )
+
+
+def claim_next_deactivation():
+    """Navbatdagi birinchi vazifani olish va 'running' qilish (skip_locked)"""
+    with transaction.atomic():
+        job = (
+            GroupDeactivationJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=GroupDeactivationJob.Status.PENDING)
+            .order_by('created')
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = GroupDeactivationJob.Status.RUNNING
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at', 'updated'])
+        return job
+
+
+def delete_memberships_chunk(through, group_id, chunk_size):
+    """
+    Guruhning bitta bo'lak a'zoliklarini o'chirish (signal yubormasdan).
+    Qaytaradi: o'chirilgan qatorlar soni
+    """
+    table = through._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            DELETE FROM {table}
+            WHERE id IN (
+                SELECT id FROM {table}
+                WHERE telegramgroup_id = %s
+                LIMIT %s
+            )
+            """,
+            [group_id, chunk_size]
+        )
+        return cursor.rowcount
+
+
+def group_is_active(group_id):
+    return TelegramGroup.objects.filter(pk=group_id, is_active=True).exists()
+
+
+def run_deactivation_job(job, chunk_size=GROUP_JOB_CHUNK_SIZE):
+    """
+    Vazifani bajarish: guruhning HemisTable a'zoliklari (detach_members da
+    Register a'zoliklari ham) bo'laklab, har bir bo'lak alohida qisqa
+    tranzaksiyada o'chiriladi, progress shu bo'lak bilan birga commit bo'ladi.
+    Guruh orada qayta faollashsa, vazifa to'xtatiladi. Oxirida guruh
+    hisoblagichlari qayta hisoblanadi.
+    """
+    started = time.perf_counter()
+    steps = [('hemis_detached', HemisTable.telegram_groups.through)]
+    if job.detach_members:
+        steps.append(('members_detached', Register.register_groups.through))
+
+    try:
+        for counter, through in steps:
+            while True:
+                if group_is_active(job.group_id):
+                    job.status = GroupDeactivationJob.Status.CANCELLED
+                    logger.info(f"↩️ {job}: guruh qayta faollashtirildi, to'xtatildi")
+                    break
+                with transaction.atomic():
+                    deleted = delete_memberships_chunk(through, job.group_id, chunk_size)
+                    if not deleted:
+                        break
+                    setattr(job, counter, getattr(job, counter) + deleted)
+                    job.chunks += 1
+                    job.save(update_fields=[counter, 'chunks', 'updated'])
+            if job.status == GroupDeactivationJob.Status.CANCELLED:
+                break
+
+        recount_group_counters([job.group_id])
+        if job.status != GroupDeactivationJob.Status.CANCELLED:
+            job.status = GroupDeactivationJob.Status.DONE
+            logger.info(
+                f"✅ {job}: {job.hemis_detached} ta HemisTable, "
+                f"{job.members_detached} ta Register a'zoligi ajratildi"
+            )
+
+    except Exception as e:
+        job.status = GroupDeactivationJob.Status.FAILED
+        job.error_message = str(e)
+        logger.exception(f"{job} bajarishda xato: {e}")
+
+    job.duration = round(time.perf_counter() - started, 2)
+    job.finished_at = timezone.now()
+    job.save()
+    return job
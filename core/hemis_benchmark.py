@@ -0,0 +1,288 @@
+import os
+import platform
+import random
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import django
+import pandas as pd
+from django.db import connection
+from django.utils import timezone
+from openpyxl import Workbook
+
+from core.group_counters import recount_group_counters
+from core.hemis_import import CHUNK_SIZE, LOADER_ORM, process_excel_file, process_excel_stream
+from core.models import HemisTable, Register, TelegramGroup
+
+
+# Hemis eksportidagi ustunlar tartibi (A..O). Sarlavhalar HEMIS_SCHEMA da tanilgan
+HEMIS_HEADERS = [
+    'ID', 'F.I.Sh.', 'Fuqarolik', 'Davlat', 'Jinsi', 'Millati', 'Viloyat', 'Tuman',
+    "Tug'ilgan sana", 'Pasport', 'JSHSHIR', 'Mutaxassislik', 'Kurs', "Ta'lim shakli", 'Guruh',
+]
+
+HEMIS_ID_START = 300000000
+PNFL_START = 30000000000000
+
+FIRST_NAMES = ['Ali', 'Vali', 'Hasan', 'Husan', 'Dilnoza', 'Madina', 'Jasur', 'Nodira', 'Otabek', 'Zarina']
+LAST_NAMES = ['Karimov', 'Rahimova', 'Tursunov', 'Yusupova', 'Aliyev', 'Sobirova', 'Qodirov', 'Ergasheva']
+REGIONS = ['Toshkent', 'Samarqand', 'Buxoro', "Farg'ona", 'Xorazm', 'Andijon']
+SPECIALITIES = ['Filologiya', 'Pedagogika', 'Tarix', 'Informatika']
+INVALID_KINDS = ['empty_hemis', 'bad_hemis', 'short_fio', 'bad_pnfl', 'bad_passport']
+
+MODE_STREAM = 'stream'
+MODE_STANDARD = 'standard'
+
+
+def generate_hemis_xlsx(path, rows, dup_ratio=0.02, invalid_ratio=0.02, seed=1):
+    """
+    Hemis eksportiga o'xshash sintetik .xlsx fayl yaratish.
+    i-qatorning asosiy identifikatori: hemis_id = HEMIS_ID_START + i,
+    pnfl = PNFL_START + i. dup_ratio ulushidagi qatorlar oldingi qatorning
+    hemis_id yoki pnfl ini takrorlaydi, invalid_ratio ulushi esa
+    validatsiyadan o'tmaydi.
+
+    Qaytaradi: {'path', 'rows', 'duplicates', 'invalid'}
+    """
+    rng = random.Random(seed)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Talabalar')
+    sheet.append(HEMIS_HEADERS)
+
+    stats = {'path': str(path), 'rows': rows, 'duplicates': 0, 'invalid': 0}
+    for index in range(rows):
+        row = make_hemis_row(rng, index)
+
+        roll = rng.random()
+        if index and roll < dup_ratio:
+            stats['duplicates'] += 1
+            previous = rng.randrange(index)
+            if rng.random() < 0.5:
+                row[0] = HEMIS_ID_START + previous
+            else:
+                row[10] = str(PNFL_START + previous)
+        elif roll < dup_ratio + invalid_ratio:
+            stats['invalid'] += 1
+            break_hemis_row(rng, row)
+
+        sheet.append(row)
+
+    workbook.save(path)
+    return stats
+
+
+def make_hemis_row(rng, index):
+    """Bitta to'g'ri Hemis qatori (15 ustun)"""
+    born = date(1995, 1, 1) + timedelta(days=rng.randrange(3650))
+    # Sana Excel da ham sana, ham matn ko'rinishida uchraydi
+    born_value = rng.choice([
+        datetime(born.year, born.month, born.day),
+        born.strftime('%d.%m.%Y'),
+        born.isoformat(),
+    ])
+    return [
+        HEMIS_ID_START + index,
+        f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}",
+        "O'zbekiston fuqarosi",
+        "O'zbekiston",
+        rng.choice(['Erkak', 'Ayol']),
+        "O'zbek",
+        rng.choice(REGIONS),
+        'Markaz',
+        born_value,
+        f"A{chr(65 + index % 26)}{index % 10000000:07d}",
+        str(PNFL_START + index),
+        rng.choice(SPECIALITIES),
+        f"{rng.randint(1, 4)}-kurs",
+        'Masofaviy',
+        f"{rng.randint(101, 140)}-{rng.randint(20, 24)}",
+    ]
+
+
+def break_hemis_row(rng, row):
+    """Qatorni tasodifiy usulda validatsiyadan o'tmaydigan qilish"""
+    kind = rng.choice(INVALID_KINDS)
+    if kind == 'empty_hemis':
+        row[0] = None
+    elif kind == 'bad_hemis':
+        row[0] = f"ID-{row[0]}"
+    elif kind == 'short_fio':
+        row[1] = 'Al'
+    elif kind == 'bad_pnfl':
+        row[10] = row[10][:10]
+    else:
+        row[9] = row[9][:4]
+
+
+def seed_registers(max_rows, register_ratio, seed=1):
+    """
+    Bog'lash bosqichi ishlashi uchun Register va guruhlar yaratish:
+    asosiy identifikatorlarning register_ratio ulushiga mos nofaol Register.
+    """
+    if register_ratio <= 0:
+        return 0
+
+    rng = random.Random(seed)
+    groups = TelegramGroup.objects.bulk_create([
+        TelegramGroup(group_id=-1000000 - number, group_name=f"Benchmark {number}")
+        for number in range(10)
+    ])
+    step = max(1, round(1 / register_ratio))
+    registers = Register.objects.bulk_create([
+        Register(
+            telegram_id=5000000000 + index,
+            hemis_id=HEMIS_ID_START + index,
+            pnfl=str(PNFL_START + index),
+            is_active=False,
+        )
+        for index in range(0, max_rows, step)
+    ], batch_size=5000)
+
+    Through = Register.register_groups.through
+    Through.objects.bulk_create([
+        Through(register_id=register.id, telegramgroup_id=group.id)
+        for register in registers
+        for group in rng.sample(groups, 2)
+    ], batch_size=5000)
+    recount_group_counters([group.id for group in groups])
+    return len(registers)
+
+
+def reset_import_tables():
+    """Har bir o'lchovdan oldin Hemis jadvalini tozalash, Registerlarni nofaol qilish"""
+    if connection.vendor == 'postgresql':
+        tables = [HemisTable.telegram_groups.through._meta.db_table, HemisTable._meta.db_table]
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY")
+    else:
+        HemisTable.objects.all().delete()
+    Register.objects.update(is_active=False)
+    recount_group_counters()
+
+
+def run_case(path, mode, loader, upsert=False, trace_memory=False):
+    """
+    Bitta importni o'lchash: bosqichlar vaqti, so'rovlar soni.
+    trace_memory=True bo'lsa, tracemalloc bilan xotira cho'qqisi ham o'lchanadi
+    (tracemalloc importni bir necha barobar sekinlashtiradi, shuning uchun
+    vaqt va xotira alohida yurgizishlarda o'lchanadi).
+    """
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+
+    if mode == MODE_STANDARD:
+        result = process_excel_file(path, upsert=upsert)
+    else:
+        result = process_excel_stream(path, upsert=upsert, loader=loader)
+
+    wall_time = time.perf_counter() - started
+    peak_memory_mb = None
+    if trace_memory:
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_memory_mb = round(peak_memory / 1024 / 1024, 2)
+
+    return {
+        'mode': mode,
+        'loader': result['loader'],
+        'upsert': upsert,
+        'wall_time': round(wall_time, 4),
+        'rows_per_second': round(result['total_rows'] / wall_time) if wall_time else None,
+        'timings': result['timings'],
+        'stage_queries': result['stage_queries'],
+        'query_count': result['query_count'],
+        'peak_memory_mb': peak_memory_mb,
+        'peak_rss_mb': result['peak_memory_mb'],
+        'total_rows': result['total_rows'],
+        'created_count': result['created_count'],
+        'updated_count': result.get('updated_count', 0),
+        'unchanged_count': result.get('unchanged_count', 0),
+        'linked_count': result['linked_count'],
+        'activated_count': result['activated_count'],
+        'error_count': len(result['errors']),
+    }
+
+
+def run_benchmark(sizes, workdir, modes=(MODE_STREAM,), loader=LOADER_ORM,
+                  dup_ratio=0.02, invalid_ratio=0.02, register_ratio=0.1,
+                  reimport=False, memory=True, seed=1, log=print):
+    """
+    Har bir o'lcham va rejim uchun import o'lchovlari.
+    Bazani tozalab ishlatadi - faqat test bazasida chaqirilishi kerak.
+    reimport=True bo'lsa, har bir importdan keyin o'sha fayl upsert rejimida
+    qayta import qilinadi (o'zgarmagan fayl).
+    memory=True bo'lsa, xotira cho'qqisi uchun har bir import yana bir marta
+    tracemalloc bilan yurgiziladi.
+
+    Qaytaradi: JSON ga yoziladigan hisobot lug'ati
+    """
+    os.makedirs(workdir, exist_ok=True)
+    report = {
+        'generated_at': timezone.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'pandas': pd.__version__,
+            'database': connection.vendor,
+            'chunk_size': CHUNK_SIZE,
+        },
+        'parameters': {
+            'sizes': list(sizes),
+            'modes': list(modes),
+            'loader': loader,
+            'dup_ratio': dup_ratio,
+            'invalid_ratio': invalid_ratio,
+            'register_ratio': register_ratio,
+            'reimport': reimport,
+            'memory': memory,
+            'seed': seed,
+        },
+        'files': [],
+        'results': [],
+    }
+
+    registers = seed_registers(max(sizes), register_ratio, seed)
+    log(f"👥 {registers} ta Register yaratildi")
+
+    for rows in sizes:
+        path = os.path.join(workdir, f"hemis_{rows}_{dup_ratio}_{invalid_ratio}_{seed}.xlsx")
+        if os.path.exists(path):
+            stats = {'path': path, 'rows': rows, 'cached': True}
+        else:
+            started = time.perf_counter()
+            stats = generate_hemis_xlsx(path, rows, dup_ratio, invalid_ratio, seed)
+            stats['generate_time'] = round(time.perf_counter() - started, 2)
+        report['files'].append(stats)
+        log(f"📄 {path}")
+
+        for mode in modes:
+            reset_import_tables()
+            cases = [run_case(path, mode, loader)]
+            if reimport:
+                cases.append(run_case(path, mode, loader, upsert=True))
+
+            if memory:
+                reset_import_tables()
+                for case in cases:
+                    traced = run_case(path, mode, loader, upsert=case['upsert'], trace_memory=True)
+                    case['peak_memory_mb'] = traced['peak_memory_mb']
+
+            for case in cases:
+                case['rows'] = rows
+                report['results'].append(case)
+                log(format_case(case))
+
+    return report
+
+
+def format_case(case):
+    """O'lchov natijasini bir qatorli matnga aylantirish"""
+    timings = ', '.join(f"{name} {value:.2f}s" for name, value in case['timings'].items())
+    upsert = ' upsert' if case['upsert'] else ''
+    return (
+        f"{case['rows']:>7} qator | {case['mode']}/{case['loader']}{upsert} | "
+        f"{case['wall_time']:.2f}s ({timings}) | {case['query_count']} so'rov | "
+        f"{case['peak_memory_mb'] if case['peak_memory_mb'] is not None else '-'} MB"
+    )
@@ -0,0 +1,756 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.utils import timezone
+from django.core.exceptions import ValidationError
+from openpyxl import load_workbook
+from core.models import HEMIS_FINGERPRINT_FIELDS, HemisTable, ImportRun, hemis_fingerprint
+from core.hemis_loader import copy_hemis_records, copy_supported, find_conflicts
+from core.hemis_parallel import iter_parallel_frames, local_path
+from core.hemis_schema import apply_schema, resolve_columns, typed_frame
+from core.linking import link_hemis_batch
+
+logger = logging.getLogger(__name__)
+
+# Streaming rejimda bir vaqtda qayta ishlanadigan qatorlar soni
+CHUNK_SIZE = getattr(settings, 'HEMIS_IMPORT_CHUNK_SIZE', 2000)
+
+# Yangi yozuvlarni saqlash usuli: ORM bulk_create yoki PostgreSQL COPY
+LOADER_ORM = 'orm'
+LOADER_COPY = 'copy'
+BULK_LOADER = getattr(settings, 'HEMIS_IMPORT_LOADER', LOADER_COPY)
+
+
+BORN_FORMATS = ['%Y-%m-%d', '%d.%m.%Y', '%d/%m/%Y']
+
+# Tozalangan bo'lak ustunlari (hemis_id dan tashqari)
+CLEAN_COLUMNS = ['fio', 'born', 'passport', 'pnfl', 'course', 'student_group', 'fingerprint']
+
+
+class QueryCounter:
+    """Bazaga yuborilgan so'rovlarni sanash (connection.execute_wrapper uchun)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def current_memory_mb():
+    """Jarayonning joriy xotirasi (RSS, MB). /proc bo'lmagan tizimlarda None"""
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+
+
+class StageTimer:
+    """
+    Import bosqichlari bo'yicha sarflangan vaqt va so'rovlar sonini yig'ish.
+    Xotira cho'qqisi har bir bosqich chegarasida olingan RSS qiymatlarining
+    eng kattasi (tracemalloc importni bir necha barobar sekinlashtiradi).
+    """
+
+    STAGES = ImportRun.STAGES
+
+    def __init__(self, query_counter):
+        self.query_counter = query_counter
+        self.timings = dict.fromkeys(self.STAGES, 0.0)
+        self.queries = dict.fromkeys(self.STAGES, 0)
+        self.peak_memory_mb = current_memory_mb()
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        queries = self.query_counter.count
+        try:
+            yield
+        finally:
+            self.timings[name] += time.perf_counter() - started
+            self.queries[name] += self.query_counter.count - queries
+            memory = current_memory_mb()
+            if memory is not None:
+                self.peak_memory_mb = max(self.peak_memory_mb or 0, memory)
+
+    def as_dict(self):
+        return {
+            'timings': {name: round(value, 4) for name, value in self.timings.items()},
+            'stage_queries': dict(self.queries),
+            'peak_memory_mb': round(self.peak_memory_mb, 2) if self.peak_memory_mb is not None else None,
+        }
+
+
+class HemisKeyIndex:
+    """
+    Import davomida band kalitlarning xotiradagi indeksi (O(1) tekshiruv).
+    Kalitlar normallashtirilgan: hemis_id - int ning matni, PNFL - raqamlar,
+    passport - katta harflar. PNFL va passport egasining hemis_id si bilan saqlanadi.
+    """
+
+    def __init__(self, hemis_ids=None, pnfls=None, passports=None):
+        self.hemis_ids = hemis_ids if hemis_ids is not None else set()
+        self.pnfls = pnfls if pnfls is not None else {}
+        self.passports = passports if passports is not None else {}
+
+    @classmethod
+    def load(cls, upsert=False):
+        """
+        Bazadagi kalitlarni bitta so'rov bilan yuklash.
+        Upsert rejimida bazadagi hemis_id lar o'tkazilmaydi, shuning uchun
+        hemis_ids faqat fayl ichidagi takrorlar bilan to'ldiriladi.
+        """
+        index = cls()
+        rows = HemisTable.objects.values_list('hemis_id', 'pnfl', 'passport')
+        for hemis_id, pnfl, passport in rows.iterator(chunk_size=10000):
+            key = str(hemis_id)
+            if not upsert:
+                index.hemis_ids.add(key)
+            if pnfl:
+                index.pnfls[pnfl] = key
+            if passport:
+                index.passports[passport.strip().upper()] = key
+        return index
+
+    def add(self, hemis_keys, pnfls, passports):
+        """Qabul qilingan qatorlar kalitlarini qo'shish (bo'sh qiymatlar o'tkaziladi)"""
+        self.hemis_ids.update(hemis_keys)
+        for mapping, values in ((self.pnfls, pnfls), (self.passports, passports)):
+            present = values != ''
+            mapping.update(zip(values[present], hemis_keys[present]))
+
+
+@transaction.atomic
+def process_excel_data(df, upsert=False):
+    """Excel ma'lumotlarini (read_excel_frame natijasi) qayta ishlash"""
+    return process_frames([apply_schema(df)], upsert=upsert)
+
+
+def process_excel_file(excel_file, upsert=False):
+    """Butun faylni pandas bilan o'qib qayta ishlash (o'qish vaqti 'read' bosqichiga qo'shiladi)"""
+    started = time.perf_counter()
+    df = read_excel_frame(excel_file)
+    read_time = time.perf_counter() - started
+
+    result = process_excel_data(df, upsert=upsert)
+    result['timings']['read'] = round(result['timings']['read'] + read_time, 4)
+    return result
+
+
+def process_excel_stream(excel_file, chunk_size=CHUNK_SIZE, upsert=False, loader=None, on_chunk=None):
+    """
+    Excel faylni DataFrame ga yuklamasdan, bo'laklab qayta ishlash.
+    Har bir bo'lak alohida commit qilinadi (ImportRun ga qarang).
+    """
+    return process_frames(
+        iter_excel_chunks(excel_file, chunk_size),
+        upsert=upsert, on_chunk=on_chunk, loader=loader or bulk_loader()
+    )
+
+
+def process_excel_parallel(excel_file, workers=None, upsert=False, loader=None, on_chunk=None):
+    """
+    Kitob varaqlarini bir nechta jarayonda o'qib tozalash, natijani bitta
+    (joriy) jarayonda bazaga yozish. Har bir bo'lak alohida commit qilinadi
+    (ImportRun ga qarang). Faqat boshqaruv buyrug'i va fondagi vazifalar
+    uchun - veb so'rov ichida ishlatilmaydi. Tezlanish faqat ko'p varaqli
+    kitoblarda: bitta varaq ketma-ket (streaming kabi) o'qiladi.
+    """
+    with local_path(excel_file) as path:
+        return process_frames(
+            iter_parallel_frames(path, workers),
+            upsert=upsert, on_chunk=on_chunk, loader=loader or bulk_loader(), prepared=True
+        )
+
+
+def bulk_loader():
+    """Katta importlar uchun saqlash usuli (COPY faqat PostgreSQL da)"""
+    if BULK_LOADER == LOADER_COPY and copy_supported():
+        return LOADER_COPY
+    return LOADER_ORM
+
+
+def process_frames(frames, upsert=False, on_chunk=None, loader=LOADER_ORM, prepared=False):
+    """
+    HEMIS_SCHEMA bo'yicha o'girilgan DataFrame bo'laklarini qayta ishlash.
+    Har bir bo'lak ustunma-ustun tozalanadi va o'z tranzaksiyasida saqlanadi
+    (tashqi atomic ichida savepoint, aks holda alohida commit).
+
+    upsert=True bo'lsa, mavjud hemis_id lar o'tkazib yuborilmaydi: bazadagi
+    yozuv bilan solishtiriladi va faqat o'zgargan maydonlari yangilanadi.
+    on_chunk(result) har bir bo'lak saqlangandan keyin, shu tranzaksiya
+    ichida chaqiriladi (progress uchun).
+    loader=LOADER_COPY bo'lsa, yangi yozuvlar COPY orqali yuklanadi.
+    prepared=True bo'lsa, bo'laklar allaqachon prepare_frame dan o'tgan
+    (masalan, hemis_parallel jarayonlarida). Bo'lakning attrs['sheet']
+    qiymati bo'lsa, xatolar varaq nomi bilan boshlanadi.
+    result['timings'] va result['stage_queries'] - bosqichlar (read, clean,
+    validate, insert, link, activate) bo'yicha vaqt (soniya) va so'rovlar
+    soni, result['peak_memory_mb'] - xotira cho'qqisi.
+    """
+    result = {
+        'loader': loader,
+        'created_count': 0,
+        'activated_count': 0,
+        'linked_count': 0,
+        'errors': [],
+        'total_rows': 0,
+        'query_count': 0,
+    }
+    if upsert:
+        result['updated_count'] = 0
+        result['unchanged_count'] = 0
+
+    query_counter = QueryCounter()
+    stages = StageTimer(query_counter)
+    with connection.execute_wrapper(query_counter):
+        with stages.stage('validate'):
+            key_index = HemisKeyIndex.load(upsert)
+
+        frames = iter(frames)
+        while True:
+            with stages.stage('read'):
+                frame = next(frames, None)
+            if frame is None:
+                break
+
+            with transaction.atomic():
+                process_chunk(frame, key_index, upsert, loader, result, stages, prepared)
+                result['query_count'] = query_counter.count
+                result.update(stages.as_dict())
+                if on_chunk:
+                    on_chunk(result)
+
+    result['query_count'] = query_counter.count
+    result.update(stages.as_dict())
+    return result
+
+
+def process_chunk(frame, key_index, upsert, loader, result, stages, prepared=False):
+    """Bitta bo'lakni tozalash va saqlash, natijani result ga qo'shish"""
+    result['total_rows'] += len(frame)
+    errors_before = len(result['errors'])
+
+    if not prepared:
+        with stages.stage('clean'):
+            frame = prepare_frame(frame)
+
+    with stages.stage('validate'):
+        clean_df, frame_errors = clean_frame(frame, key_index, upsert=upsert, prepared=True)
+        result['errors'].extend(frame_errors)
+
+    with stages.stage('insert'):
+        new_df = clean_df
+        if upsert:
+            # Fingerprint mos kelgan qatorlar umuman o'qilmaydi va yozilmaydi
+            stored = get_stored_fingerprints(clean_df)
+            is_stored = clean_df['hemis_id'].isin(list(stored))
+            new_df = clean_df[~is_stored]
+            stored_df = clean_df[is_stored]
+            is_same = stored_df['fingerprint'] == stored_df['hemis_id'].map(stored)
+            changed_df = stored_df[~is_same]
+
+            changes = find_changed_records(frame_to_records(changed_df), get_stored_records(changed_df))
+            updated_count = update_hemis_records(changes)
+            result['updated_count'] += updated_count
+            result['unchanged_count'] += len(stored_df) - updated_count
+
+        # Yangi yozuvlarni saqlash
+        if loader == LOADER_COPY:
+            created_count, load_errors = copy_hemis_records(new_df)
+        else:
+            created_count, load_errors = save_hemis_frame(new_df)
+        result['errors'].extend(load_errors)
+        result['created_count'] += created_count
+
+    # Register bilan bog'lash va faollashtirish (bo'lak uchun bir nechta to'plamli so'rov)
+    link_result = link_registers(clean_df, stages)
+    result['linked_count'] += link_result['linked']
+    result['activated_count'] += link_result['activated']
+
+    sheet = frame.attrs.get('sheet')
+    if sheet:
+        result['errors'][errors_before:] = [
+            f"{sheet}: {error}" for error in result['errors'][errors_before:]
+        ]
+
+
+def read_excel_frame(excel_file):
+    """
+    Butun faylni pandas bilan o'qish. dtype=object tufayli bo'sh katakli
+    raqamli ustunlar float64 ga aylanmaydi (300001 -> 300001.0 emas).
+    """
+    return pd.read_excel(excel_source(excel_file), engine='openpyxl', dtype=object)
+
+
+def excel_source(excel_file):
+    """
+    Katta yuklamalar vaqtinchalik faylga yoziladi (FILE_UPLOAD_MAX_MEMORY_SIZE),
+    bunday holatda fayl yo'li qaytariladi va openpyxl zip arxivni diskdan o'qiydi
+    """
+    if hasattr(excel_file, 'temporary_file_path'):
+        return excel_file.temporary_file_path()
+    return excel_file
+
+
+def iter_excel_chunks(excel_file, chunk_size=CHUNK_SIZE):
+    """
+    Excel qatorlarini chunk_size tadan DataFrame bo'laklariga yig'ish.
+    Ustunlar sarlavha qatori bo'yicha aniqlanadi.
+    """
+    rows_iter = iter_excel_rows(excel_file, header=True)
+    columns = resolve_columns(next(rows_iter, ()))
+
+    rows = []
+    start = 0
+    for row in rows_iter:
+        rows.append(row)
+        if len(rows) >= chunk_size:
+            yield rows_to_frame(rows, start, columns)
+            start += len(rows)
+            rows = []
+
+    if rows:
+        yield rows_to_frame(rows, start, columns)
+
+
+def rows_to_frame(rows, start, columns=None):
+    """openpyxl qatorlaridan (tuple) sxema bo'yicha o'girilgan DataFrame bo'lagi yasash"""
+    return typed_frame(rows, pd.RangeIndex(start, start + len(rows)), columns)
+
+
+def count_excel_rows(excel_file):
+    """
+    Birinchi varaqdagi ma'lumot qatorlari soni (sarlavhasiz, taxminiy).
+    Odatda varaqning <dimension> qiymatidan olinadi, u yo'q bo'lsa
+    (masalan, write-only rejimda yozilgan fayllar) qatorlar sanab chiqiladi.
+    """
+    workbook = load_workbook(excel_source(excel_file), read_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        max_row = sheet.max_row
+        if max_row is None:
+            max_row = sum(1 for _ in sheet.iter_rows(values_only=True))
+        return max((max_row or 1) - 1, 0)
+    finally:
+        workbook.close()
+
+
+def iter_excel_rows(excel_file, header=False):
+    """
+    Birinchi varaq qatorlarini read-only openpyxl kursori bilan o'qish.
+    Oxiridagi bo'sh qatorlar tashlab ketiladi (pandas kabi). Sarlavha
+    qatori header=True bo'lsa birinchi bo'lib qaytariladi, aks holda tashlanadi.
+    """
+    workbook = load_workbook(excel_source(excel_file), read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        if header:
+            yield next(sheet.iter_rows(max_row=1, values_only=True), ())
+        blank_rows = 0
+        for row in sheet.iter_rows(min_row=2, values_only=True):
+            if all(value is None for value in row):
+                blank_rows += 1
+                continue
+
+            # Oradagi bo'sh qatorlar pandas dagi kabi saqlanadi
+            for _ in range(blank_rows):
+                yield ()
+            blank_rows = 0
+            yield row
+    finally:
+        workbook.close()
+
+
+def prepare_frame(frame):
+    """
+    Bo'lakning bazaga va boshqa bo'laklarga bog'liq bo'lmagan qismini
+    hisoblash: formatlarni tekshirish, sanani parse qilish, fingerprint.
+    frame ustunlari sxema bo'yicha allaqachon matnga o'girilgan.
+    Alohida jarayonlarda ham bajarilishi mumkin.
+    """
+    hemis = frame['hemis_id']
+    pnfl = frame['pnfl']
+    passport = frame['passport'].str.upper()
+
+    # PNFL raqamlarini ajratish
+    pnfl_digits = pnfl.str.replace(r'\D', '', regex=True)
+    hemis_int_ok = hemis.str.fullmatch(r'[+-]?\d+').fillna(False).astype(bool)
+    # Normallashtirilgan kalit: '0100' va '100' bir xil yozuv
+    hemis_key = hemis.copy()
+    hemis_key[hemis_int_ok] = hemis[hemis_int_ok].map(lambda value: str(int(value)))
+
+    prepared = pd.DataFrame({
+        'hemis': hemis,
+        'hemis_key': hemis_key,
+        'hemis_int_ok': hemis_int_ok,
+        'fio': frame['fio'],
+        'born': parse_born_column(frame['born']),
+        'passport': passport,
+        'pnfl_digits': pnfl_digits,
+        'pnfl': pnfl_digits.where(pnfl_digits.str.len() == 14, ''),
+        'course': frame['course'],
+        'student_group': frame['student_group'],
+    }, index=frame.index)
+    prepared['fingerprint'] = fingerprint_column(prepared)
+    return prepared
+
+
+def clean_frame(frame, key_index, upsert=False, prepared=False):
+    """
+    Bo'lakni ustunma-ustun validatsiya qilish va tozalash.
+
+    key_index - band kalitlar (HemisKeyIndex). Xatolar qatorma-qator
+    tekshiruvdagi kabi tartibda va matnda qaytariladi. Qabul qilingan
+    qatorlarning kalitlari key_index ga qo'shiladi, shuning uchun keyingi
+    bo'laklar takrorlarni ko'radi.
+    prepared=True bo'lsa, frame allaqachon prepare_frame dan o'tgan.
+    """
+    if not prepared:
+        frame = prepare_frame(frame)
+
+    hemis = frame['hemis']
+    hemis_key = frame['hemis_key']
+    hemis_int_ok = frame['hemis_int_ok']
+    passport = frame['passport']
+    pnfl_digits = frame['pnfl_digits']
+    clean_pnfl = frame['pnfl']
+
+    hemis_empty = hemis == ''
+    fio_bad = frame['fio'].str.len() < 3
+    pnfl_len_bad = (pnfl_digits != '') & (pnfl_digits.str.len() != 14)
+    pnfl_owner = pnfl_digits.map(key_index.pnfls)
+    pnfl_in_db = (pnfl_digits != '') & pnfl_owner.notna()
+    passport_bad = (passport != '') & (passport.str.len() != 9)
+    has_passport = (passport != '') & ~passport_bad
+    passport_owner = passport.map(key_index.passports)
+    passport_in_db = has_passport & passport_owner.notna()
+    if upsert:
+        # Yozuvning o'z PNFL i va passporti band hisoblanmaydi
+        pnfl_in_db &= pnfl_owner != hemis_key
+        passport_in_db &= passport_owner != hemis_key
+
+    # Yangi yozuv sifatida barcha tekshiruvlardan o'tadigan qatorlar
+    base_ok = (
+        ~hemis_empty & hemis_int_ok & ~fio_bad & ~pnfl_len_bad
+        & ~pnfl_in_db & ~passport_bad & ~passport_in_db
+    )
+
+    in_db = ~hemis_empty & hemis_key.isin(key_index.hemis_ids)
+    has_pnfl = clean_pnfl != ''
+
+    # Mavjud hemis_id -> o'tkazib yuborish. Fayl ichidagi takrorlar
+    # (oldinroq qabul qilingan hemis_id, PNFL yoki passport) faqat kaliti
+    # takrorlangan qatorlar uchun bitta tartibli o'tishda aniqlanadi
+    skip = in_db.copy()
+    pnfl_dup = pd.Series(False, index=frame.index)
+    passport_dup = pd.Series(False, index=frame.index)
+    accepted = base_ok | (in_db & hemis_int_ok)
+    dependent = (
+        (~hemis_empty & hemis_key.duplicated(keep=False))
+        | (has_pnfl & clean_pnfl.duplicated(keep=False))
+        | (has_passport & passport.duplicated(keep=False))
+    )
+    if dependent.any():
+        rows = pd.DataFrame({
+            'hemis_key': hemis_key, 'pnfl': clean_pnfl, 'passport': passport,
+            'hemis_empty': hemis_empty, 'hemis_int_ok': hemis_int_ok, 'base_ok': base_ok,
+            'in_db': in_db, 'has_pnfl': has_pnfl, 'has_passport': has_passport,
+        })[dependent]
+        resolved = resolve_file_duplicates(rows)
+        skip[dependent] = resolved['skip']
+        pnfl_dup[dependent] = resolved['pnfl_dup']
+        passport_dup[dependent] = resolved['passport_dup']
+        accepted[dependent] = resolved['accepted']
+
+    # Xatolarni tekshiruvlar tartibida tanlash
+    normal = ~hemis_empty & ~skip
+    reasons = np.select(
+        [
+            hemis_empty,
+            skip & ~hemis_int_ok,
+            normal & fio_bad,
+            normal & pnfl_len_bad,
+            normal & (pnfl_in_db | pnfl_dup),
+            normal & passport_bad,
+            normal & (passport_in_db | passport_dup),
+            normal & ~hemis_int_ok,
+        ],
+        [
+            "Hemis ID bo'sh",
+            'int',
+            "FIO bo'sh yoki juda qisqa",
+            "PNFL 14 ta raqam bo'lishi kerak",
+            "PNFL allaqachon mavjud",
+            "Passport 9 ta belgi bo'lishi kerak",
+            "Passport allaqachon mavjud",
+            'int',
+        ],
+        default='',
+    )
+    reasons = pd.Series(reasons, index=frame.index)
+
+    errors = []
+    for index, reason in reasons[reasons != ''].items():
+        if reason == 'int':
+            reason = f"invalid literal for int() with base 10: {hemis[index]!r}"
+        errors.append(f"Qator {index + 2}: {reason}")
+
+    # O'tkazib yuborilgan qatorlar yozilmaydi
+    write = accepted & ~skip
+    clean_df = frame.loc[write, CLEAN_COLUMNS].copy()
+    clean_df['hemis_id'] = hemis_key[write].map(int)
+    clean_df = clean_df[['hemis_id', *CLEAN_COLUMNS]]
+
+    # Takrorlanishni oldini olish
+    key_index.add(
+        hemis_key[accepted],
+        clean_pnfl[accepted],
+        passport[write].reindex(hemis_key[accepted].index, fill_value=''),
+    )
+
+    return clean_df, errors
+
+
+def resolve_file_duplicates(rows):
+    """
+    Kaliti fayl ichida takrorlangan qatorlarni qatorma-qator tekshiruv
+    tartibida bitta o'tishda hal qilish. Boshqa qatorlar bu qatorlar bilan
+    kalit bo'lishmaydi, shuning uchun natijaga ta'sir qilmaydi.
+
+    rows - clean_frame dagi tekshiruv ustunlari (asl tartibda).
+    Qaytaradi: skip, pnfl_dup, passport_dup, accepted ustunli DataFrame
+    """
+    seen_hemis, seen_pnfl, seen_passport = set(), set(), set()
+    resolved = []
+    for row in rows.itertuples(index=False):
+        if row.hemis_empty:
+            resolved.append((False, False, False, False))
+            continue
+
+        # Mavjud yoki oldinroq qabul qilingan hemis_id -> o'tkazib yuborish
+        if row.in_db or row.hemis_key in seen_hemis:
+            resolved.append((True, False, False, row.hemis_int_ok))
+            if row.hemis_int_ok:
+                seen_pnfl.add(row.pnfl)
+            continue
+
+        pnfl_dup = row.has_pnfl and row.pnfl in seen_pnfl
+        # Passport faqat yoziladigan qatorlar orasida band bo'ladi
+        passport_dup = row.has_passport and row.passport in seen_passport
+        accepted = row.base_ok and not pnfl_dup and not passport_dup
+        resolved.append((False, pnfl_dup, passport_dup, accepted))
+        if accepted:
+            seen_hemis.add(row.hemis_key)
+            seen_pnfl.add(row.pnfl)
+            seen_passport.add(row.passport)
+
+    return pd.DataFrame(
+        resolved, index=rows.index, columns=['skip', 'pnfl_dup', 'passport_dup', 'accepted'], dtype=bool
+    )
+
+
+def parse_born_column(values):
+    """Tug'ilgan sana ustunini bir nechta format bo'yicha parse qilish"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        parsed = values
+    else:
+        # Matnlarni tozalash, datetime obyektlarini o'zgartirmaslik
+        values = values.astype(object)
+        is_text = values.map(lambda value: isinstance(value, str)).astype(bool)
+        values[is_text] = values[is_text].str.strip()
+
+        parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+        for fmt in BORN_FORMATS:
+            missing = parsed.isna() & values.notna()
+            if not missing.any():
+                break
+            parsed[missing] = pd.to_datetime(values[missing], format=fmt, errors='coerce')
+
+    return parsed.dt.date.astype(object).where(parsed.notna(), None)
+
+
+def fingerprint_column(clean_df):
+    """Har bir tozalangan qator uchun HemisTable.fingerprint qiymati"""
+    columns = [clean_df[field] for field in HEMIS_FINGERPRINT_FIELDS]
+    return pd.Series(
+        [hemis_fingerprint(values) for values in zip(*columns)],
+        index=clean_df.index, dtype=object
+    )
+
+
+def frame_to_records(clean_df):
+    """Tozalangan bo'lakdan HemisTable uchun lug'atlar ro'yxati"""
+    # Bo'sh passport/pnfl NULL sifatida saqlanadi, aks holda unique
+    # cheklov bo'yicha faqat bitta '' li yozuv sig'adi
+    return clean_df.replace({'passport': {'': None}, 'pnfl': {'': None}}).to_dict('records')
+
+
+# Upsert rejimida solishtiriladigan maydonlar
+UPSERT_FIELDS = HEMIS_FINGERPRINT_FIELDS
+
+
+def get_stored_fingerprints(clean_df):
+    """Bo'lakdagi hemis_id larning bazadagi fingerprintlari: {hemis_id: fingerprint}"""
+    return dict(
+        HemisTable.objects.filter(hemis_id__in=clean_df['hemis_id'].tolist())
+        .values_list('hemis_id', 'fingerprint')
+    )
+
+
+def get_stored_records(clean_df):
+    """Bo'lakdagi hemis_id larga mos bazadagi yozuvlar: {hemis_id: HemisTable}"""
+    if clean_df.empty:
+        return {}
+    return HemisTable.objects.only('id', 'hemis_id', *UPSERT_FIELDS).in_bulk(
+        clean_df['hemis_id'].tolist(), field_name='hemis_id'
+    )
+
+
+def find_changed_records(records, stored):
+    """
+    Bazada mavjud yozuvlarni solishtirish: [(obyekt, [o'zgargan maydonlar])].
+    Maydonlari o'zgarmagan, lekin fingerprinti eski (yoki bo'sh) yozuvlar
+    ham bo'sh ro'yxat bilan qaytariladi - faqat fingerprint yangilanadi.
+    """
+    changes = []
+    for record in records:
+        obj = stored.get(record['hemis_id'])
+        if obj is None:
+            continue
+
+        changed_fields = [
+            field for field in UPSERT_FIELDS
+            if (getattr(obj, field) or None) != (record[field] or None)
+        ]
+        for field in changed_fields:
+            setattr(obj, field, record[field])
+        obj.fingerprint = record['fingerprint']
+        changes.append((obj, changed_fields))
+
+    return changes
+
+
+def update_hemis_records(changes):
+    """
+    O'zgargan yozuvlarni bir xil maydonlar to'plami bo'yicha guruhlab bulk_update qilish.
+    Baza xatosi bo'lakning tranzaksiyasini bekor qiladi (qisman yangilanish
+    o'zgarmagan deb hisoblanmaydi).
+    Qaytaradi: maydonlari haqiqatan o'zgargan yozuvlar soni
+    """
+    if not changes:
+        return 0
+
+    now = timezone.now()
+    groups = {}
+    for obj, changed_fields in changes:
+        if changed_fields:
+            obj.updated = now
+        groups.setdefault(tuple(changed_fields), []).append(obj)
+
+    updated = 0
+    for fields, objects in groups.items():
+        update_fields = [*fields, 'fingerprint', 'updated'] if fields else ['fingerprint']
+        try:
+            HemisTable.objects.bulk_update(objects, update_fields)
+        except DatabaseError:
+            logger.exception(f"Yangilash xatosi: {len(objects)} ta yozuv, maydonlar: {', '.join(update_fields)}")
+            raise
+        if fields:
+            updated += len(objects)
+    return updated
+
+
+def link_registers(clean_df, stages=None):
+    """
+    Bo'lakdagi PNFL li yozuvlarni Register bilan bog'lash, Registerlarni
+    faollashtirish va guruhlarni ko'chirish (signallar bulk_create/COPY da ishlamaydi).
+    Xato bo'lsa, bo'lak bog'lanmagan holda saqlanib qolmaydi - butunlay bekor qilinadi.
+    """
+    hemis_ids = clean_df.loc[clean_df['pnfl'].str.len() == 14, 'hemis_id'].tolist()
+    try:
+        return link_hemis_batch(hemis_ids, stages=stages)
+    except DatabaseError:
+        logger.exception(f"Bog'lash xatosi: {len(hemis_ids)} ta yozuv")
+        raise
+
+
+def save_hemis_frame(new_df):
+    """
+    Yangi yozuvlarni ORM orqali saqlash.
+    Har bir obyekt bazaga so'rovsiz tekshiriladi (full_clean, unique siz),
+    unique to'qnashuvlar bitta so'rov bilan oldindan aniqlanadi, shuning uchun
+    bitta noto'g'ri qator butun bo'lakni to'xtatmaydi.
+
+    Qaytaradi: (qo'shilganlar soni, xatolar ro'yxati)
+    """
+    if new_df.empty:
+        return 0, []
+
+    errors = []
+    is_valid = pd.Series(True, index=new_df.index)
+    hemis_objects = {}
+    for index, clean_data in zip(new_df.index, frame_to_records(new_df)):
+        obj = HemisTable(**clean_data)
+        try:
+            obj.full_clean(validate_unique=False)
+        except ValidationError as e:
+            messages = '; '.join(
+                f"{field}: {', '.join(field_errors)}" for field, field_errors in e.message_dict.items()
+            )
+            errors.append(f"Qator {index + 2}: {messages}")
+            is_valid[index] = False
+            continue
+        hemis_objects[index] = obj
+
+    conflict, conflict_errors = find_conflicts(new_df[is_valid])
+    errors.extend(conflict_errors)
+    hemis_objects = {
+        index: obj for index, obj in hemis_objects.items() if not conflict.get(index, False)
+    }
+
+    try:
+        created_count, race_errors = insert_hemis_objects(new_df, hemis_objects)
+    except DatabaseError:
+        logger.exception(f"Saqlash xatosi: {len(hemis_objects)} ta yozuv")
+        raise
+    return created_count, errors + race_errors
+
+
+def insert_hemis_objects(new_df, hemis_objects):
+    """
+    {qator indeksi: HemisTable} ni bulk_create bilan saqlash (ignore_conflicts
+    siz - qator jimgina tashlab ketilmaydi). find_conflicts dan keyin boshqa
+    import shu kalitlarni yozgan bo'lsa, savepoint bekor qilinadi, to'qnashgan
+    qatorlar xato sifatida ajratiladi va qolganlari qayta saqlanadi. Ikkinchi
+    urinishdagi xato bo'lakni bekor qiladi.
+
+    Qaytaradi: (haqiqatan qo'shilganlar soni, xatolar ro'yxati)
+    """
+    if not hemis_objects:
+        return 0, []
+    try:
+        with transaction.atomic():
+            HemisTable.objects.bulk_create(list(hemis_objects.values()))
+        return len(hemis_objects), []
+    except IntegrityError:
+        conflict, errors = find_conflicts(new_df.loc[list(hemis_objects)], within_batch=False)
+        if not conflict.any():
+            raise
+
+    remaining = [obj for index, obj in hemis_objects.items() if not conflict[index]]
+    for obj in remaining:
+        # Bekor qilingan urinishda berilgan pk lar qayta ishlatilmaydi
+        obj.pk = None
+        obj._state.adding = True
+    HemisTable.objects.bulk_create(remaining)
+    logger.warning(f"Saqlash paytida {len(errors)} ta qator boshqa import bilan to'qnashdi")
+    return len(remaining), errors
@@ -0,0 +1,145 @@
+import logging
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from core.hemis_import import bulk_loader, count_excel_rows, iter_excel_chunks, process_frames
+from core.hemis_parallel import iter_parallel_frames
+from core.hemis_runs import record_import_run
+from core.models import HemisImportJob, ImportRun
+
+logger = logging.getLogger(__name__)
+
+# Fondagi importda bloklar jarayonlar hovuzida tayyorlansinmi (parallel rejim)
+JOB_PARALLEL = getattr(settings, 'HEMIS_IMPORT_JOB_PARALLEL', False)
+
+
+def enqueue_import(excel_file, upsert=False):
+    """Yuklangan faylni saqlab, navbatga import vazifasi qo'shish"""
+    return HemisImportJob.objects.create(file=excel_file, upsert=upsert)
+
+
+def claim_next_job():
+    """
+    Navbatdagi birinchi vazifani olish va 'running' qilish.
+    skip_locked tufayli bir nechta worker bir vazifani ikki marta olmaydi.
+    """
+    with transaction.atomic():
+        job = (
+            HemisImportJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=HemisImportJob.Status.PENDING)
+            .order_by('created')
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = HemisImportJob.Status.RUNNING
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at', 'updated'])
+        return job
+
+
+def run_import_job(job):
+    """
+    Vazifani bajarish: fayl bo'laklab o'qiladi, har bir bo'lak alohida commit
+    qilinadi. Vazifa tugagach (xato bilan ham) yuklangan fayl o'chiriladi.
+    """
+    try:
+        job.total_rows = count_excel_rows(job.file.path)
+        job.save(update_fields=['total_rows', 'updated'])
+
+        def on_chunk(result):
+            # Progress shu bo'lak bilan birga commit bo'ladi
+            HemisImportJob.objects.filter(pk=job.pk).update(
+                processed_rows=result['total_rows'],
+                created_count=result['created_count'],
+                updated_count=result.get('updated_count', 0),
+                unchanged_count=result.get('unchanged_count', 0),
+                activated_count=result['activated_count'],
+                linked_count=result['linked_count'],
+                error_count=len(result['errors']),
+                query_count=result['query_count'],
+                updated=timezone.now(),
+            )
+
+        result, _ = record_import_run(
+            ImportRun.Mode.BACKGROUND,
+            lambda record_chunk: process_frames(
+                job_frames(job), upsert=job.upsert,
+                on_chunk=record_chunk, loader=bulk_loader(), prepared=JOB_PARALLEL
+            ),
+            file_name=job.file.name, upsert=job.upsert, job=job, on_chunk=on_chunk,
+        )
+
+        job.status = HemisImportJob.Status.DONE
+        job.total_rows = result['total_rows']
+        job.processed_rows = result['total_rows']
+        job.created_count = result['created_count']
+        job.updated_count = result.get('updated_count', 0)
+        job.unchanged_count = result.get('unchanged_count', 0)
+        job.activated_count = result['activated_count']
+        job.linked_count = result['linked_count']
+        job.error_count = len(result['errors'])
+        job.query_count = result['query_count']
+        job.errors = result['errors']
+        logger.info(f"✅ {job} tugadi: {job.created_count} ta yangi, {job.error_count} ta xato")
+
+    except Exception as e:
+        job.refresh_from_db(fields=[
+            'processed_rows', 'created_count', 'updated_count', 'unchanged_count',
+            'activated_count', 'linked_count', 'error_count', 'query_count'
+        ])
+        job.status = HemisImportJob.Status.FAILED
+        job.error_message = str(e)
+        logger.exception(f"{job} bajarishda xato: {e}")
+
+    job.finished_at = timezone.now()
+    delete_job_file(job)
+    job.save()
+    return job
+
+
+def delete_job_file(job):
+    """
+    Tugagan (done/failed) vazifaning yuklangan faylini o'chirish, aks holda
+    yuklamalar papkasi cheksiz o'sadi. Fayl nomi ImportRun.file_name da qoladi.
+    """
+    if not job.file:
+        return
+    try:
+        job.file.delete(save=False)
+    except OSError as e:
+        logger.warning(f"{job} faylini o'chirib bo'lmadi: {e}")
+
+
+def job_frames(job):
+    """Vazifa fayli bo'laklari: parallel rejimda tayyorlangan (prepare_frame) holda"""
+    if JOB_PARALLEL:
+        return iter_parallel_frames(job.file.path)
+    return iter_excel_chunks(job.file.path)
+
+
+def job_status_data(job):
+    """Vazifa holatini JSON uchun lug'atga aylantirish"""
+    return {
+        'id': job.id,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'upsert': job.upsert,
+        'total_rows': job.total_rows,
+        'processed_rows': job.processed_rows,
+        'progress': job.progress_percent,
+        'created_count': job.created_count,
+        'updated_count': job.updated_count,
+        'unchanged_count': job.unchanged_count,
+        'activated_count': job.activated_count,
+        'linked_count': job.linked_count,
+        'error_count': job.error_count,
+        'query_count': job.query_count,
+        'errors': job.errors[:3],
+        'error_message': job.error_message,
+        'created': job.created,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
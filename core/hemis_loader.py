@@ -0,0 +1,132 @@
+import io
+import numpy as np
+import pandas as pd
+from django.db import connection, transaction
+from core.models import HemisTable
+
+
+# COPY orqali yuklanadigan ustunlar (tozalangan bo'lak ustunlari bilan bir xil)
+COPY_COLUMNS = ['hemis_id', 'fio', 'born', 'passport', 'pnfl', 'course', 'student_group', 'fingerprint']
+
+# NOT NULL ustunlar: bo'sh qiymat NULL emas, '' sifatida o'qiladi
+NOT_NULL_COLUMNS = ['fio', 'course', 'student_group']
+
+STAGING_TABLE = 'hemis_staging'
+
+# hemis_table dagi unique kalitlar va xato matnidagi nomi
+UNIQUE_KEYS = {'hemis_id': 'Hemis ID', 'pnfl': 'PNFL', 'passport': 'Passport'}
+
+
+def copy_hemis_records(clean_df):
+    """
+    Tozalangan bo'lakni COPY FROM STDIN bilan vaqtinchalik staging jadvalga
+    yuklab, bitta INSERT ... SELECT ... ON CONFLICT DO NOTHING bilan
+    hemis_table ga qo'shish. Model obyektlari va full_clean() ishlatilmaydi.
+    Qo'shilgan qatorlar RETURNING orqali aniqlanadi, qo'shilmaganlari uchun
+    qaysi unique kalitga urilgani bitta so'rov bilan topiladi.
+
+    Qaytaradi: (qo'shilganlar soni, xatolar ro'yxati)
+    """
+    if clean_df.empty:
+        return 0, []
+
+    clean_df, errors = drop_too_long(clean_df)
+    if clean_df.empty:
+        return 0, errors
+
+    buffer = io.StringIO()
+    clean_df[COPY_COLUMNS].to_csv(buffer, header=False, index=False)
+    buffer.seek(0)
+
+    columns = ', '.join(COPY_COLUMNS)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} ("
+            "hemis_id bigint, fio text, born date, passport text, "
+            "pnfl text, course text, student_group text, fingerprint text"
+            ") ON COMMIT DROP"
+        )
+        cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+        cursor.copy_expert(
+            f"COPY {STAGING_TABLE} ({columns}) FROM STDIN "
+            f"WITH (FORMAT csv, FORCE_NOT_NULL ({', '.join(NOT_NULL_COLUMNS)}))",
+            buffer
+        )
+        cursor.execute(
+            f"INSERT INTO {HemisTable._meta.db_table} (created, updated, {columns}) "
+            f"SELECT now(), now(), {columns} FROM {STAGING_TABLE} "
+            "ON CONFLICT DO NOTHING RETURNING hemis_id"
+        )
+        inserted = {row[0] for row in cursor.fetchall()}
+
+    rejected = clean_df[~clean_df['hemis_id'].isin(inserted)]
+    if not rejected.empty:
+        conflict, conflict_errors = find_conflicts(rejected, within_batch=False)
+        errors += conflict_errors
+        errors += [f"Qator {index + 2}: yozuv saqlanmadi" for index in rejected.index[~conflict]]
+    return len(inserted), errors
+
+
+def find_conflicts(clean_df, within_batch=True):
+    """
+    Qatorlarning hemis_id, PNFL yoki passporti bazadagi yozuv bilan (va
+    within_batch=True bo'lsa, bo'lakdagi oldingi qator bilan) to'qnashishini
+    bitta so'rov bilan aniqlash.
+
+    Qaytaradi: (to'qnashgan qatorlar maskasi, xatolar ro'yxati)
+    """
+    if clean_df.empty:
+        return pd.Series(False, index=clean_df.index), []
+
+    # Har bir kalit alohida (indeks bo'yicha) so'raladi va UNION qilinadi:
+    # OR bilan birlashtirilgan IN ro'yxatlari katta jadvalda seq scan beradi
+    queries = []
+    rows = HemisTable.objects.values_list(*UNIQUE_KEYS)
+    for name in UNIQUE_KEYS:
+        keys = [value for value in clean_df[name].tolist() if value]
+        if keys:
+            queries.append(rows.filter(**{f'{name}__in': keys}))
+
+    taken = {name: set() for name in UNIQUE_KEYS}
+    if queries:
+        for row in queries[0].union(*queries[1:]):
+            for name, value in zip(UNIQUE_KEYS, row):
+                if value:
+                    taken[name].add(value)
+
+    reasons = pd.Series('', index=clean_df.index, dtype=object)
+    for name in UNIQUE_KEYS:
+        column = clean_df[name]
+        present = column.notna() & (column != '')
+        hit = present & column.isin(taken[name])
+        if within_batch:
+            hit |= present & column.duplicated()
+        reasons = reasons.where(reasons != '', np.where(hit, name, ''))
+
+    conflict = reasons != ''
+    errors = [
+        f"Qator {index + 2}: {UNIQUE_KEYS[name]} allaqachon mavjud ({clean_df.at[index, name]})"
+        for index, name in reasons[conflict].items()
+    ]
+    return conflict, errors
+
+
+def drop_too_long(clean_df):
+    """Model max_length dan uzun qiymatli qatorlarni ajratish (full_clean o'rniga)"""
+    errors = {}
+    too_long = None
+    for name in NOT_NULL_COLUMNS:
+        max_length = HemisTable._meta.get_field(name).max_length
+        mask = clean_df[name].str.len() > max_length
+        for index in clean_df.index[mask]:
+            errors.setdefault(index, f"Qator {index + 2}: {name} {max_length} belgidan uzun")
+        too_long = mask if too_long is None else too_long | mask
+
+    if not errors:
+        return clean_df, []
+    return clean_df[~too_long], [errors[index] for index in sorted(errors)]
+
+
+def copy_supported():
+    """COPY faqat PostgreSQL (psycopg2) da ishlaydi"""
+    return connection.vendor == 'postgresql'
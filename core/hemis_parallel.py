@@ -0,0 +1,161 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import Manager
+
+import django
+import pandas as pd
+from django.conf import settings
+from openpyxl import load_workbook
+
+from core.hemis_schema import resolve_columns, typed_frame
+
+# Bu modul ishchi jarayonlarda ham import qilinadi, shuning uchun modellarga
+# bog'liq modullar (core.hemis_import) faqat funksiyalar ichida import qilinadi.
+# Parallel rejim faqat boshqaruv buyrug'i (import_hemis_excel) va fondagi
+# import vazifalari uchun - veb so'rov ichida jarayonlar hovuzi ochilmaydi.
+# Parallellik varaqlar bo'yicha: bitta varaqni qator oraliqlariga bo'lish
+# foyda bermaydi (read-only kursor min_row gacha ham barcha qatorlarni
+# parse qiladi), shuning uchun bitta varaqli kitob (odatiy Hemis eksporti)
+# jarayonlar hovuzisiz, joriy jarayonda ketma-ket o'qiladi.
+
+# Parallel parse uchun jarayonlar soni (None - protsessor yadrolari soni)
+WORKERS = getattr(settings, 'HEMIS_IMPORT_WORKERS', None)
+
+# Har bir varaq uchun navbatda turadigan tayyor bo'laklar soni (xotira chegarasi)
+QUEUE_BLOCKS = 4
+
+
+def list_sheets(path):
+    """Kitobdagi ishchi varaqlar nomlari (diagrammalarsiz)"""
+    workbook = load_workbook(path, read_only=True)
+    try:
+        return [sheet.title for sheet in workbook.worksheets]
+    finally:
+        workbook.close()
+
+
+def iter_sheet_blocks(path, sheet_name, block_rows):
+    """
+    Varaqni read-only openpyxl kursori bilan o'qib, qatorlarni block_rows
+    tadan bloklarga bo'lish. 1-qator sarlavha: ustunlar shu bo'yicha
+    aniqlanadi. Oradagi bo'sh qatorlar saqlanadi, varaq oxiridagilari
+    tashlab ketiladi (pandas kabi).
+
+    Qaytaradi: (qatorlar, boshlang'ich indeks, ustunlar) generatori
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows_iter = workbook[sheet_name].iter_rows(values_only=True)
+        columns = resolve_columns(next(rows_iter, ()))
+
+        rows, start, blank_rows = [], 0, 0
+        for row in rows_iter:
+            if all(value is None for value in row):
+                blank_rows += 1
+                continue
+
+            for _ in range(blank_rows):
+                rows.append(())
+            blank_rows = 0
+            rows.append(row)
+            if len(rows) >= block_rows:
+                yield rows, start, columns
+                start += len(rows)
+                rows = []
+
+        if rows:
+            yield rows, start, columns
+    finally:
+        workbook.close()
+
+
+def init_worker():
+    """Ishchi jarayonni tayyorlash (spawn da Django qayta sozlanadi)"""
+    django.setup()
+
+
+def iter_sheet_frames(path, sheet_name, block_rows):
+    """Varaq bloklarini sxema bo'yicha o'girib, prepare_frame dan o'tkazish"""
+    from core.hemis_import import prepare_frame
+
+    for rows, start, columns in iter_sheet_blocks(path, sheet_name, block_rows):
+        index = pd.RangeIndex(start, start + len(rows))
+        yield prepare_frame(typed_frame(rows, index, columns))
+
+
+def read_sheet(task):
+    """
+    Ishchi jarayonda: varaqning tayyor bo'laklarini navbatga qo'yish.
+    Varaq tugaganda navbatga None qo'yiladi.
+    task - (fayl yo'li, varaq nomi, blok hajmi, navbat).
+    """
+    path, sheet_name, block_rows, queue = task
+    try:
+        for frame in iter_sheet_frames(path, sheet_name, block_rows):
+            queue.put(frame)
+    finally:
+        queue.put(None)
+
+
+def iter_parallel_frames(path, workers=None, block_rows=None):
+    """
+    Kitob varaqlarini jarayonlar hovuzida (har bir varaq - bitta jarayon)
+    o'qib tayyorlash va bo'laklarni varaqlar tartibida qaytarish. Yozish
+    bitta (joriy) jarayonda, o'qish bilan bir vaqtda bo'ladi.
+    Bir nechta varaq bo'lsa, bo'lak attrs['sheet'] da varaq nomi bo'ladi.
+    Bitta varaq bo'lsa, hovuz ochilmaydi - varaq joriy jarayonda o'qiladi.
+    """
+    from core.hemis_import import CHUNK_SIZE
+
+    sheets = list_sheets(path)
+    if len(sheets) < 2:
+        for name in sheets:
+            yield from iter_sheet_frames(path, name, block_rows or CHUNK_SIZE)
+        return
+
+    workers = workers or WORKERS or os.cpu_count()
+    manager = Manager()
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(sheets)), initializer=init_worker)
+    try:
+        tasks = []
+        for name in sheets:
+            queue = manager.Queue(maxsize=QUEUE_BLOCKS)
+            future = pool.submit(read_sheet, (path, name, block_rows or CHUNK_SIZE, queue))
+            tasks.append((name, queue, future))
+
+        for name, queue, future in tasks:
+            while (frame := queue.get()) is not None:
+                if len(sheets) > 1:
+                    frame.attrs['sheet'] = name
+                yield frame
+            # Ishchi jarayondagi xato shu yerda ko'tariladi
+            future.result()
+    finally:
+        # Avval navbatlar yopiladi: to'xtatilgan import ishchilarni kutib qolmaydi
+        manager.shutdown()
+        pool.shutdown(cancel_futures=True)
+
+
+@contextmanager
+def local_path(excel_file):
+    """
+    Fayl yo'lini olish (ishchi jarayonlar faylni o'zi ochadi).
+    Xotiradagi yuklamalar vaqtinchalik faylga yoziladi.
+    """
+    if isinstance(excel_file, (str, os.PathLike)):
+        yield str(excel_file)
+        return
+    if hasattr(excel_file, 'temporary_file_path'):
+        yield excel_file.temporary_file_path()
+        return
+
+    with tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as temp_file:
+        excel_file.seek(0)
+        shutil.copyfileobj(excel_file, temp_file)
+    try:
+        yield temp_file.name
+    finally:
+        os.remove(temp_file.name)
@@ -0,0 +1,78 @@
+import logging
+import os
+import time
+from django.utils import timezone
+from core.models import ImportRun
+
+logger = logging.getLogger(__name__)
+
+
+def record_import_run(mode, run_import, file_name='', upsert=False, job=None, on_chunk=None):
+    """
+    run_import(on_chunk) ni bajarib, natijasini ImportRun sifatida saqlash.
+    run_import bo'laklab commit qilsa, on_chunk ni process_frames ga berishi
+    kerak: import to'xtasa ham yozuv (status=failed) oxirgi commit bo'lgan
+    bo'lakkacha bo'lgan natijalar bilan saqlanadi va xato qayta ko'tariladi.
+    on_chunk(result) - chaqiruvchining o'z callbacki (masalan, progress).
+
+    Qaytaradi: (process_frames natijasi, ImportRun)
+    """
+    run = ImportRun(
+        job=job,
+        mode=mode,
+        file_name=os.path.basename(str(file_name or ''))[:255],
+        upsert=upsert,
+        started_at=timezone.now(),
+    )
+    committed = {}
+
+    def record_chunk(result):
+        # Bo'lak tranzaksiyasi ichida: natija shu bo'lak bilan birga commit bo'ladi.
+        # errors ro'yxati keyingi bo'lakda ham to'ldiriladi - uzunligi eslab qolinadi
+        committed['result'] = dict(result)
+        committed['error_count'] = len(result['errors'])
+        if on_chunk:
+            on_chunk(result)
+
+    started = time.perf_counter()
+    try:
+        result = run_import(record_chunk)
+    except Exception as e:
+        if committed:
+            partial = committed['result']
+            fill_import_run(run, {**partial, 'errors': partial['errors'][:committed['error_count']]})
+        run.status = ImportRun.Status.FAILED
+        run.error_message = str(e)
+        save_import_run(run, started)
+        raise
+
+    fill_import_run(run, result)
+    save_import_run(run, started)
+    return result, run
+
+
+def fill_import_run(run, result):
+    """process_frames natijasini ImportRun maydonlariga ko'chirish"""
+    run.loader = result.get('loader') or ''
+    run.total_rows = result['total_rows']
+    run.created_count = result['created_count']
+    run.updated_count = result.get('updated_count', 0)
+    run.unchanged_count = result.get('unchanged_count', 0)
+    run.activated_count = result['activated_count']
+    run.linked_count = result['linked_count']
+    run.errors = result['errors']
+    run.error_count = len(result['errors'])
+    run.query_count = result['query_count']
+    run.timings = result['timings']
+    run.stage_queries = result['stage_queries']
+    run.peak_memory_mb = result.get('peak_memory_mb')
+
+
+def save_import_run(run, started):
+    """Tarix yozuvini saqlash (saqlash xatosi importni buzmaydi)"""
+    run.duration = round(time.perf_counter() - started, 4)
+    run.finished_at = timezone.now()
+    try:
+        run.save()
+    except Exception as e:
+        logger.exception(f"Import tarixini saqlashda xato: {e}")
@@ -0,0 +1,148 @@
+import math
+import numbers
+import re
+
+import pandas as pd
+
+# Hemis Excel importi sxemasi: har bir maydon sarlavha nomlari bo'yicha
+# topiladi, topilmasa eski pozitsiya (0 dan boshlab) ishlatiladi. Qiymatlar
+# o'qish paytidayoq turiga qarab o'giriladi, shuning uchun identifikatorlar
+# hech qachon float64 ustunga aylanmaydi.
+# Bu modul ishchi jarayonlarda ham import qilinadi - modellarga bog'liq emas.
+
+TYPE_ID = 'id'      # Raqamli identifikator: matn sifatida, '.0' siz
+TYPE_TEXT = 'text'  # Oddiy matn
+TYPE_DATE = 'date'  # O'zgarishsiz, parse_born_column da parse qilinadi
+
+HEMIS_SCHEMA = {
+    'hemis_id': {
+        'type': TYPE_ID, 'position': 0,  # A
+        'headers': ['ID', 'Talaba ID', 'Hemis ID', 'Student ID'],
+    },
+    'fio': {
+        'type': TYPE_TEXT, 'position': 1,  # B
+        'headers': ['F.I.Sh.', 'F.I.Sh', 'FISh', 'FIO', 'F.I.O.', "To'liq ismi", 'Ф.И.О.', 'ФИО'],
+    },
+    'born': {
+        'type': TYPE_DATE, 'position': 8,  # I
+        'headers': ["Tug'ilgan sana", 'Tugilgan sana', "Tug'ilgan kuni", 'Дата рождения', 'Birth date'],
+    },
+    'passport': {
+        'type': TYPE_TEXT, 'position': 9,  # J
+        'headers': ['Pasport', 'Passport', 'Pasport seriyasi va raqami', 'Паспорт'],
+    },
+    'pnfl': {
+        'type': TYPE_ID, 'position': 10,  # K
+        'headers': ['JSHSHIR', 'JShShIR', 'PNFL', 'PINFL', 'ПИНФЛ', 'ЖШШИР'],
+    },
+    'course': {
+        'type': TYPE_TEXT, 'position': 12,  # M
+        'headers': ['Kurs', 'Course', 'Курс'],
+    },
+    'student_group': {
+        'type': TYPE_TEXT, 'position': 14,  # O
+        'headers': ['Guruh', 'Group', 'Группа'],
+    },
+}
+
+# Sarlavhasiz fayllar uchun standart pozitsiyalar
+EXCEL_COLUMNS = {name: field['position'] for name, field in HEMIS_SCHEMA.items()}
+
+APOSTROPHES = re.compile(r"[‘’ʻʼ`´]")
+
+
+def normalize_header(value):
+    """Sarlavhani solishtirish uchun: kichik harf, bitta apostrof, bitta bo'shliq"""
+    if value is None:
+        return ''
+    text = APOSTROPHES.sub("'", str(value)).lower()
+    return ' '.join(text.split())
+
+
+HEADER_ALIASES = {
+    name: [normalize_header(header) for header in field['headers']]
+    for name, field in HEMIS_SCHEMA.items()
+}
+
+
+def resolve_columns(header):
+    """
+    Sarlavha qatori bo'yicha maydonlar pozitsiyasi: {maydon: ustun indeksi}.
+    Sarlavhasi topilmagan maydon standart pozitsiyada qoladi.
+    """
+    positions = {}
+    for position, value in enumerate(header or ()):
+        positions.setdefault(normalize_header(value), position)
+
+    columns = {}
+    for name, aliases in HEADER_ALIASES.items():
+        found = [positions[alias] for alias in aliases if alias in positions]
+        columns[name] = found[0] if found else EXCEL_COLUMNS[name]
+    return columns
+
+
+def is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value)) or value is pd.NaT
+
+
+def to_id(value):
+    """Identifikatorni matnga: 300001 va 300001.0 -> '300001', bo'sh -> ''"""
+    if is_missing(value):
+        return ''
+    if isinstance(value, numbers.Integral) and not isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, numbers.Real) and float(value).is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def to_text(value):
+    """Qiymatni tozalangan matnga (bo'sh -> '')"""
+    if is_missing(value):
+        return ''
+    if isinstance(value, str):
+        return value.strip()
+    return to_id(value)
+
+
+def to_date(value):
+    """Sana qiymati o'zgarishsiz qoladi, bo'shlar None bo'ladi"""
+    return None if is_missing(value) else value
+
+
+CONVERTERS = {TYPE_ID: to_id, TYPE_TEXT: to_text, TYPE_DATE: to_date}
+EMPTY_VALUES = {TYPE_ID: '', TYPE_TEXT: '', TYPE_DATE: None}
+
+
+def typed_frame(rows, index, columns=None):
+    """
+    Qatorlardan (tuple/list) sxema bo'yicha o'girilgan DataFrame bo'lagi.
+    columns - resolve_columns natijasi (bo'lmasa standart pozitsiyalar).
+    """
+    columns = columns or EXCEL_COLUMNS
+    data = {}
+    for name, field in HEMIS_SCHEMA.items():
+        position = columns[name]
+        convert = CONVERTERS[field['type']]
+        empty = EMPTY_VALUES[field['type']]
+        data[name] = pd.Series(
+            [convert(row[position]) if position < len(row) else empty for row in rows],
+            index=index, dtype=object
+        )
+    return pd.DataFrame(data, index=index)
+
+
+def apply_schema(df):
+    """
+    pd.read_excel natijasini sxemaga keltirish: ustunlar sarlavha (yoki
+    pozitsiya) bo'yicha tanlanadi va turiga qarab o'giriladi.
+    """
+    columns = resolve_columns(list(df.columns))
+    data = {}
+    for name, field in HEMIS_SCHEMA.items():
+        position = columns[name]
+        if position < df.shape[1]:
+            data[name] = df.iloc[:, position].map(CONVERTERS[field['type']]).astype(object)
+        else:
+            data[name] = pd.Series(EMPTY_VALUES[field['type']], index=df.index, dtype=object)
+    return pd.DataFrame(data, index=df.index)
@@ -0,0 +1,231 @@
+import logging
+from contextlib import nullcontext
+from django.db import connection, transaction
+from core.group_counters import ACTIVE, LINKED, shift_member_counter
+from core.models import HemisTable, Register, TelegramGroup
+
+logger = logging.getLogger(__name__)
+
+
+class LinkBatch:
+    """
+    Bitta tranzaksiyada navbatga qo'yilgan (hemis_id, pnfl) juftlari.
+    transaction.on_commit ga bir marta beriladi va commitdan keyin barcha
+    juftlar bitta to'plam bilan bog'lanadi.
+    """
+
+    def __init__(self):
+        self.keys = set()
+
+    def __call__(self):
+        keys, self.keys = self.keys, set()
+        resolve_link_keys(keys)
+
+
+def queue_link(hemis_id, pnfl, using=None):
+    """
+    Register va HemisTable juftini bog'lash uchun navbatga qo'yish.
+    Tranzaksiya ichida bir xil juft bir marta bog'lanadi (commitdan keyin),
+    tranzaksiyadan tashqarida darhol bog'lanadi.
+    """
+    if not hemis_id or not pnfl:
+        return
+
+    db = transaction.get_connection(using)
+    if not db.in_atomic_block:
+        resolve_link_keys({(int(hemis_id), str(pnfl))})
+        return
+
+    batch = getattr(db, 'hemis_link_batch', None)
+    if batch is None or not is_pending(db, batch):
+        # Oldingi to'plam bajarilgan yoki rollback bilan bekor qilingan
+        batch = LinkBatch()
+        db.hemis_link_batch = batch
+        transaction.on_commit(batch, using=using)
+    batch.keys.add((int(hemis_id), str(pnfl)))
+
+
+def is_pending(db, batch):
+    """To'plam hali commitni kutayotgan on_commit callbacklari ichidami"""
+    return any(callback is batch for _, callback, *_ in db.run_on_commit)
+
+
+def resolve_link_keys(keys):
+    """Navbatdagi juftlarni bog'lash va guruhlarini sinxronlash (bitta to'plam)"""
+    if not keys:
+        return {'linked': 0, 'activated': 0, 'groups_added': 0}
+
+    # Juftning pnfl qismi SQL da (r.pnfl = h.pnfl) tekshiriladi
+    hemis_ids = sorted({hemis_id for hemis_id, _ in keys})
+    try:
+        with transaction.atomic():
+            return link_hemis_batch(hemis_ids, sync_groups=True)
+    except Exception as e:
+        logger.error(f"Register-HemisTable bog'lashda xato: {e}")
+        return {'linked': 0, 'activated': 0, 'groups_added': 0}
+
+
+def link_hemis_batch(hemis_ids, stages=None, sync_groups=False):
+    """
+    Berilgan hemis_id lar uchun Register bog'lanishini to'plam bo'yicha
+    (signal mantiqini har bir obyekt uchun takrorlamasdan) bajarish:
+    1. hemis_table.register_id ni (hemis_id, pnfl) bo'yicha to'ldirish
+    2. mos Registerlarni faollashtirish
+    (1 va 2-qadamlardan keyin guruhlarning linked/active_members hisoblagichlari suriladi)
+    3. yangi bog'langan yozuvlarga Register guruhlarini (faollarini) ko'chirish
+
+    sync_groups=True bo'lsa, 3-qadam avval bog'langan yozuvlar uchun ham
+    bajariladi (Register yoki HemisTable saqlanganda).
+    stages - StageTimer bo'lsa, 1 va 3-qadamlar 'link', 2-qadam 'activate'
+    bosqichi sifatida o'lchanadi.
+    updated ustuni clock_timestamp() (so'rov vaqti) bilan yoziladi, now()
+    (tranzaksiya boshlanishi) bilan emas - aks holda uzoq tranzaksiyadagi
+    o'zgarishlar lentasi (api/delta_sync.py) watermark idan orqada qoladi.
+
+    Qaytaradi: {'linked': .., 'activated': .., 'groups_added': ..}
+    """
+    def stage(name):
+        return stages.stage(name) if stages else nullcontext()
+
+    result = {'linked': 0, 'activated': 0, 'groups_added': 0}
+    hemis_ids = list(hemis_ids)
+    if not hemis_ids:
+        return result
+
+    hemis_table = HemisTable._meta.db_table
+    register_table = Register._meta.db_table
+
+    with connection.cursor() as cursor, stage('link'):
+        # 1. Bog'lanmagan yozuvlarni bog'lash (Register boshqa yozuvga bog'lanmagan bo'lsa)
+        cursor.execute(
+            f"""
+            UPDATE {hemis_table} h
+            SET register_id = r.id, updated = clock_timestamp()
+            FROM {register_table} r
+            WHERE h.hemis_id = ANY(%s)
+              AND h.register_id IS NULL
+              AND r.hemis_id = h.hemis_id
+              AND r.pnfl = h.pnfl
+              AND NOT EXISTS (
+                  SELECT 1 FROM {hemis_table} linked WHERE linked.register_id = r.id
+              )
+            RETURNING h.id, h.register_id
+            """,
+            [hemis_ids]
+        )
+        rows = cursor.fetchall()
+        linked_ids = [hemis_pk for hemis_pk, _ in rows]
+        result['linked'] = len(linked_ids)
+        shift_member_counter([register_id for _, register_id in rows], LINKED, 1)
+
+    with connection.cursor() as cursor, stage('activate'):
+        # 2. Mos Registerlarni faollashtirish
+        cursor.execute(
+            f"""
+            UPDATE {register_table} r
+            SET is_active = true, updated = clock_timestamp()
+            FROM {hemis_table} h
+            WHERE h.hemis_id = ANY(%s)
+              AND r.hemis_id = h.hemis_id
+              AND r.pnfl = h.pnfl
+              AND r.is_active = false
+            RETURNING r.id
+            """,
+            [hemis_ids]
+        )
+        activated_ids = [row[0] for row in cursor.fetchall()]
+        result['activated'] = len(activated_ids)
+        shift_member_counter(activated_ids, ACTIVE, 1)
+
+    with connection.cursor() as cursor, stage('link'):
+        # 3. Register guruhlarini yangi (sync_groups da - barcha) bog'langan yozuvlarga ko'chirish
+        if sync_groups:
+            result['groups_added'] = insert_hemis_groups(cursor, 'h.hemis_id = ANY(%s)', [hemis_ids])
+        elif linked_ids:
+            result['groups_added'] = insert_hemis_groups(cursor, 'h.id = ANY(%s)', [linked_ids])
+
+    if result['linked'] or result['activated']:
+        logger.info(
+            f"🔗 {result['linked']} ta HemisTable bog'landi, "
+            f"{result['activated']} ta Register faollashtirildi, "
+            f"{result['groups_added']} ta guruh a'zoligi qo'shildi"
+        )
+    return result
+
+
+def sync_register_groups(register_ids, group_ids=None):
+    """
+    Register guruhlarini bog'langan HemisTable yozuvlariga sinxronlash
+    (bitta yozuv yoki minglab yozuv uchun ham 2 ta so'rov):
+    1. yetishmayotgan a'zoliklar (faol guruhlar) bitta INSERT ... SELECT bilan qo'shiladi
+    2. Registerda yo'q a'zoliklar bitta DELETE bilan o'chiriladi
+    group_ids berilsa, faqat shu guruhlar sinxronlanadi.
+
+    Qaytaradi: {'added': .., 'removed': ..}
+    """
+    result = {'added': 0, 'removed': 0}
+    register_ids = list(register_ids)
+    if not register_ids:
+        return result
+
+    hemis_table = HemisTable._meta.db_table
+    hemis_groups = HemisTable.telegram_groups.through._meta.db_table
+    register_groups = Register.register_groups.through._meta.db_table
+
+    group_filter, group_params = '', []
+    if group_ids is not None:
+        group_filter, group_params = 'AND hg.telegramgroup_id = ANY(%s)', [list(group_ids)]
+
+    with connection.cursor() as cursor:
+        result['added'] = insert_hemis_groups(
+            cursor, 'h.register_id = ANY(%s)', [register_ids], group_ids
+        )
+        cursor.execute(
+            f"""
+            DELETE FROM {hemis_groups} hg
+            USING {hemis_table} h
+            WHERE hg.hemistable_id = h.id
+              AND h.register_id = ANY(%s)
+              {group_filter}
+              AND NOT EXISTS (
+                  SELECT 1 FROM {register_groups} rg
+                  WHERE rg.register_id = h.register_id
+                    AND rg.telegramgroup_id = hg.telegramgroup_id
+              )
+            """,
+            [register_ids, *group_params]
+        )
+        result['removed'] = cursor.rowcount
+    return result
+
+
+def insert_hemis_groups(cursor, condition, params, group_ids=None):
+    """
+    condition ga mos (h - hemis_table) bog'langan yozuvlarga Register ning
+    faol guruhlarini qo'shish, mavjud a'zoliklar o'tkazib yuboriladi.
+    Qaytaradi: qo'shilgan a'zoliklar soni
+    """
+    hemis_table = HemisTable._meta.db_table
+    hemis_groups = HemisTable.telegram_groups.through._meta.db_table
+    register_groups = Register.register_groups.through._meta.db_table
+    group_table = TelegramGroup._meta.db_table
+
+    group_filter = ''
+    if group_ids is not None:
+        group_filter = 'AND rg.telegramgroup_id = ANY(%s)'
+        params = [*params, list(group_ids)]
+
+    cursor.execute(
+        f"""
+        INSERT INTO {hemis_groups} (hemistable_id, telegramgroup_id)
+        SELECT h.id, rg.telegramgroup_id
+        FROM {hemis_table} h
+        JOIN {register_groups} rg ON rg.register_id = h.register_id
+        JOIN {group_table} g ON g.id = rg.telegramgroup_id AND g.is_active
+        WHERE {condition}
+          {group_filter}
+        ON CONFLICT DO NOTHING
+        """,
+        params
+    )
+    return cursor.rowcount
@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from core.hemis_benchmark import MODE_STANDARD, MODE_STREAM, run_benchmark
+from core.hemis_import import LOADER_COPY, LOADER_ORM, bulk_loader
+
+
+class Command(BaseCommand):
+    help = (
+        "Hemis import benchmarki: sintetik fayllarni yaratib, parse/validate/insert/link "
+        "bosqichlari vaqti, so'rovlar soni va xotira cho'qqisini JSON hisobotga yozish. "
+        "O'lchovlar alohida test bazasida bajariladi."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='1000,10000,50000',
+            help="Vergul bilan ajratilgan qatorlar soni (masalan 1000,10000,200000)"
+        )
+        parser.add_argument(
+            '--modes', default=MODE_STREAM,
+            help=f"Vergul bilan ajratilgan rejimlar: {MODE_STREAM}, {MODE_STANDARD}"
+        )
+        parser.add_argument('--loader', choices=[LOADER_ORM, LOADER_COPY], help="Stream rejimidagi saqlash usuli")
+        parser.add_argument('--dup-ratio', type=float, default=0.02)
+        parser.add_argument('--invalid-ratio', type=float, default=0.02)
+        parser.add_argument(
+            '--register-ratio', type=float, default=0.1,
+            help="Register bilan bog'lanadigan qatorlar ulushi"
+        )
+        parser.add_argument(
+            '--reimport', action='store_true',
+            help="Har bir importdan keyin o'zgarmagan faylni upsert rejimida qayta import qilish"
+        )
+        parser.add_argument(
+            '--no-memory', action='store_true',
+            help="Xotira cho'qqisini o'lchamaslik (tracemalloc bilan qo'shimcha yurgizishsiz)"
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--workdir', default=os.path.join(tempfile.gettempdir(), 'hemis_benchmark'),
+            help="Yaratilgan fayllar saqlanadigan papka (qayta ishlatiladi)"
+        )
+        parser.add_argument('--output', default='hemis_benchmark.json', help="JSON hisobot fayli")
+        parser.add_argument('--keepdb', action='store_true', help="Test bazasini o'chirmaslik")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError("--sizes butun sonlar ro'yxati bo'lishi kerak")
+
+        modes = options['modes'].split(',')
+        for mode in modes:
+            if mode not in (MODE_STREAM, MODE_STANDARD):
+                raise CommandError(f"Noma'lum rejim: {mode}")
+
+        # Asosiy bazaga tegmaslik uchun test bazasi yaratiladi
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            report = run_benchmark(
+                sizes, options['workdir'],
+                modes=modes,
+                loader=options['loader'] or bulk_loader(),
+                dup_ratio=options['dup_ratio'],
+                invalid_ratio=options['invalid_ratio'],
+                register_ratio=options['register_ratio'],
+                reimport=options['reimport'],
+                memory=not options['no_memory'],
+                seed=options['seed'],
+                log=self.stdout.write,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        with open(options['output'], 'w', encoding='utf-8') as report_file:
+            json.dump(report, report_file, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"✅ Hisobot: {options['output']}"))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from core.hemis_benchmark import generate_hemis_xlsx
+
+
+class Command(BaseCommand):
+    help = "Hemis eksportiga o'xshash sintetik .xlsx fayl yaratish"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Yaratiladigan fayl yo'li")
+        parser.add_argument('--rows', type=int, default=1000, help="Qatorlar soni")
+        parser.add_argument('--dup-ratio', type=float, default=0.02, help="Takrorlangan qatorlar ulushi")
+        parser.add_argument('--invalid-ratio', type=float, default=0.02, help="Noto'g'ri qatorlar ulushi")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        stats = generate_hemis_xlsx(
+            options['path'], options['rows'],
+            dup_ratio=options['dup_ratio'],
+            invalid_ratio=options['invalid_ratio'],
+            seed=options['seed'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {stats['path']}: {stats['rows']} qator, "
+            f"{stats['duplicates']} ta takror, {stats['invalid']} ta noto'g'ri"
+        ))
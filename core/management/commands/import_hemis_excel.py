@@ -0,0 +1,46 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.hemis_import import LOADER_COPY, LOADER_ORM, process_excel_parallel
+from core.hemis_runs import record_import_run
+from core.models import ImportRun
+
+
+class Command(BaseCommand):
+    help = (
+        "Hemis Excel faylini import qilish: varaqlar jarayonlar hovuzida o'qilib "
+        "tozalanadi (har bir varaq - bitta jarayon, bitta varaqli fayl ketma-ket "
+        "o'qiladi), bazaga bitta jarayon yozadi"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Excel (.xlsx) fayl yo'li")
+        parser.add_argument('--workers', type=int, help="Jarayonlar soni, varaqlar sonidan oshmaydi (standart: protsessor yadrolari)")
+        parser.add_argument('--upsert', action='store_true', help="Mavjud yozuvlarni yangilash rejimi")
+        parser.add_argument('--loader', choices=[LOADER_ORM, LOADER_COPY], help="Saqlash usuli")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            result, run = record_import_run(
+                ImportRun.Mode.PARALLEL,
+                lambda on_chunk: process_excel_parallel(
+                    options['path'], workers=options['workers'],
+                    upsert=options['upsert'], loader=options['loader'], on_chunk=on_chunk
+                ),
+                file_name=options['path'], upsert=options['upsert'],
+            )
+        except FileNotFoundError:
+            raise CommandError(f"Fayl topilmadi: {options['path']}")
+
+        for error in result['errors'][:10]:
+            self.stdout.write(self.style.WARNING(error))
+        if len(result['errors']) > 10:
+            self.stdout.write(f"... va yana {len(result['errors']) - 10} ta xato")
+
+        timings = ', '.join(f"{name} {value:.1f}s" for name, value in result['timings'].items())
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {result['total_rows']} qator, {result['created_count']} ta yangi, "
+            f"{result.get('updated_count', 0)} ta yangilangan, {result['linked_count']} ta bog'langan, "
+            f"{len(result['errors'])} ta xato ({time.perf_counter() - started:.1f}s: {timings})"
+        ))
+        self.stdout.write(f"📝 Import tarixi: {run}, xotira cho'qqisi {run.peak_memory_mb} MB")
@@ -0,0 +1,43 @@
+import time
+from django.core.management.base import BaseCommand
+from core.group_jobs import GROUP_JOB_CHUNK_SIZE, claim_next_deactivation, run_deactivation_job
+
+
+class Command(BaseCommand):
+    help = "Nofaol qilingan guruhlar a'zoliklarini fonda ajratish vazifalarini bajarish (worker)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Navbatdagi barcha vazifalarni bajarib, chiqib ketish"
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=5,
+            help="Navbat bo'sh bo'lganda kutish vaqti (soniya)"
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=GROUP_JOB_CHUNK_SIZE,
+            help="Bitta tranzaksiyada o'chiriladigan a'zoliklar soni"
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Guruh ajratish worker ishga tushdi")
+
+        while True:
+            job = claim_next_deactivation()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            self.stdout.write(f"▶️ {job} boshlandi")
+            job = run_deactivation_job(job, chunk_size=options['chunk_size'])
+
+            if job.status == job.Status.FAILED:
+                self.stdout.write(self.style.ERROR(f"❌ {job}: {job.error_message}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"✅ {job}: {job.hemis_detached} ta HemisTable, "
+                    f"{job.members_detached} ta Register a'zoligi, {job.chunks} bo'lak, {job.duration}s"
+                ))
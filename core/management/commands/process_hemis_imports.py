@@ -0,0 +1,39 @@
+import time
+from django.core.management.base import BaseCommand
+from core.hemis_jobs import claim_next_job, run_import_job
+
+
+class Command(BaseCommand):
+    help = "Navbatdagi Hemis import vazifalarini fonda bajarish (worker)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Navbatdagi barcha vazifalarni bajarib, chiqib ketish"
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=5,
+            help="Navbat bo'sh bo'lganda kutish vaqti (soniya)"
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Hemis import worker ishga tushdi")
+
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            self.stdout.write(f"▶️ {job} boshlandi: {job.file.name}")
+            job = run_import_job(job)
+
+            if job.status == job.Status.DONE:
+                self.stdout.write(self.style.SUCCESS(
+                    f"✅ {job}: {job.processed_rows} qator, {job.created_count} ta yangi, "
+                    f"{job.updated_count} ta yangilangan, {job.error_count} ta xato"
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(f"❌ {job}: {job.error_message}"))
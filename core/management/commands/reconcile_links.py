@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from core.reconcile import RECONCILE_CHUNK_SIZE, RECONCILE_STEPS, STEP_LABELS, reconcile_links
+
+
+class Command(BaseCommand):
+    help = (
+        "Register <-> HemisTable bog'lanishlari, Register faolligi va guruh "
+        "a'zoliklarini to'liq qayta hisoblab tuzatish (oraliqlar bo'yicha, to'plamli SQL)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Hech narsani o'zgartirmasdan farqni ko'rsatish"
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=RECONCILE_CHUNK_SIZE,
+            help="Bitta tranzaksiyadagi HemisTable id oralig'i"
+        )
+        parser.add_argument(
+            '--prune-unlinked', action='store_true',
+            help="Bog'lanmagan yozuvlarning guruh a'zoliklarini ham o'chirish"
+        )
+        parser.add_argument(
+            '--samples', type=int, default=5,
+            help="Har bir qadam uchun ko'rsatiladigan namunalar soni"
+        )
+
+    def handle(self, *args, **options):
+        log = self.stdout.write if options['verbosity'] > 1 else None
+        report = reconcile_links(
+            chunk_size=options['chunk_size'], dry_run=options['dry_run'],
+            prune_unlinked=options['prune_unlinked'], samples=options['samples'], log=log,
+        )
+
+        if report['dry_run']:
+            self.stdout.write(self.style.WARNING("🔍 Dry-run: o'zgarishlar saqlanmadi"))
+
+        for step in RECONCILE_STEPS:
+            count = report['counts'][step]
+            self.stdout.write(f"{'•' if count else ' '} {count} ta {STEP_LABELS[step]}")
+            for sample in report['samples'][step]:
+                self.stdout.write(f"    hemis_id={sample[0]} -> {sample[1]}")
+
+        if report['counters_fixed']:
+            self.stdout.write(f"• {report['counters_fixed']} ta guruh hisoblagichi tuzatildi")
+
+        total = sum(report['counts'].values())
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {report['chunks']} ta oraliq, {total} ta o'zgarish, {report['duration']}s"
+        ))
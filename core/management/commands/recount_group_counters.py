@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from core.group_counters import recount_group_counters, stale_group_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "TelegramGroup a'zolar hisoblagichlarini (total/active/linked) "
+        "a'zoliklardan to'liq qayta hisoblab tuzatish"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Hech narsani o'zgartirmasdan farqni ko'rsatish"
+        )
+        parser.add_argument(
+            '--samples', type=int, default=10,
+            help="Ko'rsatiladigan tuzatilgan guruhlar soni"
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            # Faqat SELECT: hisoblagichlar qulflanmaydi
+            fixed = stale_group_counters()
+            self.stdout.write(self.style.WARNING("🔍 Dry-run: o'zgarishlar saqlanmadi"))
+        else:
+            fixed = recount_group_counters()
+
+        for group_id, old, new in fixed[:options['samples']]:
+            self.stdout.write(f"    group_id={group_id}: {old} -> {new}")
+        self.stdout.write(self.style.SUCCESS(f"✅ {len(fixed)} ta guruh hisoblagichi tuzatildi"))
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-18 12:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HemisImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('file', models.FileField(upload_to='hemis_imports/%Y/%m/')),
+                ('upsert', models.BooleanField(default=False, help_text='Mavjud yozuvlarni yangilash rejimi')),
+                ('status', models.CharField(choices=[('pending', 'Navbatda'), ('running', 'Bajarilmoqda'), ('done', 'Tugadi'), ('failed', 'Xato')], db_index=True, default='pending', max_length=10)),
+                ('total_rows', models.PositiveIntegerField(default=0, help_text='Fayldagi taxminiy qatorlar soni')),
+                ('processed_rows', models.PositiveIntegerField(default=0)),
+                ('created_count', models.PositiveIntegerField(default=0)),
+                ('updated_count', models.PositiveIntegerField(default=0)),
+                ('unchanged_count', models.PositiveIntegerField(default=0)),
+                ('activated_count', models.PositiveIntegerField(default=0)),
+                ('error_count', models.PositiveIntegerField(default=0)),
+                ('query_count', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('error_message', models.TextField(blank=True, help_text="Import to'xtagan bo'lsa, sababi")),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Hemis Import Job',
+                'verbose_name_plural': 'Hemis Import Jobs',
+                'db_table': 'hemis_import_job',
+                'ordering': ['-created'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_hemisimportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hemisimportjob',
+            name='linked_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 12:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_hemisimportjob_linked_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hemistable',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, help_text="Qator mazmunining xeshi (qayta importda o'zgarmaganlarni o'tkazish uchun)", max_length=32, null=True),
+        ),
+    ]
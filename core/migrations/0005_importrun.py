@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-18 12:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_hemistable_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('file_name', models.CharField(blank=True, max_length=255)),
+                ('mode', models.CharField(choices=[('standard', 'Standart'), ('stream', 'Streaming'), ('parallel', 'Parallel'), ('background', 'Fonda')], db_index=True, max_length=10)),
+                ('loader', models.CharField(blank=True, max_length=10)),
+                ('upsert', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('done', 'Tugadi'), ('failed', 'Xato')], default='done', max_length=10)),
+                ('total_rows', models.PositiveIntegerField(default=0)),
+                ('created_count', models.PositiveIntegerField(default=0)),
+                ('updated_count', models.PositiveIntegerField(default=0)),
+                ('unchanged_count', models.PositiveIntegerField(default=0)),
+                ('activated_count', models.PositiveIntegerField(default=0)),
+                ('linked_count', models.PositiveIntegerField(default=0)),
+                ('error_count', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('error_message', models.TextField(blank=True, help_text="Import to'xtagan bo'lsa, sababi")),
+                ('duration', models.FloatField(default=0, help_text='Umumiy vaqt (soniya)')),
+                ('timings', models.JSONField(blank=True, default=dict, help_text='Bosqichlar vaqti (soniya)')),
+                ('stage_queries', models.JSONField(blank=True, default=dict, help_text="Bosqichlar bo'yicha so'rovlar soni")),
+                ('query_count', models.PositiveIntegerField(default=0)),
+                ('peak_memory_mb', models.FloatField(blank=True, help_text="Jarayon xotirasining cho'qqisi (RSS)", null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('job', models.ForeignKey(blank=True, help_text='Fonda bajarilgan import vazifasi', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='runs', to='core.hemisimportjob')),
+            ],
+            options={
+                'verbose_name': 'Import Run',
+                'verbose_name_plural': 'Import Runs',
+                'db_table': 'hemis_import_run',
+                'ordering': ['-created'],
+            },
+        ),
+    ]
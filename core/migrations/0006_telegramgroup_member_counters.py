@@ -0,0 +1,58 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+def fill_member_counters(apps, schema_editor):
+    """Mavjud a'zoliklardan boshlang'ich hisoblagichlar"""
+    TelegramGroup = apps.get_model('core', 'TelegramGroup')
+    Register = apps.get_model('core', 'Register')
+    HemisTable = apps.get_model('core', 'HemisTable')
+    group_table = TelegramGroup._meta.db_table
+    register_table = Register._meta.db_table
+    register_groups = Register.register_groups.through._meta.db_table
+    hemis_table = HemisTable._meta.db_table
+
+    schema_editor.execute(
+        f"""
+        UPDATE {group_table} g
+        SET total_members = d.total, active_members = d.active, linked_members = d.linked
+        FROM (
+            SELECT rg.telegramgroup_id AS group_id,
+                   count(*) AS total,
+                   count(*) FILTER (WHERE r.is_active) AS active,
+                   count(h.id) AS linked
+            FROM {register_groups} rg
+            JOIN {register_table} r ON r.id = rg.register_id
+            LEFT JOIN {hemis_table} h ON h.register_id = r.id
+            GROUP BY rg.telegramgroup_id
+        ) d
+        WHERE g.id = d.group_id
+        """
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_importrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='telegramgroup',
+            name='active_members',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='telegramgroup',
+            name='linked_members',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='telegramgroup',
+            name='total_members',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_member_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_telegramgroup_member_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupDeactivationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('detach_members', models.BooleanField(default=False, help_text="Register a'zoliklarini (register_groups) ham o'chirish")),
+                ('status', models.CharField(choices=[('pending', 'Navbatda'), ('running', 'Bajarilmoqda'), ('done', 'Tugadi'), ('cancelled', 'Bekor qilindi'), ('failed', 'Xato')], db_index=True, default='pending', max_length=10)),
+                ('hemis_detached', models.PositiveIntegerField(default=0, help_text="O'chirilgan HemisTable a'zoliklari")),
+                ('members_detached', models.PositiveIntegerField(default=0, help_text="O'chirilgan Register a'zoliklari")),
+                ('chunks', models.PositiveIntegerField(default=0)),
+                ('error_message', models.TextField(blank=True)),
+                ('duration', models.FloatField(default=0, help_text='Umumiy vaqt (soniya)')),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deactivation_jobs', to='core.telegramgroup')),
+            ],
+            options={
+                'verbose_name': 'Group Deactivation Job',
+                'verbose_name_plural': 'Group Deactivation Jobs',
+                'db_table': 'group_deactivation_job',
+                'ordering': ['-created'],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_groupdeactivationjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='memberactivity',
+            index=models.Index(fields=['activity_time', 'id'], name='member_acti_activit_3f4f95_idx'),
+        ),
+    ]
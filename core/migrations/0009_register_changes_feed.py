@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_memberactivity_time_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegisterTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('register_id', models.BigIntegerField()),
+                ('telegram_id', models.BigIntegerField(db_index=True)),
+                ('deleted', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Register Tombstone',
+                'verbose_name_plural': 'Register Tombstones',
+                'db_table': 'register_tombstone',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='register',
+            index=models.Index(fields=['updated', 'id'], name='register_updated_d3a398_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registertombstone',
+            index=models.Index(fields=['deleted', 'id'], name='register_to_deleted_9fe30f_idx'),
+        ),
+    ]
@@ -1,7 +1,25 @@
+import hashlib
 from django.db import models
 from django.core.exceptions import ValidationError
 
 
+# HemisTable qatorining mazmuni (fingerprint shu maydonlardan hisoblanadi)
+HEMIS_FINGERPRINT_FIELDS = ['fio', 'born', 'passport', 'pnfl', 'course', 'student_group']
+
+
+def hemis_fingerprint(values):
+    """Normallashtirilgan maydon qiymatlaridan md5 xesh (None va '' bir xil)"""
+    parts = []
+    for value in values:
+        if value is None:
+            parts.append('')
+        elif hasattr(value, 'isoformat'):
+            parts.append(value.isoformat())
+        else:
+            parts.append(str(value))
+    return hashlib.md5('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
 class BaseModel(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
@@ -14,9 +32,23 @@ class TelegramGroup(BaseModel):
     group_name = models.CharField(max_length=200, null=True, blank=True)
     group_id = models.BigIntegerField(unique=True, db_index=True)
     is_active = models.BooleanField(default=True)
-    
+
+    # A'zolar soni (core.group_counters orqali o'zgarishlarda yangilanadi)
+    total_members = models.PositiveIntegerField(default=0)
+    active_members = models.PositiveIntegerField(default=0)
+    linked_members = models.PositiveIntegerField(default=0)  # HemisTable bilan bog'langan
+
+    COUNTER_FIELDS = ('total_members', 'active_members', 'linked_members')
+
     def __str__(self):
         return f"{self.group_name or 'Unknown'} ({self.group_id})"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Nofaol qilinganini aniqlash uchun (signals.update_group_status)
+        instance._loaded_is_active = instance.__dict__.get('is_active')
+        return instance
     
     class Meta:
         db_table = 'telegram_group'
@@ -42,9 +74,64 @@ class Register(BaseModel):
     is_active = models.BooleanField(default=False)
     is_teacher = models.BooleanField(default=False)
 
+    # Shu maydonlar o'zgargandagina HemisTable bilan bog'lanish qayta tekshiriladi
+    IDENTITY_FIELDS = frozenset({'hemis_id', 'pnfl'})
+
     def __str__(self):
         return self.fio or self.username or str(self.telegram_id)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        refreshed = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if fields is None or field.name in fields or field.attname in fields
+        }
+        self._loaded_values = {**getattr(self, '_loaded_values', {}), **refreshed}
+
+    def get_dirty_fields(self):
+        """
+        Bazadan o'qilgandan beri o'zgargan maydonlar nomi.
+        Yangi (hali saqlanmagan) obyekt uchun None.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if self._state.adding or loaded is None:
+            return None
+        return [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key and (
+                # Kechiktirilgan (defer) maydon o'qilmasdan qiymat berilgan
+                (field.attname not in loaded and field.attname in self.__dict__)
+                or (field.attname in loaded and getattr(self, field.attname) != loaded[field.attname])
+            )
+        ]
+
+    def save(self, *args, **kwargs):
+        """
+        Mavjud yozuvda faqat o'zgargan ustunlar yoziladi (update_fields),
+        hech narsa o'zgarmagan bo'lsa so'rov yuborilmaydi.
+        """
+        dirty = self.get_dirty_fields()
+        narrow = (
+            dirty is not None and not args
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert') and not kwargs.get('force_update')
+        )
+        if narrow:
+            if not dirty:
+                return
+            kwargs['update_fields'] = [*dirty, 'updated']
+        super().save(*args, **kwargs)
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields
+        }
+
     def clean(self):
         # PNFL validation
         if self.pnfl and len(self.pnfl) != 14:
@@ -63,6 +150,25 @@ class Register(BaseModel):
         indexes = [
             models.Index(fields=['telegram_id', 'is_active']),
             models.Index(fields=['hemis_id', 'pnfl']),
+            models.Index(fields=['updated', 'id']),  # o'zgarishlar lentasi (api/users/changes/)
+        ]
+
+
+class RegisterTombstone(models.Model):
+    """O'chirilgan Register izi: botlar keshidan o'chirish uchun o'zgarishlar lentasida beriladi"""
+    register_id = models.BigIntegerField()
+    telegram_id = models.BigIntegerField(db_index=True)
+    deleted = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.telegram_id} ({self.deleted:%Y-%m-%d %H:%M})"
+
+    class Meta:
+        db_table = 'register_tombstone'
+        verbose_name = 'Register Tombstone'
+        verbose_name_plural = 'Register Tombstones'
+        indexes = [
+            models.Index(fields=['deleted', 'id']),
         ]
 
 
@@ -85,67 +191,22 @@ class HemisTable(BaseModel):
     pnfl = models.CharField(null=True, blank=True, max_length=14, unique=True, db_index=True)
     course = models.CharField(max_length=100)
     student_group = models.CharField(max_length=255)
+    fingerprint = models.CharField(
+        max_length=32, null=True, blank=True, editable=False,
+        help_text="Qator mazmunining xeshi (qayta importda o'zgarmaganlarni o'tkazish uchun)"
+    )
     
     def save(self, *args, **kwargs):
         self.full_clean()
+        self.fingerprint = self.compute_fingerprint()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(HEMIS_FINGERPRINT_FIELDS):
+            kwargs['update_fields'] = {*update_fields, 'fingerprint'}
         super().save(*args, **kwargs)
-        self._link_with_register()
-    
-    def _link_with_register(self):
-        """Link HemisTable with Register based on hemis_id and pnfl"""
-        if not self.hemis_id or not self.pnfl:
-            return
-            
-        try:
-            register = Register.objects.select_related().get(
-                hemis_id=self.hemis_id,
-                pnfl=self.pnfl
-            )
-            
-            # Link with register if not already linked
-            if not self.register:
-                self.register = register
-                HemisTable.objects.filter(id=self.id).update(register=register)
-                
-                # Activate register if not active
-                if not register.is_active:
-                    Register.objects.filter(id=register.id).update(is_active=True)
-            
-            # Sync telegram groups
-            self._sync_telegram_groups(register)
-                
-        except Register.DoesNotExist:
-            pass  # No matching register found
-        except Register.MultipleObjectsReturned:
-            # Handle multiple matches - take the first active one
-            register = Register.objects.filter(
-                hemis_id=self.hemis_id,
-                pnfl=self.pnfl,
-                is_active=True
-            ).first()
-            
-            if not register:
-                register = Register.objects.filter(
-                    hemis_id=self.hemis_id,
-                    pnfl=self.pnfl
-                ).first()
-            
-            if register and not self.register:
-                self.register = register
-                HemisTable.objects.filter(id=self.id).update(register=register)
-                
-                if not register.is_active:
-                    Register.objects.filter(id=register.id).update(is_active=True)
-                    
-                self._sync_telegram_groups(register)
-    
-    def _sync_telegram_groups(self, register):
-        """Sync telegram groups between register and hemis table"""
-        # Add register groups to hemis table
-        for group in register.register_groups.all():
-            if not self.telegram_groups.filter(id=group.id).exists():
-                self.telegram_groups.add(group)
     
+    def compute_fingerprint(self):
+        return hemis_fingerprint(getattr(self, field) for field in HEMIS_FINGERPRINT_FIELDS)
+
     def clean(self):
         # PNFL validation
         if self.pnfl and len(self.pnfl) != 14:
@@ -251,6 +312,7 @@ class MemberActivity(models.Model):
             models.Index(fields=['register', 'activity_time']),
             models.Index(fields=['telegram_group', 'activity_time']),
             models.Index(fields=['activity_type', 'activity_time']),
+            models.Index(fields=['activity_time', 'id']),  # filtrsiz kursorli sahifalash
         ]
     
     def __str__(self):
@@ -270,4 +332,190 @@ class MemberActivity(models.Model):
             return f"@{self.admin_username}"
         elif self.admin_telegram_id:
             return f"ID: {self.admin_telegram_id}"
-        return "Noma'lum"
\ No newline at end of file
+        return "Noma'lum"
+
+class HemisImportJob(BaseModel):
+    """Hemis Excel faylini fonda import qilish vazifasi"""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Navbatda'
+        RUNNING = 'running', 'Bajarilmoqda'
+        DONE = 'done', 'Tugadi'
+        FAILED = 'failed', 'Xato'
+
+    file = models.FileField(upload_to='hemis_imports/%Y/%m/')
+    upsert = models.BooleanField(
+        default=False,
+        help_text="Mavjud yozuvlarni yangilash rejimi"
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+        db_index=True
+    )
+
+    # Progress
+    total_rows = models.PositiveIntegerField(default=0, help_text="Fayldagi taxminiy qatorlar soni")
+    processed_rows = models.PositiveIntegerField(default=0)
+
+    # Natijalar
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    unchanged_count = models.PositiveIntegerField(default=0)
+    activated_count = models.PositiveIntegerField(default=0)
+    linked_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    query_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    error_message = models.TextField(blank=True, help_text="Import to'xtagan bo'lsa, sababi")
+
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Import #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def progress_percent(self):
+        if self.status == self.Status.DONE:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(99, round(self.processed_rows / self.total_rows * 100))
+
+    class Meta:
+        db_table = 'hemis_import_job'
+        verbose_name = 'Hemis Import Job'
+        verbose_name_plural = 'Hemis Import Jobs'
+        ordering = ['-created']
+
+
+class ImportRun(BaseModel):
+    """
+    Bitta Hemis importi tarixi: natijalar, bosqichlar vaqti va resurslar.
+
+    Standart rejim butun faylni bitta tranzaksiyada saqlaydi. Streaming,
+    parallel va fonda rejimlarda har bir bo'lak alohida commit qilinadi:
+    import o'rtada to'xtasa (status=failed), oldingi bo'laklar bazada qoladi,
+    to'xtagan bo'lak esa to'liq bekor qilinadi. Faylni qayta yuklash
+    xavfsiz - saqlangan qatorlar takror sifatida o'tkaziladi (upsert da
+    fingerprint bo'yicha o'zgarmagan deb hisoblanadi).
+    """
+
+    class Mode(models.TextChoices):
+        STANDARD = 'standard', 'Standart'
+        STREAM = 'stream', 'Streaming'
+        PARALLEL = 'parallel', 'Parallel'
+        BACKGROUND = 'background', 'Fonda'
+
+    class Status(models.TextChoices):
+        DONE = 'done', 'Tugadi'
+        FAILED = 'failed', 'Xato'
+
+    # Bosqichlar tartibi (timings va stage_queries kalitlari)
+    STAGES = ['read', 'clean', 'validate', 'insert', 'link', 'activate']
+
+    job = models.ForeignKey(
+        HemisImportJob,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='runs',
+        help_text="Fonda bajarilgan import vazifasi"
+    )
+    file_name = models.CharField(max_length=255, blank=True)
+    mode = models.CharField(max_length=10, choices=Mode.choices, db_index=True)
+    loader = models.CharField(max_length=10, blank=True)
+    upsert = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.DONE)
+
+    # Natijalar
+    total_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    unchanged_count = models.PositiveIntegerField(default=0)
+    activated_count = models.PositiveIntegerField(default=0)
+    linked_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    error_message = models.TextField(blank=True, help_text="Import to'xtagan bo'lsa, sababi")
+
+    # O'lchovlar
+    duration = models.FloatField(default=0, help_text="Umumiy vaqt (soniya)")
+    timings = models.JSONField(default=dict, blank=True, help_text="Bosqichlar vaqti (soniya)")
+    stage_queries = models.JSONField(default=dict, blank=True, help_text="Bosqichlar bo'yicha so'rovlar soni")
+    query_count = models.PositiveIntegerField(default=0)
+    peak_memory_mb = models.FloatField(null=True, blank=True, help_text="Jarayon xotirasining cho'qqisi (RSS)")
+
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Import run #{self.pk} ({self.get_mode_display()}, {self.get_status_display()})"
+
+    @property
+    def stage_rows(self):
+        """Shablon uchun: [(bosqich, soniya, so'rovlar)] STAGES tartibida"""
+        return [
+            (stage, self.timings.get(stage, 0), self.stage_queries.get(stage, 0))
+            for stage in self.STAGES
+        ]
+
+    @property
+    def slowest_stage(self):
+        if not self.timings:
+            return None
+        return max(self.timings, key=self.timings.get)
+
+    class Meta:
+        db_table = 'hemis_import_run'
+        verbose_name = 'Import Run'
+        verbose_name_plural = 'Import Runs'
+        ordering = ['-created']
+
+
+class GroupDeactivationJob(BaseModel):
+    """Nofaol qilingan TelegramGroup a'zoliklarini fonda bo'laklab ajratish vazifasi"""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Navbatda'
+        RUNNING = 'running', 'Bajarilmoqda'
+        DONE = 'done', 'Tugadi'
+        CANCELLED = 'cancelled', 'Bekor qilindi'
+        FAILED = 'failed', 'Xato'
+
+    group = models.ForeignKey(
+        TelegramGroup,
+        on_delete=models.CASCADE,
+        related_name='deactivation_jobs'
+    )
+    detach_members = models.BooleanField(
+        default=False,
+        help_text="Register a'zoliklarini (register_groups) ham o'chirish"
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+        db_index=True
+    )
+
+    # Natijalar
+    hemis_detached = models.PositiveIntegerField(default=0, help_text="O'chirilgan HemisTable a'zoliklari")
+    members_detached = models.PositiveIntegerField(default=0, help_text="O'chirilgan Register a'zoliklari")
+    chunks = models.PositiveIntegerField(default=0)
+    error_message = models.TextField(blank=True)
+
+    duration = models.FloatField(default=0, help_text="Umumiy vaqt (soniya)")
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Guruh #{self.group_id} ajratish ({self.get_status_display()})"
+
+    class Meta:
+        db_table = 'group_deactivation_job'
+        verbose_name = 'Group Deactivation Job'
+        verbose_name_plural = 'Group Deactivation Jobs'
+        ordering = ['-created']
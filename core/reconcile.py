@@ -0,0 +1,329 @@
+import logging
+import time
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from core.group_counters import recount_group_counters, stale_group_counters
+from core.linking import insert_hemis_groups
+from core.models import HemisTable, Register, TelegramGroup
+
+logger = logging.getLogger(__name__)
+
+# Bir tranzaksiyada tekshiriladigan HemisTable id oralig'i
+RECONCILE_CHUNK_SIZE = 5000
+
+# Tuzatish qadamlari (natija kalitlari) bajarilish tartibida
+RECONCILE_STEPS = ['unlinked', 'linked', 'activated', 'groups_added', 'groups_removed']
+
+STEP_LABELS = {
+    'unlinked': "noto'g'ri bog'lanish uzildi",
+    'linked': "HemisTable Register bilan bog'landi",
+    'activated': "Register faollashtirildi",
+    'groups_added': "guruh a'zoligi qo'shildi",
+    'groups_removed': "ortiqcha guruh a'zoligi o'chirildi",
+}
+
+
+def reconcile_links(chunk_size=RECONCILE_CHUNK_SIZE, dry_run=False, prune_unlinked=False,
+                    samples=5, log=None):
+    """
+    Register <-> HemisTable bog'lanishlarini, Register faolligini va HemisTable
+    guruh a'zoliklarini to'liq qayta hisoblash. HemisTable id oraliqlari
+    bo'yicha to'plamli SQL bilan ishlaydi, har bir oraliq alohida qisqa
+    tranzaksiyada commit qilinadi (jadvallar uzoq qulflanmaydi).
+
+    Noto'g'ri bog'lanishlar avval butun jadval bo'yicha uziladi, shunda
+    bo'shagan Registerlar keyingi o'tishda to'g'ri yozuvga bog'lanadi.
+    dry_run=True bo'lsa, hech narsa yozilmaydi: har bir qadam uchun xuddi
+    shu shartli SELECT so'rovi tuzatishdan keyingi holatni (Register
+    (hemis_id, pnfl) bo'yicha mos yozuvga bog'langan) hisoblaydi, shuning
+    uchun bitta o'tish yetarli va qatorlar qulflanmaydi.
+    prune_unlinked=True bo'lsa, bog'lanmagan yozuvlarning guruh a'zoliklari
+    ham o'chiriladi.
+
+    Oxirida guruhlarning a'zolar hisoblagichlari ham qayta hisoblanadi.
+
+    Qaytaradi: {'counts': {qadam: soni}, 'samples': {qadam: [qatorlar]}, 'chunks',
+                'counters_fixed', 'duration'}
+    """
+    started = time.perf_counter()
+    report = {
+        'counts': dict.fromkeys(RECONCILE_STEPS, 0),
+        'samples': {step: [] for step in RECONCILE_STEPS},
+        'chunks': 0,
+        'counters_fixed': 0,
+        'dry_run': dry_run,
+    }
+
+    bounds = HemisTable.objects.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        report['duration'] = round(time.perf_counter() - started, 2)
+        return report
+    ranges = [
+        (start, start + chunk_size)
+        for start in range(bounds['low'], bounds['high'] + 1, chunk_size)
+    ]
+    report['chunks'] = len(ranges)
+
+    def run_pass(steps):
+        for start, end in ranges:
+            with transaction.atomic():
+                for step in steps:
+                    rows = (DRY_RUN_SQL if dry_run else RECONCILE_SQL)[step](start, end, prune_unlinked)
+                    report['counts'][step] += rows['count']
+                    report['samples'][step].extend(rows['samples'][:samples - len(report['samples'][step])])
+            if log:
+                log(f"{start}-{end - 1}: " + ', '.join(f"{step} {report['counts'][step]}" for step in steps))
+
+    if dry_run:
+        run_pass(RECONCILE_STEPS)
+        report['counters_fixed'] = len(stale_group_counters(
+            hemis_join=MATCHING_HEMIS, active='r.is_active OR h.id IS NOT NULL'
+        ))
+    else:
+        run_pass(['unlinked'])
+        run_pass(['linked', 'activated', 'groups_added', 'groups_removed'])
+        # Bog'lanish va faollik o'zgargani uchun guruh hisoblagichlari qayta hisoblanadi
+        report['counters_fixed'] = len(recount_group_counters())
+
+    report['duration'] = round(time.perf_counter() - started, 2)
+    if not dry_run and any(report['counts'].values()):
+        logger.info(f"🔧 Bog'lanishlar tuzatildi: {report['counts']}")
+    return report
+
+
+def fetch_result(cursor, sample_limit=20):
+    """DML RETURNING natijasi: {'count': .., 'samples': [birinchi qatorlar]}"""
+    count = cursor.rowcount
+    samples = cursor.fetchmany(sample_limit) if cursor.description else []
+    return {'count': count, 'samples': [tuple(row) for row in samples]}
+
+
+def unlink_wrong(start, end, prune_unlinked=False):
+    """Register i (hemis_id, pnfl) bo'yicha mos kelmaydigan bog'lanishlarni uzish"""
+    hemis_table = HemisTable._meta.db_table
+    register_table = Register._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {hemis_table} h
+            SET register_id = NULL, updated = clock_timestamp()
+            FROM {hemis_table} old
+            WHERE old.id = h.id
+              AND h.id >= %s AND h.id < %s
+              AND h.register_id IS NOT NULL
+              AND NOT EXISTS (
+                  SELECT 1 FROM {register_table} r
+                  WHERE r.id = h.register_id AND r.hemis_id = h.hemis_id AND r.pnfl = h.pnfl
+              )
+            RETURNING h.hemis_id, old.register_id
+            """,
+            [start, end]
+        )
+        return fetch_result(cursor)
+
+
+def link_missing(start, end, prune_unlinked=False):
+    """Bog'lanmagan yozuvlarni bo'sh (boshqa yozuvga bog'lanmagan) mos Registerga bog'lash"""
+    hemis_table = HemisTable._meta.db_table
+    register_table = Register._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {hemis_table} h
+            SET register_id = r.id, updated = clock_timestamp()
+            FROM {register_table} r
+            WHERE h.id >= %s AND h.id < %s
+              AND h.register_id IS NULL
+              AND r.hemis_id = h.hemis_id
+              AND r.pnfl = h.pnfl
+              AND NOT EXISTS (
+                  SELECT 1 FROM {hemis_table} linked WHERE linked.register_id = r.id
+              )
+            RETURNING h.hemis_id, r.id
+            """,
+            [start, end]
+        )
+        return fetch_result(cursor)
+
+
+def activate_linked(start, end, prune_unlinked=False):
+    """Bog'langan, lekin nofaol Registerlarni faollashtirish"""
+    hemis_table = HemisTable._meta.db_table
+    register_table = Register._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {register_table} r
+            SET is_active = true, updated = clock_timestamp()
+            FROM {hemis_table} h
+            WHERE h.id >= %s AND h.id < %s
+              AND h.register_id = r.id
+              AND r.is_active = false
+            RETURNING r.hemis_id, r.id
+            """,
+            [start, end]
+        )
+        return fetch_result(cursor)
+
+
+def add_missing_groups(start, end, prune_unlinked=False):
+    """Register ning faol guruhlarini bog'langan yozuvlarga qo'shish"""
+    with connection.cursor() as cursor:
+        count = insert_hemis_groups(cursor, 'h.id >= %s AND h.id < %s', [start, end])
+    return {'count': count, 'samples': []}
+
+
+def remove_stale_groups(start, end, prune_unlinked=False):
+    """Register da bo'lmagan guruh a'zoliklarini o'chirish"""
+    hemis_table = HemisTable._meta.db_table
+    hemis_groups = HemisTable.telegram_groups.through._meta.db_table
+    register_groups = Register.register_groups.through._meta.db_table
+    linked_only = '' if prune_unlinked else 'AND h.register_id IS NOT NULL'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            DELETE FROM {hemis_groups} hg
+            USING {hemis_table} h
+            WHERE hg.hemistable_id = h.id
+              AND h.id >= %s AND h.id < %s
+              {linked_only}
+              AND NOT EXISTS (
+                  SELECT 1 FROM {register_groups} rg
+                  WHERE rg.register_id = h.register_id
+                    AND rg.telegramgroup_id = hg.telegramgroup_id
+              )
+            RETURNING h.hemis_id, hg.telegramgroup_id
+            """,
+            [start, end]
+        )
+        return fetch_result(cursor)
+
+
+# Tuzatishdan keyingi holat: HemisTable (hemis_id, pnfl) bo'yicha mos Registerga bog'langan
+# (hemis_id va pnfl unique, shuning uchun har bir yozuvga ko'pi bilan bitta Register mos keladi)
+MATCHING_HEMIS = 'h.hemis_id = r.hemis_id AND h.pnfl = r.pnfl'
+
+
+def select_result(sql, params, sample_limit=20):
+    """Dry-run SELECT natijasi: fetch_result bilan bir xil ko'rinishda"""
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return fetch_result(cursor, sample_limit)
+
+
+def diff_unlink_wrong(start, end, prune_unlinked=False):
+    """unlink_wrong uziladigan bog'lanishlar"""
+    hemis_table = HemisTable._meta.db_table
+    register_table = Register._meta.db_table
+    return select_result(
+        f"""
+        SELECT h.hemis_id, h.register_id
+        FROM {hemis_table} h
+        WHERE h.id >= %s AND h.id < %s
+          AND h.register_id IS NOT NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM {register_table} r
+              WHERE r.id = h.register_id AND r.hemis_id = h.hemis_id AND r.pnfl = h.pnfl
+          )
+        """,
+        [start, end]
+    )
+
+
+def diff_link_missing(start, end, prune_unlinked=False):
+    """link_missing bog'laydigan yozuvlar (uzilgandan keyin qayta bog'lanadiganlar ham)"""
+    hemis_table = HemisTable._meta.db_table
+    register_table = Register._meta.db_table
+    return select_result(
+        f"""
+        SELECT h.hemis_id, r.id
+        FROM {hemis_table} h
+        JOIN {register_table} r ON {MATCHING_HEMIS}
+        WHERE h.id >= %s AND h.id < %s
+          AND h.register_id IS DISTINCT FROM r.id
+        """,
+        [start, end]
+    )
+
+
+def diff_activate_linked(start, end, prune_unlinked=False):
+    """activate_linked faollashtiradigan Registerlar"""
+    hemis_table = HemisTable._meta.db_table
+    register_table = Register._meta.db_table
+    return select_result(
+        f"""
+        SELECT r.hemis_id, r.id
+        FROM {register_table} r
+        JOIN {hemis_table} h ON {MATCHING_HEMIS}
+        WHERE h.id >= %s AND h.id < %s
+          AND r.is_active = false
+        """,
+        [start, end]
+    )
+
+
+def diff_add_missing_groups(start, end, prune_unlinked=False):
+    """add_missing_groups qo'shadigan a'zoliklar"""
+    hemis_table = HemisTable._meta.db_table
+    register_table = Register._meta.db_table
+    hemis_groups = HemisTable.telegram_groups.through._meta.db_table
+    register_groups = Register.register_groups.through._meta.db_table
+    group_table = TelegramGroup._meta.db_table
+    return select_result(
+        f"""
+        SELECT h.hemis_id, rg.telegramgroup_id
+        FROM {hemis_table} h
+        JOIN {register_table} r ON {MATCHING_HEMIS}
+        JOIN {register_groups} rg ON rg.register_id = r.id
+        JOIN {group_table} g ON g.id = rg.telegramgroup_id AND g.is_active
+        WHERE h.id >= %s AND h.id < %s
+          AND NOT EXISTS (
+              SELECT 1 FROM {hemis_groups} hg
+              WHERE hg.hemistable_id = h.id AND hg.telegramgroup_id = rg.telegramgroup_id
+          )
+        """,
+        [start, end]
+    )
+
+
+def diff_remove_stale_groups(start, end, prune_unlinked=False):
+    """remove_stale_groups o'chiradigan a'zoliklar"""
+    hemis_table = HemisTable._meta.db_table
+    register_table = Register._meta.db_table
+    hemis_groups = HemisTable.telegram_groups.through._meta.db_table
+    register_groups = Register.register_groups.through._meta.db_table
+    linked_only = '' if prune_unlinked else 'AND r.id IS NOT NULL'
+    return select_result(
+        f"""
+        SELECT h.hemis_id, hg.telegramgroup_id
+        FROM {hemis_groups} hg
+        JOIN {hemis_table} h ON h.id = hg.hemistable_id
+        LEFT JOIN {register_table} r ON {MATCHING_HEMIS}
+        WHERE h.id >= %s AND h.id < %s
+          {linked_only}
+          AND NOT EXISTS (
+              SELECT 1 FROM {register_groups} rg
+              WHERE rg.register_id = r.id
+                AND rg.telegramgroup_id = hg.telegramgroup_id
+          )
+        """,
+        [start, end]
+    )
+
+
+RECONCILE_SQL = {
+    'unlinked': unlink_wrong,
+    'linked': link_missing,
+    'activated': activate_linked,
+    'groups_added': add_missing_groups,
+    'groups_removed': remove_stale_groups,
+}
+
+# Dry-run uchun: xuddi shu shartlar, faqat SELECT
+DRY_RUN_SQL = {
+    'unlinked': diff_unlink_wrong,
+    'linked': diff_link_missing,
+    'activated': diff_activate_linked,
+    'groups_added': diff_add_missing_groups,
+    'groups_removed': diff_remove_stale_groups,
+}
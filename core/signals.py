@@ -1,10 +1,12 @@
 # core/signals.py - Optimized Version
 
 import logging
-from django.db.models.signals import post_save, m2m_changed
+from django.db.models.signals import post_save, pre_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
-from django.db import transaction
-from core.models import Register, HemisTable, TelegramGroup
+from core.models import Register, RegisterTombstone, HemisTable, TelegramGroup
+from core.group_counters import ACTIVE, LINKED, change_member_counters, shift_member_counter
+from core.group_jobs import enqueue_deactivation
+from core.linking import queue_link, sync_register_groups
 
 logger = logging.getLogger(__name__)
 
@@ -12,185 +14,192 @@ logger = logging.getLogger(__name__)
 @receiver(post_save, sender=Register)
 def link_register_with_hemis(sender, instance, created, **kwargs):
     """
-    Register yaratilganda yoki yangilanganda:
-    1. HemisTable bilan bog'lash
-    2. Register ni faollashtirish
-    3. HemisTable ni Register guruhlariga qo'shish
+    Register yaratilganda yoki hemis_id/pnfl o'zgarganda HemisTable bilan
+    bog'lashni navbatga qo'yish. Bog'lash, faollashtirish va guruhlarni
+    ko'chirish tranzaksiya commit bo'lgandan keyin bitta to'plam bilan bajariladi.
+    Telefon, manzil kabi maydonlar yangilanganda hech narsa qilinmaydi.
     """
     # Raw save yoki kerakli maydonlar bo'sh bo'lsa skip
     if kwargs.get('raw', False) or not instance.hemis_id or not instance.pnfl:
         return
-        
-    try:
-        with transaction.atomic():
-            # HemisTable da mos keluvchi yozuvni topish
-            hemis_records = HemisTable.objects.filter(
-                hemis_id=instance.hemis_id,
-                pnfl=instance.pnfl
-            )
-            
-            if not hemis_records.exists():
-                logger.info(f"HemisTable topilmadi - Hemis ID: {instance.hemis_id}, PNFL: {instance.pnfl}")
-                return
-            
-            # Birinchi bog'lanmagan yozuvni olish
-            hemis_record = hemis_records.filter(register__isnull=True).first()
-            
-            if not hemis_record:
-                # Agar bog'lanmagan topilmasa, birinchisini olish
-                hemis_record = hemis_records.first()
-                if hemis_record.register == instance:
-                    # Allaqachon bog'langan
-                    _sync_groups_for_register(instance, hemis_record)
-                    return
-            
-            # HemisTable ni Register bilan bog'lash
-            if hemis_record and not hemis_record.register:
-                HemisTable.objects.filter(id=hemis_record.id).update(register=instance)
-                logger.info(f"✅ HemisTable '{hemis_record.fio}' Register bilan bog'landi")
-                
-                # Register ni faollashtirish
-                if not instance.is_active:
-                    Register.objects.filter(id=instance.id).update(is_active=True)
-                    logger.info(f"✅ Register '{instance}' faollashtirildi")
-                
-                # Guruhlarni sinxronlashtirish
-                _sync_groups_for_register(instance, hemis_record)
-                
-    except Exception as e:
-        logger.error(f"Register-HemisTable bog'lashda xato: {e}")
+
+    update_fields = kwargs.get('update_fields')
+    if not created and update_fields is not None and not set(update_fields) & Register.IDENTITY_FIELDS:
+        return
+    queue_link(instance.hemis_id, instance.pnfl, using=kwargs.get('using'))
+
+
+# Shu maydonlar saqlanganda bog'lanish o'zgarishi mumkin
+HEMIS_LINK_FIELDS = {'hemis_id', 'pnfl', 'register'}
 
 
 @receiver(post_save, sender=HemisTable)
 def link_hemis_with_register(sender, instance, created, **kwargs):
     """
-    HemisTable yaratilganda yoki yangilanganda:
-    1. Register bilan bog'lash
-    2. Register ni faollashtirish
-    3. HemisTable ni Register guruhlariga qo'shish
+    HemisTable yaratilganda yoki bog'lash maydonlari yangilanganda
+    Register bilan bog'lashni navbatga qo'yish (commitdan keyin bajariladi)
     """
-    # Raw save yoki yangi yaratilmagan bo'lsa yoki kerakli maydonlar bo'sh bo'lsa skip
-    if kwargs.get('raw', False) or not created or not instance.hemis_id or not instance.pnfl:
+    if kwargs.get('raw', False) or not instance.hemis_id or not instance.pnfl:
+        return
+
+    update_fields = kwargs.get('update_fields')
+    if not created and update_fields is not None and not set(update_fields) & HEMIS_LINK_FIELDS:
         return
-        
+    queue_link(instance.hemis_id, instance.pnfl, using=kwargs.get('using'))
+
+
+@receiver(m2m_changed, sender=Register.register_groups.through)
+def sync_register_groups_to_hemis(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Register guruhlariga o'zgarish bo'lganda HemisTable ni ham yangilash
+    (register.register_groups.add(...) va group.members.add(...) ikkalasi uchun).
+    Qo'shish va o'chirish bitta INSERT va bitta DELETE bilan bajariladi.
+    """
+    if action not in ['post_add', 'post_remove', 'post_clear']:
+        return
+
     try:
-        with transaction.atomic():
-            # Register da mos keluvchi yozuvni topish
-            registers = Register.objects.filter(
-                hemis_id=instance.hemis_id,
-                pnfl=instance.pnfl
-            )
-            
-            if not registers.exists():
-                logger.info(f"Register topilmadi - Hemis ID: {instance.hemis_id}, PNFL: {instance.pnfl}")
+        if reverse:
+            # instance - TelegramGroup, pk_set - Register id lari
+            if action == 'post_clear':
+                register_ids = HemisTable.objects.filter(
+                    telegram_groups=instance, register__isnull=False
+                ).values_list('register_id', flat=True)
+            else:
+                register_ids = pk_set or []
+            result = sync_register_groups(register_ids, group_ids=[instance.pk])
+        else:
+            group_ids = None if action == 'post_clear' else (pk_set or [])
+            if group_ids is not None and not group_ids:
                 return
-            
-            # Birinchi nofaol yozuvni olish, aks holda birinchisini
-            register = registers.filter(is_active=False).first()
-            if not register:
-                register = registers.first()
-            
-            # HemisTable ni Register bilan bog'lash
-            if register and not instance.register:
-                HemisTable.objects.filter(id=instance.id).update(register=register)
-                logger.info(f"✅ HemisTable '{instance.fio}' Register bilan bog'landi")
-                
-                # Register ni faollashtirish
-                if not register.is_active:
-                    Register.objects.filter(id=register.id).update(is_active=True)
-                    logger.info(f"✅ Register '{register}' faollashtirildi")
-                
-                # Guruhlarni sinxronlashtirish
-                _sync_groups_for_hemis(register, instance)
-                
+            result = sync_register_groups([instance.pk], group_ids=group_ids)
+
+        if result['added'] or result['removed']:
+            logger.info(
+                f"✅ Guruh a'zoliklari sinxronlandi: {result['added']} ta qo'shildi, "
+                f"{result['removed']} ta olib tashlandi"
+            )
+
     except Exception as e:
-        logger.error(f"HemisTable-Register bog'lashda xato: {e}")
+        logger.error(f"Register guruhlarini sinxronlashda xato: {e}")
 
 
-def _sync_groups_for_register(register_instance, hemis_record):
-    """Register guruhlarini HemisTable bilan sinxronlashtirish"""
+@receiver(m2m_changed, sender=Register.register_groups.through)
+def update_group_counters(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    A'zolik qo'shilganda guruh hisoblagichlarini oshirish, o'chirilishidan
+    oldin (pre_remove/pre_clear - qatorlar hali bazada) kamaytirish.
+    post_add dagi pk_set faqat haqiqatan qo'shilgan id lardan iborat.
+    """
+    signs = {'post_add': 1, 'pre_remove': -1, 'pre_clear': -1}
+    if action not in signs:
+        return
+
     try:
-        # Register guruhlarini HemisTable ga qo'shish
-        register_groups = register_instance.register_groups.filter(is_active=True)
-        
-        for group in register_groups:
-            if not hemis_record.telegram_groups.filter(id=group.id).exists():
-                hemis_record.telegram_groups.add(group)
-                logger.info(f"✅ HemisTable '{hemis_record.fio}' guruhga qo'shildi: {group}")
-                
+        if reverse:
+            # instance - TelegramGroup, pk_set - Register id lari
+            register_ids = None if action == 'pre_clear' else (pk_set or [])
+            change_member_counters(signs[action], register_ids=register_ids, group_ids=[instance.pk])
+        else:
+            group_ids = None if action == 'pre_clear' else (pk_set or [])
+            change_member_counters(signs[action], register_ids=[instance.pk], group_ids=group_ids)
     except Exception as e:
-        logger.error(f"Register guruhlarini sinxronlashda xato: {e}")
+        logger.error(f"Guruh hisoblagichlarini yangilashda xato: {e}")
 
 
-def _sync_groups_for_hemis(register_instance, hemis_record):
-    """HemisTable uchun Register guruhlarini sinxronlashtirish"""
+@receiver(post_save, sender=Register)
+def update_active_member_counters(sender, instance, created, **kwargs):
+    """Mavjud Register faolligi o'zgarganda uning guruhlaridagi active_members ni surish"""
+    if kwargs.get('raw', False) or created:
+        return
+
+    loaded = getattr(instance, '_loaded_values', None)
+    if not loaded or 'is_active' not in loaded or loaded['is_active'] == instance.is_active:
+        return
     try:
-        # Register guruhlarini HemisTable ga qo'shish
-        register_groups = register_instance.register_groups.filter(is_active=True)
-        
-        for group in register_groups:
-            if not hemis_record.telegram_groups.filter(id=group.id).exists():
-                hemis_record.telegram_groups.add(group)
-                logger.info(f"✅ HemisTable '{hemis_record.fio}' guruhga qo'shildi: {group}")
-                
+        shift_member_counter([instance.pk], ACTIVE, 1 if instance.is_active else -1)
     except Exception as e:
-        logger.error(f"HemisTable guruhlarini sinxronlashda xato: {e}")
+        logger.error(f"Guruh hisoblagichlarini yangilashda xato: {e}")
 
 
-@receiver(m2m_changed, sender=Register.register_groups.through)
-def sync_register_groups_to_hemis(sender, instance, action, pk_set, **kwargs):
-    """
-    Register guruhlariga o'zgarish bo'lganda HemisTable ni ham yangilash
-    """
-    if action not in ['post_add', 'post_remove']:
+@receiver(pre_delete, sender=Register)
+def remove_register_from_counters(sender, instance, **kwargs):
+    """Register o'chirilishidan oldin uning a'zoliklarini hisoblagichlardan ayirish"""
+    try:
+        change_member_counters(-1, register_ids=[instance.pk])
+    except Exception as e:
+        logger.error(f"Guruh hisoblagichlarini yangilashda xato: {e}")
+
+
+@receiver(post_delete, sender=Register)
+def record_register_tombstone(sender, instance, **kwargs):
+    """O'chirilgan Register ni o'zgarishlar lentasi uchun qayd etish"""
+    try:
+        RegisterTombstone.objects.create(register_id=instance.pk, telegram_id=instance.telegram_id)
+    except Exception as e:
+        logger.error(f"Register o'chirilganini qayd etishda xato: {e}")
+
+
+@receiver(pre_save, sender=HemisTable)
+def remember_hemis_register(sender, instance, **kwargs):
+    """Saqlashdan oldingi register_id (linked_members ni yangilash uchun)"""
+    update_fields = kwargs.get('update_fields')
+    if kwargs.get('raw', False) or instance._state.adding:
+        instance._old_register_id = None
+    elif update_fields is not None and not {'register', 'register_id'} & set(update_fields):
+        instance._old_register_id = instance.register_id
+    else:
+        instance._old_register_id = HemisTable.objects.filter(
+            pk=instance.pk
+        ).values_list('register_id', flat=True).first()
+
+
+@receiver(post_save, sender=HemisTable)
+def update_linked_member_counters(sender, instance, created, **kwargs):
+    """HemisTable boshqa Registerga bog'langanda yoki bog'lanish uzilganda linked_members ni surish"""
+    old_register_id = getattr(instance, '_old_register_id', None)
+    if kwargs.get('raw', False) or old_register_id == instance.register_id:
         return
-        
     try:
-        # Register ga bog'langan HemisTable ni topish
-        if hasattr(instance, 'hemis_data') and instance.hemis_data:
-            hemis_record = instance.hemis_data
-            
-            if action == 'post_add' and pk_set:
-                # Yangi guruhlarni qo'shish
-                new_groups = TelegramGroup.objects.filter(
-                    id__in=pk_set, 
-                    is_active=True
-                )
-                
-                for group in new_groups:
-                    if not hemis_record.telegram_groups.filter(id=group.id).exists():
-                        hemis_record.telegram_groups.add(group)
-                        logger.info(f"✅ Yangi guruh qo'shildi: {group} -> {hemis_record.fio}")
-            
-            elif action == 'post_remove' and pk_set:
-                # Guruhlarni olib tashlash
-                hemis_record.telegram_groups.remove(*pk_set)
-                logger.info(f"🗑️ Guruhlar olib tashlandi: {pk_set} -> {hemis_record.fio}")
-                
+        if old_register_id:
+            shift_member_counter([old_register_id], LINKED, -1)
+        if instance.register_id:
+            shift_member_counter([instance.register_id], LINKED, 1)
     except Exception as e:
-        logger.error(f"Register guruhlarini sinxronlashda xato: {e}")
+        logger.error(f"Guruh hisoblagichlarini yangilashda xato: {e}")
+
+
+@receiver(pre_delete, sender=HemisTable)
+def unlink_hemis_from_counters(sender, instance, **kwargs):
+    """Bog'langan HemisTable o'chirilganda Register guruhlaridagi linked_members ni kamaytirish"""
+    if not instance.register_id:
+        return
+    try:
+        shift_member_counter([instance.register_id], LINKED, -1)
+    except Exception as e:
+        logger.error(f"Guruh hisoblagichlarini yangilashda xato: {e}")
 
 
 @receiver(post_save, sender=TelegramGroup)
 def update_group_status(sender, instance, created, **kwargs):
     """
-    TelegramGroup nofaol qilinganda bog'langan yozuvlarni yangilash
+    TelegramGroup nofaol qilinganda a'zoliklarni ajratish vazifasini navbatga
+    qo'yish. Og'ir ish (M2M jadvallaridan bo'laklab o'chirish, hisoblagichlar)
+    process_group_deactivations workerida bajariladi, saqlash darhol qaytadi.
     """
-    if kwargs.get('raw', False) or created:
+    was_active = getattr(instance, '_loaded_is_active', None)
+    instance._loaded_is_active = instance.is_active
+    if kwargs.get('raw', False) or created or instance.is_active or was_active is False:
         return
-        
+
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'is_active' not in update_fields:
+        return
+
     try:
-        if not instance.is_active:
-            # Nofaol guruh bilan bog'langan HemisTable larni topish
-            affected_hemis = HemisTable.objects.filter(
-                telegram_groups=instance
-            )
-            
-            logger.info(f"📊 Nofaol guruh '{instance}' bilan bog'langan {affected_hemis.count()} ta HemisTable topildi")
-            
-            # Bu yerda kerak bo'lsa qo'shimcha ishlarni bajarish mumkin
-            # Masalan, foydalanuvchilarni boshqa faol guruhga ko'chirish
-            
+        job, queued = enqueue_deactivation(instance)
+        if queued:
+            logger.info(f"📥 Nofaol guruh '{instance}' uchun {job} navbatga qo'yildi")
     except Exception as e:
         logger.error(f"TelegramGroup holatini yangilashda xato: {e}")
 
@@ -1,3 +1,985 @@
-from django.test import TestCase
+import os
+import random
+import shutil
+import tempfile
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+import pandas as pd
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+
+from core import hemis_import, hemis_jobs
+from openpyxl import Workbook
+
+from core.forms import ExcelUploadForm
+from core.hemis_benchmark import HEMIS_HEADERS, HEMIS_ID_START, PNFL_START, generate_hemis_xlsx, make_hemis_row
+from core.hemis_import import (
+    HemisKeyIndex, LOADER_COPY, LOADER_ORM, clean_frame, process_excel_file, process_excel_parallel,
+    process_excel_stream,
+)
+from core.hemis_loader import copy_hemis_records, find_conflicts
+from core import hemis_parallel
+from core.hemis_parallel import iter_parallel_frames
+from core.hemis_runs import record_import_run
+from core.hemis_schema import EXCEL_COLUMNS, resolve_columns, to_id, typed_frame
+from core.admin import HemisTableAdmin
+from core.group_counters import (
+    clear_hemis_registers, recount_group_counters, stale_group_counters, update_registers,
+)
+from core.group_jobs import claim_next_deactivation, run_deactivation_job
+from core.hemis_jobs import claim_next_job, enqueue_import, run_import_job
+from core.linking import sync_register_groups
+from core.models import GroupDeactivationJob, HemisImportJob, HemisTable, ImportRun, Register, TelegramGroup
+from core.reconcile import reconcile_links
+
+
+def make_xlsx(test, rows, **options):
+    """Test uchun sintetik Hemis fayli (test oxirida o'chiriladi)"""
+    handle, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(handle)
+    test.addCleanup(os.remove, path)
+    options.setdefault('dup_ratio', 0)
+    options.setdefault('invalid_ratio', 0)
+    generate_hemis_xlsx(path, rows, **options)
+    return path
+
+
+def make_sheets_xlsx(test, sheets):
+    """{varaq nomi: [qator indekslari yoki None (bo'sh qator)]} bo'yicha ko'p varaqli fayl"""
+    handle, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(handle)
+    test.addCleanup(os.remove, path)
+    rng = random.Random(1)
+    workbook = Workbook(write_only=True)
+    for name, indexes in sheets.items():
+        sheet = workbook.create_sheet(name)
+        sheet.append(HEMIS_HEADERS)
+        for index in indexes:
+            sheet.append([None] * len(HEMIS_HEADERS) if index is None else make_hemis_row(rng, index))
+    workbook.save(path)
+    return path
+
+
+def hemis_frame(rows):
+    """(hemis_id, fio, passport, pnfl) qatorlaridan sxema bo'yicha bo'lak"""
+    return typed_frame(
+        [
+            [hemis_id, fio, None, None, None, None, None, None, '01.01.2000', passport, pnfl, None, '1', None, 'g']
+            for hemis_id, fio, passport, pnfl in rows
+        ],
+        pd.RangeIndex(0, len(rows)),
+    )
+
+
+def pnfl(number):
+    return str(10 ** 13 + number)
+
+
+class CleanFrameTests(SimpleTestCase):
+
+    def test_chained_duplicates_follow_row_order(self):
+        """Rad etilgan qatorning kalitlari band bo'lmaydi, o'tkazilganlarniki band bo'ladi"""
+        frame = hemis_frame([
+            ('1', 'Ali Valiyev', 'AA0000001', pnfl(1)),
+            ('2', 'Ali Valiyev', 'AA0000002', pnfl(1)),  # PNFL takror
+            ('3', 'Ali Valiyev', 'AA0000002', pnfl(2)),  # passporti bo'sh qoldi
+            ('1', 'Ali Valiyev', 'AA0000003', pnfl(3)),  # hemis_id takror - o'tkaziladi
+            ('4', 'Ali Valiyev', 'AA0000004', pnfl(3)),  # PNFL oldingi qatorda band
+        ])
+        key_index = HemisKeyIndex()
+        clean_df, errors = clean_frame(frame, key_index)
+
+        self.assertEqual(clean_df['hemis_id'].tolist(), [1, 3])
+        self.assertEqual(errors, ["Qator 3: PNFL allaqachon mavjud", "Qator 6: PNFL allaqachon mavjud"])
+        self.assertEqual(key_index.hemis_ids, {'1', '3'})
+        self.assertEqual(set(key_index.passports), {'AA0000001', 'AA0000002'})
+
+    def test_long_conflict_chain_is_single_pass(self):
+        """Zanjir uzunligi bo'yicha qayta hisoblash yo'q: har ikkinchi qator rad etiladi"""
+        rows = [
+            (str(index + 1), 'Ali Valiyev', f"AA{index // 2:07d}", pnfl((index + 1) // 2))
+            for index in range(3000)
+        ]
+        clean_df, errors = clean_frame(hemis_frame(rows), HemisKeyIndex())
+
+        self.assertEqual(len(clean_df), 1500)
+        self.assertEqual(len(errors), 1500)
+
+    def test_existing_keys_are_taken(self):
+        frame = hemis_frame([
+            ('5', 'Ali Valiyev', 'AA0000005', pnfl(5)),
+            ('6', 'Ali Valiyev', 'AA0000006', pnfl(7)),
+            ('8', 'Ali Valiyev', 'AA0000007', pnfl(8)),
+        ])
+        key_index = HemisKeyIndex({'5'}, {pnfl(7): '7'}, {'AA0000007': '7'})
+        clean_df, errors = clean_frame(frame, key_index)
+
+        self.assertTrue(clean_df.empty)
+        self.assertEqual(errors, ["Qator 3: PNFL allaqachon mavjud", "Qator 4: Passport allaqachon mavjud"])
+
+
+class HemisSchemaTests(SimpleTestCase):
+
+    def test_ids_keep_digits(self):
+        self.assertEqual(to_id(300001), '300001')
+        self.assertEqual(to_id(300001.0), '300001')
+        self.assertEqual(to_id(float(PNFL_START)), str(PNFL_START))
+        self.assertEqual(to_id(' 300001 '), '300001')
+        self.assertEqual(to_id('ID-1'), 'ID-1')
+        self.assertEqual(to_id(None), '')
+        self.assertEqual(to_id(float('nan')), '')
+
+    def test_headers_resolve_in_any_order(self):
+        columns = resolve_columns(['Guruh', ' pinfl ', 'Ф.И.О.', 'Student ID', 'Tug‘ilgan  sana', 'Kurs'])
+
+        self.assertEqual(
+            columns,
+            {**EXCEL_COLUMNS, 'student_group': 0, 'pnfl': 1, 'fio': 2, 'hemis_id': 3, 'born': 4, 'course': 5},
+        )
+        self.assertEqual(resolve_columns(None), EXCEL_COLUMNS)
+
+
+class SchemaImportTests(TestCase):
+
+    def test_reordered_columns_with_float_ids(self):
+        """Ustunlar tartibi boshqa va identifikatorlar float bo'lsa ham ikkala o'qish usuli bir xil"""
+        handle, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['PNFL', 'Kurs', 'Guruh', 'FIO', 'ID', 'Passport', 'Tugilgan sana'])
+        sheet.append([float(PNFL_START), '1-kurs', '101-21', 'Ali Valiyev', 300001.0, 'AA1234567', '01.02.2003'])
+        sheet.append([PNFL_START + 1, '2-kurs', '102-21', 'Vali Aliyev', 300002, None, None])
+        workbook.save(path)
+
+        rows = []
+        for process in (process_excel_stream, process_excel_file):
+            HemisTable.objects.all().delete()
+            result = process(path)
+            self.assertEqual((result['created_count'], result['errors']), (2, []))
+            rows.append(list(HemisTable.objects.order_by('hemis_id').values_list(*HEMIS_FIELDS[:-1])))
+
+        self.assertEqual(rows[0], rows[1])
+        self.assertEqual(rows[0], [
+            (300001, 'Ali Valiyev', date(2003, 2, 1), 'AA1234567', str(PNFL_START), '1-kurs', '101-21'),
+            (300002, 'Vali Aliyev', None, None, str(PNFL_START + 1), '2-kurs', '102-21'),
+        ])
+
+
+class StreamImportTests(TestCase):
+
+    def test_chunks_commit_individually(self):
+        """Bo'lakda xato bo'lsa, oldingi bo'laklar saqlanib qoladi"""
+        path = make_xlsx(self, 12)
+        process_chunk = hemis_import.process_chunk
+        calls = []
+
+        def failing_chunk(frame, *args, **kwargs):
+            calls.append(len(frame))
+            if len(calls) == 2:
+                raise RuntimeError('chunk failed')
+            return process_chunk(frame, *args, **kwargs)
+
+        with mock.patch.object(hemis_import, 'process_chunk', failing_chunk):
+            with self.assertRaises(RuntimeError):
+                process_excel_stream(path, chunk_size=5, loader=LOADER_ORM)
+
+        self.assertEqual(
+            sorted(HemisTable.objects.values_list('hemis_id', flat=True)),
+            [HEMIS_ID_START + index for index in range(5)],
+        )
+
+    def test_stream_imports_all_rows(self):
+        path = make_xlsx(self, 12)
+        result = process_excel_stream(path, chunk_size=5, loader=LOADER_ORM)
+
+        self.assertEqual(result['total_rows'], 12)
+        self.assertEqual(result['created_count'], 12)
+        self.assertEqual(result['errors'], [])
+        self.assertEqual(HemisTable.objects.count(), 12)
+
+
+HEMIS_FIELDS = ('hemis_id', 'fio', 'born', 'passport', 'pnfl', 'course', 'student_group', 'fingerprint')
+
+
+class CopyLoaderTests(TestCase):
+
+    def stored(self):
+        return list(HemisTable.objects.order_by('hemis_id').values_list(*HEMIS_FIELDS))
+
+    def test_copy_matches_orm(self):
+        path = make_xlsx(self, 40, dup_ratio=0.1, invalid_ratio=0.1)
+        orm = process_excel_stream(path, chunk_size=15, loader=LOADER_ORM)
+        orm_rows = self.stored()
+        HemisTable.objects.all().delete()
+
+        copy = process_excel_stream(path, chunk_size=15, loader=LOADER_COPY)
+
+        self.assertEqual(copy['loader'], LOADER_COPY)
+        self.assertEqual(self.stored(), orm_rows)
+        self.assertEqual(copy['created_count'], orm['created_count'])
+        self.assertEqual(copy['errors'], orm['errors'])
+
+    def test_empty_identifiers_are_null(self):
+        frame = hemis_frame([('1', 'Ali Valiyev', None, None), ('2', 'Vali Aliyev', None, None)])
+        clean_df, _ = clean_frame(frame, HemisKeyIndex())
+
+        self.assertEqual(copy_hemis_records(clean_df), (2, []))
+        self.assertEqual(list(HemisTable.objects.values_list('passport', 'pnfl')), [(None, None)] * 2)
+
+    def test_rows_taken_after_validation_are_reported(self):
+        """Tekshiruvdan keyin bazaga tushgan kalitlar ON CONFLICT da rad etiladi"""
+        frame = hemis_frame([
+            ('1', 'Ali Valiyev', 'AA0000001', pnfl(1)),
+            ('2', 'Ali Valiyev', 'AA0000002', pnfl(2)),
+            ('3', 'Ali Valiyev', 'AA0000003', pnfl(3)),
+        ])
+        clean_df, errors = clean_frame(frame, HemisKeyIndex())
+        self.assertEqual(errors, [])
+        make_hemis(9, pnfl=pnfl(2))
+        make_hemis(3, pnfl=None)
+
+        created, errors = copy_hemis_records(clean_df)
+
+        self.assertEqual(created, 1)
+        self.assertEqual(errors, [
+            f"Qator 3: PNFL allaqachon mavjud ({pnfl(2)})",
+            "Qator 4: Hemis ID allaqachon mavjud (3)",
+        ])
+        self.assertEqual(sorted(HemisTable.objects.values_list('hemis_id', flat=True)), [1, 3, 9])
+
+    def test_too_long_values_are_rejected(self):
+        frame = hemis_frame([('1', 'A' * 300, None, pnfl(1)), ('2', 'Ali Valiyev', None, pnfl(2))])
+        clean_df, _ = clean_frame(frame, HemisKeyIndex())
+
+        self.assertEqual(copy_hemis_records(clean_df), (1, ["Qator 2: fio 255 belgidan uzun"]))
+        self.assertEqual(list(HemisTable.objects.values_list('hemis_id', flat=True)), [2])
+
+
+class ImportFailureTests(TestCase):
+
+    def test_update_failure_rolls_back_chunk(self):
+        """Yangilash xatosi o'zgarmagan deb hisoblanmaydi - bo'lak bekor qilinadi"""
+        path = make_xlsx(self, 6)
+        process_excel_stream(path, loader=LOADER_ORM)
+        HemisTable.objects.update(fio='Eski Ism', fingerprint='')
+
+        with mock.patch.object(QuerySet, 'bulk_update', side_effect=DatabaseError('update failed')):
+            with self.assertLogs('core.hemis_import', 'ERROR') as logs:
+                with self.assertRaises(DatabaseError):
+                    process_excel_stream(path, upsert=True, loader=LOADER_ORM)
+
+        self.assertIn('Yangilash xatosi', logs.output[0])
+        self.assertFalse(HemisTable.objects.exclude(fio='Eski Ism').exists())
+
+    def test_upsert_counts_updated_rows(self):
+        path = make_xlsx(self, 6)
+        process_excel_stream(path, loader=LOADER_ORM)
+        HemisTable.objects.filter(hemis_id=HEMIS_ID_START).update(fio='Eski Ism', fingerprint='')
+
+        result = process_excel_stream(path, upsert=True, loader=LOADER_ORM)
+
+        self.assertEqual(result['updated_count'], 1)
+        self.assertEqual(result['unchanged_count'], 5)
+        self.assertFalse(HemisTable.objects.filter(fio='Eski Ism').exists())
+
+    def test_rows_taken_after_conflict_check(self):
+        """Tekshiruvdan keyin boshqa import yozgan kalitlar xato bo'ladi, soni to'g'ri"""
+        frame = hemis_frame([
+            ('1', 'Ali Valiyev', 'AA0000001', pnfl(1)),
+            ('2', 'Ali Valiyev', 'AA0000002', pnfl(2)),
+            ('3', 'Ali Valiyev', 'AA0000003', pnfl(3)),
+        ])
+        clean_df, _ = clean_frame(frame, HemisKeyIndex())
+
+        def racing_conflicts(*args, **kwargs):
+            result = find_conflicts(*args, **kwargs)
+            if not HemisTable.objects.exists():
+                make_hemis(9, pnfl=pnfl(2))
+                make_hemis(3, pnfl=None)
+            return result
+
+        with mock.patch.object(hemis_import, 'find_conflicts', side_effect=racing_conflicts):
+            with self.assertLogs('core.hemis_import', 'WARNING'):
+                created, errors = hemis_import.save_hemis_frame(clean_df)
+
+        self.assertEqual(created, 1)
+        self.assertEqual(errors, [
+            f"Qator 3: PNFL allaqachon mavjud ({pnfl(2)})",
+            "Qator 4: Hemis ID allaqachon mavjud (3)",
+        ])
+        self.assertEqual(sorted(HemisTable.objects.values_list('hemis_id', flat=True)), [1, 3, 9])
+
+    def test_unexplained_integrity_error_rolls_back_chunk(self):
+        path = make_xlsx(self, 6)
+
+        with mock.patch.object(QuerySet, 'bulk_create', side_effect=IntegrityError('insert failed')):
+            with self.assertLogs('core.hemis_import', 'ERROR'):
+                with self.assertRaises(IntegrityError):
+                    process_excel_stream(path, loader=LOADER_ORM)
+
+        self.assertFalse(HemisTable.objects.exists())
+
+    def test_save_failure_is_not_swallowed(self):
+        path = make_xlsx(self, 6)
+
+        with mock.patch.object(QuerySet, 'bulk_create', side_effect=DatabaseError('insert failed')):
+            with self.assertLogs('core.hemis_import', 'ERROR') as logs:
+                with self.assertRaises(DatabaseError):
+                    process_excel_stream(path, loader=LOADER_ORM)
+
+        self.assertIn('Saqlash xatosi', logs.output[0])
+        self.assertFalse(HemisTable.objects.exists())
+
+    def test_link_failure_rolls_back_chunk(self):
+        path = make_xlsx(self, 6)
+
+        with mock.patch.object(hemis_import, 'link_hemis_batch', side_effect=DatabaseError('link failed')):
+            with self.assertLogs('core.hemis_import', 'ERROR') as logs:
+                with self.assertRaises(DatabaseError):
+                    process_excel_stream(path, loader=LOADER_ORM)
+
+        self.assertIn("Bog'lash xatosi", logs.output[0])
+        self.assertFalse(HemisTable.objects.exists())
+
+
+class ParallelImportTests(TestCase):
+
+    def test_sheets_are_read_in_order(self):
+        path = make_sheets_xlsx(self, {
+            'Kurs 1': [0, 1, None, 2, None, None],
+            'Kurs 2': [3, 0, 4],
+        })
+        result = process_excel_parallel(path, workers=2, loader=LOADER_ORM)
+
+        self.assertEqual(result['total_rows'], 7)
+        self.assertEqual(result['created_count'], 5)
+        # Oradagi bo'sh qator saqlanadi, oxiridagilari tashlanadi
+        self.assertEqual(result['errors'], ["Kurs 1: Qator 4: Hemis ID bo'sh"])
+        self.assertEqual(HemisTable.objects.count(), 5)
+
+    def test_blocks_match_stream_chunks(self):
+        path = make_xlsx(self, 25, invalid_ratio=0.2)
+        frames = list(iter_parallel_frames(path, workers=2, block_rows=10))
+
+        self.assertEqual([len(frame) for frame in frames], [10, 10, 5])
+        expected = pd.concat([
+            hemis_import.prepare_frame(frame) for frame in hemis_import.iter_excel_chunks(path, 10)
+        ])
+        pd.testing.assert_frame_equal(pd.concat(frames), expected)
+
+    def test_single_sheet_is_read_in_process(self):
+        """Bitta varaq uchun jarayonlar hovuzi va Manager ochilmaydi"""
+        path = make_xlsx(self, 25)
+        with mock.patch.object(hemis_parallel, 'ProcessPoolExecutor') as pool, \
+                mock.patch.object(hemis_parallel, 'Manager') as manager:
+            result = process_excel_parallel(path, workers=4, loader=LOADER_ORM)
+
+        pool.assert_not_called()
+        manager.assert_not_called()
+        self.assertEqual((result['total_rows'], result['created_count']), (25, 25))
+
+    def test_stopped_import_does_not_wait_for_workers(self):
+        path = make_sheets_xlsx(self, {'Kurs 1': range(100), 'Kurs 2': range(100, 200)})
+        frames = iter_parallel_frames(path, workers=2, block_rows=5)
+        next(frames)
+        frames.close()
+
+    def test_web_form_has_no_parallel_mode(self):
+        upload = SimpleUploadedFile('hemis.xlsx', b'data')
+        form = ExcelUploadForm({'mode': 'parallel'}, {'file': upload})
+        self.assertFalse(form.is_valid())
+        self.assertIn('mode', form.errors)
+
+
+class ImportJobTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def enqueue(self, rows):
+        with open(make_xlsx(self, rows, invalid_ratio=0.1), 'rb') as excel_file:
+            return enqueue_import(SimpleUploadedFile('hemis.xlsx', excel_file.read()))
+
+    def test_job_imports_file(self):
+        job = self.enqueue(30)
+        claimed = claim_next_job()
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertIsNone(claim_next_job())
+        path = claimed.file.path
+
+        job = run_import_job(claimed)
+
+        self.assertEqual(job.status, HemisImportJob.Status.DONE)
+        # Yuklangan fayl o'chiriladi, nomi tarixda qoladi
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(HemisImportJob.objects.get(pk=job.pk).file)
+        self.assertEqual(job.processed_rows, 30)
+        self.assertEqual(job.created_count + job.error_count, 30)
+        self.assertEqual(HemisTable.objects.count(), job.created_count)
+        run = job.runs.get()
+        self.assertEqual(run.mode, ImportRun.Mode.BACKGROUND)
+        self.assertEqual(run.created_count, job.created_count)
+        self.assertTrue(run.file_name.endswith('.xlsx'))
+
+    def status(self, job):
+        response = self.client.get(f'/table_hemis/import/{job.pk}/', HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']
+
+    def test_status_reports_progress(self):
+        job = self.enqueue(30)
+        data = self.status(job)
+        self.assertEqual((data['status'], data['progress']), (HemisImportJob.Status.PENDING, 0))
+
+        run_import_job(claim_next_job())
+
+        data = self.status(job)
+        self.assertEqual((data['status'], data['progress']), (HemisImportJob.Status.DONE, 100))
+        self.assertEqual((data['total_rows'], data['processed_rows']), (30, 30))
+        self.assertEqual(data['created_count'], HemisTable.objects.count())
+
+    def test_failed_job_keeps_committed_chunks(self):
+        """Xato bo'lgan bo'lakgacha saqlanganlar va progress qoladi"""
+        job = self.enqueue(30)
+
+        def failing_chunks(path):
+            for number, frame in enumerate(hemis_import.iter_excel_chunks(path, 10)):
+                if number == 2:
+                    raise RuntimeError('read failed')
+                yield frame
+
+        claimed = claim_next_job()
+        path = claimed.file.path
+        with mock.patch.object(hemis_jobs, 'iter_excel_chunks', failing_chunks):
+            with self.assertLogs('core.hemis_jobs', 'ERROR'):
+                run_import_job(claimed)
+
+        self.assertFalse(os.path.exists(path))
+
+        data = self.status(job)
+        self.assertEqual(data['status'], HemisImportJob.Status.FAILED)
+        self.assertEqual(data['error_message'], 'read failed')
+        self.assertEqual((data['processed_rows'], data['progress']), (20, 67))
+        self.assertEqual(data['created_count'], HemisTable.objects.count())
+        self.assertGreater(data['created_count'], 0)
+        run = job.runs.get()
+        self.assertEqual(run.status, ImportRun.Status.FAILED)
+        self.assertEqual((run.total_rows, run.created_count), (20, data['created_count']))
+
+    def test_job_uses_parallel_frames_when_enabled(self):
+        self.enqueue(30)
+        claimed = claim_next_job()
+        path = claimed.file.path
+        with mock.patch.object(hemis_jobs, 'JOB_PARALLEL', True), \
+                mock.patch.object(hemis_jobs, 'iter_parallel_frames', wraps=hemis_jobs.iter_parallel_frames) as frames:
+            job = run_import_job(claimed)
+
+        frames.assert_called_once_with(path)
+        self.assertEqual(job.status, HemisImportJob.Status.DONE)
+        self.assertEqual(job.processed_rows, 30)
+        self.assertEqual(job.created_count + job.error_count, 30)
+        self.assertEqual(HemisTable.objects.count(), job.created_count)
+
+
+class ReconcileTests(TestCase):
+
+    def setUp(self):
+        self.group = TelegramGroup.objects.create(group_id=-100, group_name='Faol')
+        self.other_group = TelegramGroup.objects.create(group_id=-200, group_name='Boshqa')
+        registers = [
+            Register.objects.create(telegram_id=index, hemis_id=index, pnfl=pnfl(index))
+            for index in (1, 2, 3, 5)
+        ]
+        registers[0].register_groups.add(self.group)
+        hemis = [
+            HemisTable.objects.create(hemis_id=index, pnfl=pnfl(index), fio='Ali Valiyev', course='1', student_group='g')
+            for index in (1, 2, 4)
+        ]
+        hemis[0].telegram_groups.add(self.other_group)
+        hemis[2].telegram_groups.add(self.other_group)
+
+        # Signallarsiz buzilgan holat: 1 - bog'lanmagan, 2 va 4 - noto'g'ri bog'langan
+        Register.objects.filter(pk=registers[0].pk).update(is_active=False)
+        Register.objects.filter(pk=registers[1].pk).update(is_active=True)
+        HemisTable.objects.filter(pk=hemis[1].pk).update(register=registers[2])
+        HemisTable.objects.filter(pk=hemis[2].pk).update(register=registers[3])
+
+    def snapshot(self):
+        return (
+            list(HemisTable.objects.order_by('id').values_list('register_id', 'updated')),
+            list(Register.objects.order_by('id').values_list('is_active', 'updated')),
+            list(HemisTable.telegram_groups.through.objects.order_by('id').values_list('id', flat=True)),
+            list(TelegramGroup.objects.order_by('id').values_list(*TelegramGroup.COUNTER_FIELDS)),
+        )
+
+    def test_dry_run_matches_real_run(self):
+        for prune_unlinked in (False, True):
+            with self.subTest(prune_unlinked=prune_unlinked):
+                before = self.snapshot()
+                with CaptureQueriesContext(connection) as queries:
+                    dry = reconcile_links(chunk_size=2, dry_run=True, prune_unlinked=prune_unlinked)
+                self.assertEqual(self.snapshot(), before)
+                statements = [query['sql'].split()[0].upper() for query in queries.captured_queries]
+                self.assertTrue(set(statements) <= {'SELECT', 'SAVEPOINT', 'RELEASE'}, statements)
+
+                sid = transaction.savepoint()
+                real = reconcile_links(chunk_size=2, prune_unlinked=prune_unlinked)
+                self.assertEqual(dry['counts'], real['counts'])
+                self.assertEqual(dry['counters_fixed'], real['counters_fixed'])
+                transaction.savepoint_rollback(sid)
+
+        self.assertEqual(dry['counts'], {
+            'unlinked': 2, 'linked': 2, 'activated': 1, 'groups_added': 1, 'groups_removed': 2,
+        })
+
+    def test_real_run_is_consistent(self):
+        reconcile_links(chunk_size=2)
+
+        self.assertEqual(
+            dict(HemisTable.objects.values_list('hemis_id', 'register__hemis_id')),
+            {1: 1, 2: 2, 4: None},
+        )
+        self.assertTrue(Register.objects.get(hemis_id=1).is_active)
+        self.assertEqual(
+            list(HemisTable.objects.get(hemis_id=1).telegram_groups.values_list('group_id', flat=True)), [-100]
+        )
+        again = reconcile_links(chunk_size=2)
+        self.assertFalse(any(again['counts'].values()))
+        self.assertEqual(again['counters_fixed'], 0)
+
+
+def make_hemis(hemis_id, **values):
+    values.setdefault('pnfl', pnfl(hemis_id))
+    return HemisTable.objects.create(
+        hemis_id=hemis_id, fio='Ali Valiyev', course='1', student_group='g', **values
+    )
+
+
+class GroupCounterTests(TestCase):
+
+    def setUp(self):
+        self.group = TelegramGroup.objects.create(group_id=-100, group_name='Guruh')
+        self.active = Register.objects.create(telegram_id=1, is_active=True)
+        self.inactive = Register.objects.create(telegram_id=2)
+
+    def counters(self):
+        self.group.refresh_from_db()
+        return tuple(getattr(self.group, field) for field in TelegramGroup.COUNTER_FIELDS)
+
+    def assertCounters(self, expected):
+        self.assertEqual(self.counters(), expected)
+        self.assertEqual(stale_group_counters(), [])
+
+    def test_memberships_from_both_sides(self):
+        self.active.register_groups.add(self.group)
+        self.group.members.add(self.inactive)
+        self.assertCounters((2, 1, 0))
+
+        self.group.members.remove(self.active)
+        self.assertCounters((1, 0, 0))
+        self.inactive.register_groups.clear()
+        self.assertCounters((0, 0, 0))
+
+    def test_activity_and_deletion(self):
+        self.group.members.add(self.active, self.inactive)
+        self.inactive.is_active = True
+        self.inactive.save()
+        self.assertCounters((2, 2, 0))
+
+        update_registers(Register.objects.all(), is_active=False)
+        self.assertCounters((2, 0, 0))
+        self.active.delete()
+        self.assertCounters((1, 0, 0))
+
+    def test_hemis_links(self):
+        self.group.members.add(self.active, self.inactive)
+        hemis = make_hemis(1, register=self.active)
+        other = make_hemis(2)
+        self.assertCounters((2, 1, 1))
+
+        other.register = self.inactive
+        other.save()
+        self.assertCounters((2, 1, 2))
+        hemis.delete()
+        self.assertCounters((2, 1, 1))
+
+    def test_clearing_links_in_bulk(self):
+        """Admin amali (queryset.update) ham linked_members ni kamaytiradi"""
+        self.group.members.add(self.active, self.inactive)
+        make_hemis(1, register=self.active)
+        make_hemis(2, register=self.inactive)
+        make_hemis(3)
+        self.assertCounters((2, 1, 2))
+
+        self.assertEqual(clear_hemis_registers(HemisTable.objects.filter(hemis_id__in=[1, 3])), 1)
+        self.assertCounters((2, 1, 1))
+
+        admin = HemisTableAdmin(HemisTable, None)
+        with mock.patch.object(admin, 'message_user'):
+            admin.clear_register_link(None, HemisTable.objects.all())
+        self.assertCounters((2, 1, 0))
+
+    def test_recount_fixes_drift(self):
+        self.group.members.add(self.active, self.inactive)
+        TelegramGroup.objects.filter(pk=self.group.pk).update(total_members=7, linked_members=3)
+
+        stale = stale_group_counters()
+        self.assertEqual(stale, [(self.group.group_id, (7, 1, 3), (2, 1, 0))])
+        self.assertEqual(self.counters(), (7, 1, 3))
+        self.assertEqual(recount_group_counters([self.group.pk]), stale)
+        self.assertCounters((2, 1, 0))
+
+
+class RegisterSaveTests(TestCase):
+
+    def setUp(self):
+        # hemis_id siz - yaratilganda bog'lash navbatga qo'yilmaydi
+        Register.objects.create(telegram_id=1, pnfl=pnfl(1))
+        self.register = Register.objects.get(telegram_id=1)
+
+    def test_unchanged_save_is_skipped(self):
+        with self.assertNumQueries(0):
+            self.register.save()
+
+    def test_only_dirty_fields_are_written(self):
+        updated = self.register.updated
+        self.register.tg_tel = '+998901234567'
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks() as callbacks:
+            self.register.save()
+
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql']
+        self.assertIn('"tg_tel"', sql)
+        self.assertIn('"updated"', sql)
+        self.assertNotIn('"fio"', sql)
+        # Identifikator o'zgarmagan - bog'lash navbatga qo'yilmaydi
+        self.assertEqual(callbacks, [])
+
+        self.register.refresh_from_db()
+        self.assertEqual(self.register.tg_tel, '+998901234567')
+        self.assertGreater(self.register.updated, updated)
+        self.assertEqual(self.register.get_dirty_fields(), [])
+
+    def test_identity_change_queues_link(self):
+        self.register.hemis_id = 2
+        self.register.pnfl = pnfl(2)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            hemis = make_hemis(2)
+            self.register.save()
+
+        # Ikkala signal ham bitta to'plamga tushadi
+        self.assertEqual(len(callbacks), 1)
+        hemis.refresh_from_db()
+        self.assertEqual(hemis.register, self.register)
+
+    def test_concurrent_changes_are_not_overwritten(self):
+        """Boshqa maydonlar eski qiymat bilan qayta yozilmaydi"""
+        Register.objects.filter(pk=self.register.pk).update(address='Toshkent')
+        self.register.username = 'ali'
+        self.register.save()
+
+        self.assertEqual(
+            Register.objects.values_list('username', 'address').get(pk=self.register.pk), ('ali', 'Toshkent')
+        )
+
+    def test_deferred_field_assignment_is_written(self):
+        register = Register.objects.only('id', 'telegram_id').get(pk=self.register.pk)
+        register.fio = 'Ali Valiyev'
+        self.assertEqual(register.get_dirty_fields(), ['fio'])
+        register.save()
+
+        self.assertEqual(Register.objects.get(pk=register.pk).fio, 'Ali Valiyev')
+
+    def test_explicit_update_fields_are_honoured(self):
+        self.register.fio = 'Ali Valiyev'
+        self.register.address = 'Toshkent'
+        self.register.save(update_fields=['fio'])
+
+        self.assertEqual(Register.objects.values_list('fio', 'address').get(pk=self.register.pk), ('Ali Valiyev', None))
+
+
+class GroupDeactivationTests(TestCase):
+
+    def setUp(self):
+        self.group = TelegramGroup.objects.create(group_id=-100, group_name='Guruh')
+        self.registers = [Register.objects.create(telegram_id=index, is_active=True) for index in range(1, 4)]
+        self.group.members.add(*self.registers)
+        self.hemis = [make_hemis(index) for index in range(1, 6)]
+        self.group.hemis_members.add(*self.hemis)
+
+    def deactivate(self):
+        self.group.is_active = False
+        self.group.save()
+
+    def run_job(self, **options):
+        job = claim_next_deactivation()
+        self.assertIsNotNone(job)
+        self.assertIsNone(claim_next_deactivation())
+        return run_deactivation_job(job, **options)
+
+    def test_save_only_enqueues(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.deactivate()
+        self.assertFalse(any('DELETE' in query['sql'] for query in queries))
+        self.assertEqual(self.group.hemis_members.count(), 5)
+
+        # Faqat faol -> nofaol o'tishda, navbatdagi vazifa qayta ishlatiladi
+        self.group.save()
+        TelegramGroup.objects.get(pk=self.group.pk).save()
+        self.group.is_active = True
+        self.group.save()
+        self.deactivate()
+        self.group.group_name = 'Yangi nom'
+        self.group.save()
+
+        job = GroupDeactivationJob.objects.get()
+        self.assertEqual(job.status, GroupDeactivationJob.Status.PENDING)
+        self.assertFalse(job.detach_members)
+
+    def test_job_detaches_hemis_in_chunks(self):
+        self.deactivate()
+        job = self.run_job(chunk_size=2)
+
+        self.assertEqual(job.status, GroupDeactivationJob.Status.DONE)
+        self.assertEqual((job.hemis_detached, job.members_detached, job.chunks), (5, 0, 3))
+        self.assertIsNotNone(job.finished_at)
+        self.assertFalse(self.group.hemis_members.exists())
+        # Register a'zoligi qayta faollashtirish uchun saqlanadi
+        self.assertEqual(self.group.members.count(), 3)
+        self.assertEqual(stale_group_counters(), [])
+
+    def test_job_detaches_members(self):
+        self.deactivate()
+        GroupDeactivationJob.objects.update(detach_members=True)
+        job = self.run_job(chunk_size=2)
+
+        self.assertEqual((job.hemis_detached, job.members_detached, job.chunks), (5, 3, 5))
+        self.assertFalse(self.group.members.exists())
+        self.group.refresh_from_db()
+        self.assertEqual((self.group.total_members, self.group.active_members), (0, 0))
+        self.assertEqual(stale_group_counters(), [])
+
+    def test_reactivated_group_cancels_job(self):
+        self.deactivate()
+        TelegramGroup.objects.filter(pk=self.group.pk).update(is_active=True)
+        job = self.run_job()
+
+        self.assertEqual(job.status, GroupDeactivationJob.Status.CANCELLED)
+        self.assertEqual(job.hemis_detached, 0)
+        self.assertEqual(self.group.hemis_members.count(), 5)
+
+    def test_failure_is_recorded(self):
+        self.deactivate()
+        with mock.patch('core.group_jobs.delete_memberships_chunk', side_effect=DatabaseError('delete failed')):
+            with self.assertLogs('core.group_jobs', 'ERROR'):
+                job = self.run_job()
+
+        self.assertEqual(job.status, GroupDeactivationJob.Status.FAILED)
+        self.assertEqual(job.error_message, 'delete failed')
+        self.assertEqual(self.group.hemis_members.count(), 5)
+
+
+class ImportLinkingTests(TestCase):
+
+    def setUp(self):
+        self.group = TelegramGroup.objects.create(group_id=-100, group_name='Faol')
+        self.closed = TelegramGroup.objects.create(group_id=-200, group_name='Nofaol', is_active=False)
+
+    def make_registers(self, indexes, **values):
+        registers = [
+            Register.objects.create(
+                telegram_id=index + 1, hemis_id=HEMIS_ID_START + index, pnfl=str(PNFL_START + index), **values
+            )
+            for index in indexes
+        ]
+        self.group.members.add(*registers)
+        self.closed.members.add(*registers)
+        return registers
+
+    def test_import_links_and_activates(self):
+        self.make_registers([0, 1])
+        self.make_registers([2], is_active=True)
+        # PNFL mos kelmaydi - bog'lanmaydi
+        Register.objects.create(telegram_id=10, hemis_id=HEMIS_ID_START + 3, pnfl=pnfl(3))
+
+        result = process_excel_stream(make_xlsx(self, 6), loader=LOADER_ORM)
+
+        self.assertEqual((result['linked_count'], result['activated_count']), (3, 2))
+        linked = HemisTable.objects.filter(register__isnull=False)
+        self.assertEqual(
+            sorted(linked.values_list('hemis_id', 'register__hemis_id')),
+            [(HEMIS_ID_START + index, HEMIS_ID_START + index) for index in range(3)],
+        )
+        self.assertFalse(Register.objects.filter(telegram_id=10, is_active=True).exists())
+        # Faqat faol guruh a'zoligi ko'chiriladi
+        self.assertEqual(
+            sorted(self.group.hemis_members.values_list('hemis_id', flat=True)),
+            [HEMIS_ID_START + index for index in range(3)],
+        )
+        self.assertFalse(self.closed.hemis_members.exists())
+        self.group.refresh_from_db()
+        self.assertEqual((self.group.active_members, self.group.linked_members), (3, 3))
+        self.assertEqual(stale_group_counters(), [])
+
+    def test_link_queries_do_not_grow_with_rows(self):
+        self.make_registers([0])
+        small = process_excel_stream(make_xlsx(self, 4), chunk_size=50, loader=LOADER_ORM)
+        HemisTable.objects.all().delete()
+        Register.objects.update(is_active=False)
+        self.make_registers(range(1, 40))
+        large = process_excel_stream(make_xlsx(self, 40), chunk_size=50, loader=LOADER_ORM)
+
+        self.assertEqual((large['linked_count'], large['activated_count']), (40, 40))
+        for stage in ('link', 'activate'):
+            self.assertEqual(large['stage_queries'][stage], small['stage_queries'][stage])
+
+
+class DeferredLinkTests(TestCase):
+
+    def make_pair(self, number):
+        make_hemis(number)
+        return Register.objects.create(telegram_id=number, hemis_id=number, pnfl=pnfl(number))
+
+    def test_saves_share_one_batch(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            registers = [self.make_pair(number) for number in range(1, 6)]
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(HemisTable.objects.filter(register__isnull=False).exists())
+
+        # Bog'lash yozuvlar soniga bog'liq bo'lmagan so'rovlar bilan
+        with CaptureQueriesContext(connection) as queries:
+            callbacks[0]()
+        self.assertLess(len(queries), 10)
+        self.assertEqual(
+            sorted(HemisTable.objects.values_list('hemis_id', 'register_id')),
+            [(register.hemis_id, register.id) for register in registers],
+        )
+        self.assertEqual(Register.objects.filter(is_active=True).count(), 5)
+
+    def test_rolled_back_saves_are_not_linked(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(DatabaseError):
+                with transaction.atomic():
+                    self.make_pair(1)
+                    raise DatabaseError('rollback')
+            register = self.make_pair(2)
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(list(HemisTable.objects.values_list('hemis_id', 'register_id')), [(2, register.id)])
+
+
+class GroupSyncTests(TestCase):
+
+    def setUp(self):
+        self.groups = [TelegramGroup.objects.create(group_id=-100 - index) for index in range(2)]
+        self.closed = TelegramGroup.objects.create(group_id=-200, is_active=False)
+        self.registers = [Register.objects.create(telegram_id=index) for index in range(1, 4)]
+        self.hemis = [make_hemis(index, register=register) for index, register in enumerate(self.registers, 1)]
+
+    def hemis_groups(self):
+        return {
+            hemis.hemis_id: sorted(hemis.telegram_groups.values_list('group_id', flat=True))
+            for hemis in self.hemis
+        }
+
+    def test_memberships_follow_register(self):
+        first, second, third = self.registers
+        first.register_groups.add(*self.groups, self.closed)
+        self.groups[0].members.add(second, third)
+        self.assertEqual(self.hemis_groups(), {1: [-101, -100], 2: [-100], 3: [-100]})
+
+        first.register_groups.remove(self.groups[1])
+        self.groups[0].members.remove(third)
+        self.assertEqual(self.hemis_groups(), {1: [-100], 2: [-100], 3: []})
+
+        self.groups[0].members.clear()
+        self.assertEqual(self.hemis_groups(), {1: [], 2: [], 3: []})
+
+    def test_sync_is_two_queries(self):
+        through = Register.register_groups.through
+        through.objects.bulk_create([
+            through(register=register, telegramgroup=group)
+            for register in self.registers for group in self.groups
+        ])
+        self.hemis[0].telegram_groups.add(self.closed)
+
+        with self.assertNumQueries(2):
+            result = sync_register_groups([register.pk for register in self.registers])
+
+        self.assertEqual(result, {'added': 6, 'removed': 1})
+        self.assertEqual(self.hemis_groups(), {number: [-101, -100] for number in (1, 2, 3)})
+
+
+class ImportRunTests(TestCase):
+
+    def test_run_records_stages(self):
+        path = make_xlsx(self, 20, invalid_ratio=0.1)
+        result, run = record_import_run(
+            ImportRun.Mode.STREAM,
+            lambda on_chunk: process_excel_stream(path, chunk_size=8, loader=LOADER_ORM, on_chunk=on_chunk),
+            file_name=path,
+        )
+
+        run.refresh_from_db()
+        self.assertEqual(run.status, ImportRun.Status.DONE)
+        self.assertEqual(run.file_name, os.path.basename(path))
+        self.assertEqual((run.total_rows, run.created_count), (20, result['created_count']))
+        self.assertEqual(run.error_count, 20 - run.created_count)
+        self.assertEqual(set(run.timings), set(ImportRun.STAGES))
+        # Bo'lak savepointlari hech bir bosqichga kirmaydi
+        self.assertLessEqual(sum(run.stage_queries.values()), run.query_count)
+        self.assertGreater(run.stage_queries['insert'], 0)
+        self.assertGreater(run.duration, 0)
+
+    def test_failed_run_is_recorded(self):
+        def failing_import(on_chunk):
+            raise RuntimeError('import failed')
+
+        with self.assertRaises(RuntimeError):
+            record_import_run(ImportRun.Mode.STANDARD, failing_import, file_name='hemis.xlsx')
+
+        run = ImportRun.objects.get()
+        self.assertEqual((run.status, run.error_message), (ImportRun.Status.FAILED, 'import failed'))
+        self.assertEqual((run.total_rows, run.created_count), (0, 0))
+        self.assertIsNotNone(run.finished_at)
+
+    def test_failed_run_keeps_committed_counts(self):
+        """To'xtagan importda commit bo'lgan bo'laklar natijasi tarixda qoladi"""
+        path = make_xlsx(self, 20, invalid_ratio=0.1)
+        process_chunk = hemis_import.process_chunk
+        calls = []
+
+        def failing_chunk(frame, *args, **kwargs):
+            calls.append(len(frame))
+            if len(calls) == 3:
+                # Xato bo'lak natijaga qisman yozilgandan keyin to'xtaydi
+                args[3]['errors'].append('Qator 99: bekor qilingan')
+                raise RuntimeError('chunk failed')
+            return process_chunk(frame, *args, **kwargs)
+
+        with mock.patch.object(hemis_import, 'process_chunk', failing_chunk):
+            with self.assertRaises(RuntimeError):
+                record_import_run(
+                    ImportRun.Mode.STREAM,
+                    lambda on_chunk: process_excel_stream(path, chunk_size=8, loader=LOADER_ORM, on_chunk=on_chunk),
+                )
+
+        run = ImportRun.objects.get()
+        self.assertEqual(run.status, ImportRun.Status.FAILED)
+        self.assertEqual(run.error_message, 'chunk failed')
+        self.assertEqual(run.total_rows, 16)
+        self.assertEqual(run.created_count, HemisTable.objects.count())
+        self.assertGreater(run.created_count, 0)
+        self.assertEqual(run.created_count + run.error_count, 16)
+        self.assertNotIn('Qator 99: bekor qilingan', run.errors)
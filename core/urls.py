@@ -1,13 +1,14 @@
 from django.urls import path
 from .views import (
     main_view, table_register, bulk_update_register, send_message_to_group,
-    hemistable_view, mass_message_view, send_mass_message
+    hemistable_view, mass_message_view, send_mass_message, hemis_import_status
     )
 
 urlpatterns = [
     path('', main_view, name="main_view"),
     path('table_register/', table_register, name='table_register'),
     path('table_hemis/', hemistable_view, name='hemistable_view'),
+    path('table_hemis/import/<int:job_id>/', hemis_import_status, name='hemis_import_status'),
     path('bulk_update_register/', bulk_update_register, name='bulk_update_register'),
     path('send-message/', send_message_to_group, name='send_message_to_group'),
     path('mass-message/', mass_message_view, name='mass_message'),
@@ -1,11 +1,11 @@
-import pandas as pd
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.db import transaction
-from django.core.exceptions import ValidationError
-from datetime import datetime
+from django.http import JsonResponse
 from core.forms import ExcelUploadForm
-from core.models import HemisTable, Register
+from core.models import HemisTable, HemisImportJob, ImportRun
+from core.hemis_import import process_excel_file, process_excel_stream
+from core.hemis_jobs import enqueue_import, job_status_data
+from core.hemis_runs import record_import_run
 
 
 def hemistable_view(request):
@@ -20,7 +20,9 @@ def hemistable_view(request):
     context = {
         "form": form,
         "data": data,
-        "stats": get_statistics(data)
+        "stats": get_statistics(data),
+        "import_jobs": HemisImportJob.objects.all()[:5],
+        "import_runs": ImportRun.objects.defer('errors')[:10],
     }
     
     return render(request, 'core/pages/tables/hemis.html', context)
@@ -35,15 +37,25 @@ def handle_excel_upload(request):
         return redirect("hemistable_view")
     
     excel_file = request.FILES["file"]
+    mode = form.cleaned_data.get("mode") or ExcelUploadForm.MODE_STANDARD
+    upsert = form.cleaned_data.get("upsert", False)
+    
+    if mode == ExcelUploadForm.MODE_BACKGROUND:
+        # Fayl saqlanadi, import worker tomonidan bajariladi
+        job = enqueue_import(excel_file, upsert=upsert)
+        messages.info(request, f"⏳ Fayl navbatga qo'yildi (Import #{job.id}). Holati quyida yangilanib boradi")
+        return redirect("hemistable_view")
+    
+    def run_import(on_chunk):
+        if mode == ExcelUploadForm.MODE_STREAM:
+            # Qatorma-qator o'qish va bo'laklab saqlash
+            return process_excel_stream(excel_file, upsert=upsert, on_chunk=on_chunk)
+        # Excel faylni o'qish va saqlash (bitta tranzaksiya - qisman natija bo'lmaydi)
+        return process_excel_file(excel_file, upsert=upsert)
     
     try:
-        # Excel faylni o'qish
-        df = pd.read_excel(excel_file, engine='openpyxl')
-        
-        print(f"{len(df)} ta ma'lumotlar yozildi")
-        
-        # Ma'lumotlarni saqlash
-        result = process_excel_data(df)
+        # Har bir yuklama ImportRun sifatida tarixga yoziladi
+        result, _ = record_import_run(mode, run_import, file_name=excel_file.name, upsert=upsert)
         
         # Natijalarni ko'rsatish
         display_upload_results(request, result)
@@ -55,208 +67,11 @@ def handle_excel_upload(request):
     return redirect("hemistable_view")
 
 
-@transaction.atomic
-def process_excel_data(df):
-    """Excel ma'lumotlarini qayta ishlash"""
-    hemis_objects = []
-    activated_registers = []
-    errors = []
-    
-    # Mavjud hemis_id va pnfl larni olish
-    existing_hemis_ids = set(HemisTable.objects.values_list('hemis_id', flat=True))
-    existing_pnfls = set(
-        HemisTable.objects.exclude(pnfl__isnull=True)
-        .exclude(pnfl__exact='')
-        .values_list('pnfl', flat=True)
-    )
-    
-    for index, row in df.iterrows():
-        try:
-            # Excel ustunlarini moslashtirish
-            hemis_id = get_cell_value(row, 0)        # A - Talaba ID
-            fio = get_cell_value(row, 1)             # B - FIO
-            born_value = get_cell_value(row, 8)      # I - Tug'ilgan sana
-            pnfl = get_cell_value(row, 10)           # K - JSHSHIR
-            passport = get_cell_value(row, 9)        # J - Pasport
-            course = get_cell_value(row, 12)         # M - Kurs
-            student_group = get_cell_value(row, 14)  # O - Guruh
-            
-            # Asosiy validatsiyalar
-            validation_result = validate_row_data(
-                index, hemis_id, fio, pnfl, passport, 
-                existing_hemis_ids, existing_pnfls
-            )
-            
-            if validation_result['error']:
-                errors.append(validation_result['error'])
-                continue
-            
-            # Ma'lumotlarni tozalash
-            clean_data = clean_row_data(
-                hemis_id, fio, born_value, pnfl, passport, course, student_group
-            )
-            
-            # HemisTable obyekti yaratish
-            hemis_objects.append(HemisTable(**clean_data))
-            
-            # Register bilan bog'lash uchun
-            if clean_data['pnfl'] and len(clean_data['pnfl']) == 14:
-                register_ids = check_register_activation(
-                    clean_data['hemis_id'], clean_data['pnfl']
-                )
-                activated_registers.extend(register_ids)
-            
-            # Takrorlanishni oldini olish
-            existing_hemis_ids.add(clean_data['hemis_id'])
-            if clean_data['pnfl']:
-                existing_pnfls.add(clean_data['pnfl'])
-            
-        except Exception as e:
-            errors.append(f"Qator {index + 2}: {str(e)}")
-            continue
-    
-    # Ma'lumotlarni saqlash
-    created_count = save_hemis_objects(hemis_objects)
-    activated_count = activate_registers(activated_registers)
-    
-    return {
-        'created_count': created_count,
-        'activated_count': activated_count,
-        'errors': errors,
-        'total_rows': len(df)
-    }
-
-
-def validate_row_data(index, hemis_id, fio, pnfl, passport, existing_hemis_ids, existing_pnfls):
-    """Qator ma'lumotlarini validatsiya qilish"""
-    row_num = index + 2
-    
-    # Hemis ID tekshiruvi
-    if not hemis_id:
-        return {'error': f"Qator {row_num}: Hemis ID bo'sh"}
-    
-    if str(hemis_id) in [str(x) for x in existing_hemis_ids]:
-        return {'error': None}  # Skip, already exists
-    
-    # FIO tekshiruvi
-    if not fio or len(str(fio).strip()) < 3:
-        return {'error': f"Qator {row_num}: FIO bo'sh yoki juda qisqa"}
-    
-    # PNFL tekshiruvi
-    if pnfl:
-        clean_pnfl = ''.join(filter(str.isdigit, str(pnfl)))
-        if clean_pnfl and len(clean_pnfl) != 14:
-            return {'error': f"Qator {row_num}: PNFL 14 ta raqam bo'lishi kerak"}
-        
-        if clean_pnfl in existing_pnfls:
-            return {'error': f"Qator {row_num}: PNFL allaqachon mavjud"}
-    
-    # Passport tekshiruvi
-    if passport and len(str(passport).strip()) != 9:
-        return {'error': f"Qator {row_num}: Passport 9 ta belgi bo'lishi kerak"}
-    
-    return {'error': None}
-
-
-def clean_row_data(hemis_id, fio, born_value, pnfl, passport, course, student_group):
-    """Qator ma'lumotlarini tozalash"""
-    # PNFL ni tozalash
-    clean_pnfl = ""
-    if pnfl:
-        pnfl_digits = ''.join(filter(str.isdigit, str(pnfl)))
-        if len(pnfl_digits) == 14:
-            clean_pnfl = pnfl_digits
-    
-    # Tug'ilgan sanani tozalash
-    clean_born = None
-    if born_value:
-        try:
-            # Agar sana formatida bo'lsa
-            if isinstance(born_value, datetime):
-                clean_born = born_value.date()
-            else:
-                # String formatdan parse qilish
-                born_str = str(born_value).strip()
-                if born_str and born_str != 'nan':
-                    # Turli formatlarni sinab ko'rish
-                    for fmt in ['%Y-%m-%d', '%d.%m.%Y', '%d/%m/%Y']:
-                        try:
-                            clean_born = datetime.strptime(born_str, fmt).date()
-                            break
-                        except ValueError:
-                            continue
-        except Exception:
-            pass
-    
-    # Passport ni tozalash
-    clean_passport = ""
-    if passport:
-        clean_passport = str(passport).strip().upper()
-    
-    return {
-        'hemis_id': int(hemis_id),
-        'fio': str(fio).strip(),
-        'born': clean_born,
-        'passport': clean_passport,
-        'pnfl': clean_pnfl,
-        'course': str(course).strip() if course else "",
-        'student_group': str(student_group).strip() if student_group else "",
-    }
-
-
-def check_register_activation(hemis_id, pnfl):
-    """Register faollashtirish uchun tekshirish"""
-    try:
-        registers = Register.objects.filter(
-            hemis_id=hemis_id,
-            pnfl=pnfl,
-            is_active=False
-        )
-        return list(registers.values_list('id', flat=True))
-    except Exception:
-        return []
-
-
-def save_hemis_objects(hemis_objects):
-    """HemisTable obyektlarini saqlash"""
-    if not hemis_objects:
-        return 0
-    
-    try:
-        # Validatsiya
-        for obj in hemis_objects:
-            obj.full_clean()
-        
-        # Bulk create
-        HemisTable.objects.bulk_create(hemis_objects, ignore_conflicts=True)
-        return len(hemis_objects)
-        
-    except ValidationError as e:
-        print(f"Validatsiya xatosi: {e}")
-        return 0
-    except Exception as e:
-        print(f"Saqlash xatosi: {e}")
-        return 0
-
-
-def activate_registers(register_ids):
-    """Registerlarni faollashtirish"""
-    if not register_ids:
-        return 0
-    
-    try:
-        return Register.objects.filter(
-            id__in=list(set(register_ids))
-        ).update(is_active=True)
-    except Exception as e:
-        print(f"Faollashtirish xatosi: {e}")
-        return 0
-
-
 def display_upload_results(request, result):
     """Upload natijalarini ko'rsatish"""
     created_count = result['created_count']
     activated_count = result['activated_count']
+    linked_count = result.get('linked_count', 0)
     errors = result['errors']
     total_rows = result['total_rows']
     
@@ -278,44 +93,41 @@ def display_upload_results(request, result):
         
     if activated_count > 0:
         messages.success(request, f"🔄 {activated_count} ta register faollashtirildi")
+
+    if linked_count > 0:
+        messages.success(request, f"🔗 {linked_count} ta yozuv register bilan bog'landi")
+    
+    updated_count = result.get('updated_count', 0)
+    if updated_count > 0:
+        messages.success(request, f"✏️ {updated_count} ta yozuv yangilandi")
+    
+    if result.get('unchanged_count', 0) > 0:
+        messages.info(request, f"ℹ️ {result['unchanged_count']} ta yozuv o'zgarmagan")
     
     # Umumiy ma'lumot
-    processed_count = created_count + len(errors)
+    processed_count = created_count + updated_count + len(errors)
     if processed_count == 0:
         messages.info(request, "ℹ️ Hech qanday yangi ma'lumot topilmadi")
     else:
-        success_rate = (created_count / processed_count) * 100 if processed_count > 0 else 0
+        success_rate = ((created_count + updated_count) / processed_count) * 100 if processed_count > 0 else 0
         messages.info(
             request, 
             f"📊 Jami: {total_rows} qator, Qayta ishlandi: {processed_count}, "
             f"Muvaffaqiyat: {success_rate:.1f}%"
         )
+    
+    if 'query_count' in result:
+        messages.info(request, f"🗄️ Bazaga so'rovlar soni: {result['query_count']}")
+    
+    if result.get('timings'):
+        timings = ', '.join(f"{name} {value:.1f}s" for name, value in result['timings'].items() if value)
+        messages.info(request, f"⏱️ Bosqichlar: {timings}")
 
 
-def get_cell_value(row, column_index):
-    """Hujayra qiymatini xavfsiz olish"""
-    try:
-        if column_index >= len(row):
-            return ""
-        
-        value = row.iloc[column_index]
-        
-        # Bo'sh yoki NaN tekshirish
-        if pd.isna(value) or value is None:
-            return ""
-        
-        # String ga aylantirish va tozalash
-        str_value = str(value).strip()
-        
-        # 'nan' stringni ham bo'sh deb hisoblash
-        if str_value.lower() == 'nan':
-            return ""
-        
-        return str_value
-        
-    except Exception as e:
-        print(f"Hujayra olishda xato (ustun {column_index}): {e}")
-        return ""
+def hemis_import_status(request, job_id):
+    """Fondagi import vazifasi holati (sahifa polling qiladi)"""
+    job = get_object_or_404(HemisImportJob, pk=job_id)
+    return JsonResponse({'success': True, 'data': job_status_data(job)})
 
 
 def get_hemis_data():
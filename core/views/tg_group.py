@@ -18,33 +18,63 @@ def mass_message_view(request):
     groups = TelegramGroup.objects.filter(is_active=True)
     return render(request, 'core/pages/tables/tg_guruh.html', {'groups': groups})
 
+# Fayllarni Telegramga yuborishda bir martada o'qiladigan hajm
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def build_multipart_body(data, files):
+    """
+    multipart/form-data tanasini qismlar ro'yxati sifatida yig'ish.
+    Fayllar xotiraga to'liq o'qilmaydi: ular yuborish paytida chunks() bilan
+    o'qiladi (katta yuklamalar vaqtinchalik faylda turadi).
+
+    Qaytaradi: (boundary, qismlar, umumiy uzunlik)
+    """
+    boundary = '----WebKitFormBoundary' + ''.join(['%02x' % b for b in os.urandom(16)])
+    parts = []
+
+    # Add text fields
+    if data:
+        for key, value in data.items():
+            parts.append(
+                f'--{boundary}\r\n'
+                f'Content-Disposition: form-data; name="{key}"\r\n\r\n'
+                f'{value}\r\n'.encode()
+            )
+
+    # Add file
+    for field_name, (filename, file_data, content_type) in files.items():
+        parts.append(
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'.encode()
+        )
+        parts.append(file_data)
+        parts.append(b'\r\n')
+
+    parts.append(f'--{boundary}--\r\n'.encode())
+    length = sum(len(part) if isinstance(part, bytes) else part.size for part in parts)
+    return boundary, parts, length
+
+
+def iter_multipart_body(parts):
+    """Tana qismlarini ketma-ket qaytarish, fayllar bo'laklab o'qiladi"""
+    for part in parts:
+        if isinstance(part, bytes):
+            yield part
+        else:
+            yield from part.chunks(UPLOAD_CHUNK_SIZE)
+
+
 def send_telegram_request(method, data=None, files=None):
     bot_token = env.str('BOT_TOKEN')
     url = f"https://api.telegram.org/bot{bot_token}/{method}"
     
     if files:
-        boundary = '----WebKitFormBoundary' + ''.join(['%02x' % b for b in os.urandom(16)])
-        body = b''
-        
-        # Add text fields
-        if data:
-            for key, value in data.items():
-                body += f'--{boundary}\r\n'.encode()
-                body += f'Content-Disposition: form-data; name="{key}"\r\n\r\n'.encode()
-                body += f'{value}\r\n'.encode()
-        
-        # Add file
-        for field_name, (filename, file_data, content_type) in files.items():
-            body += f'--{boundary}\r\n'.encode()
-            body += f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'.encode()
-            body += f'Content-Type: {content_type}\r\n\r\n'.encode()
-            body += file_data
-            body += b'\r\n'
-        
-        body += f'--{boundary}--\r\n'.encode()
-        
-        req = urllib.request.Request(url, data=body)
+        boundary, parts, length = build_multipart_body(data, files)
+        req = urllib.request.Request(url, data=iter_multipart_body(parts))
         req.add_header('Content-Type', f'multipart/form-data; boundary={boundary}')
+        req.add_header('Content-Length', str(length))
     else:
         if data:
             data = urllib.parse.urlencode(data).encode()
@@ -112,8 +142,7 @@ def send_mass_message(request):
                 # Fayllarni yuborish
                 if files_data:
                     for i, file_obj in enumerate(files_data):
-                        file_content = file_obj.read()
-                        file_obj.seek(0)  # Reset file pointer
+                        # Fayl har bir guruhga yuborilayotganda diskdan bo'laklab o'qiladi
                         file_name = file_obj.name
                         content_type = file_obj.content_type or mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
                         
@@ -121,7 +150,7 @@ def send_mass_message(request):
                         
                         method, field_name = get_telegram_method(content_type)
                         
-                        files = {field_name: (file_name, file_content, content_type)}
+                        files = {field_name: (file_name, file_obj, content_type)}
                         data = {'chat_id': str(group_id)}
                         
                         # Birinchi faylga caption qo'shish
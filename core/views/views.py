@@ -12,6 +12,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
 from django.core.exceptions import ObjectDoesNotExist
 from core.models import Register, TelegramGroup
+from core.group_counters import update_registers
 from environs import Env
 
 # Matplotlib sozlamalari
@@ -203,18 +204,18 @@ class RegisterService:
             
             # Faol talabalarni yangilash
             if active_ids:
-                updated = base_query.filter(
+                updated = update_registers(base_query.filter(
                     id__in=active_ids,
                     is_active=False,
                     is_teacher=False
-                ).update(is_active=True, is_teacher=False)
+                ), is_active=True, is_teacher=False)
                 updated_count += updated
             
             # O'qituvchilarni yangilash
             if teacher_ids:
-                updated = base_query.filter(
+                updated = update_registers(base_query.filter(
                     id__in=teacher_ids
-                ).update(is_teacher=True, is_active=True)
+                ), is_teacher=True, is_active=True)
                 updated_count += updated
             
             return {"success": True, "updated_count": updated_count}